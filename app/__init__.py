@@ -56,6 +56,7 @@ def create_app():
     from .blueprints.training import training_bp
     from .blueprints.ask import ask_bp
     from .blueprints.prompts import prompts_bp
+    from .blueprints.correction_rules import correction_rules_bp
     from .blueprints.test import test_bp
     
     app.register_blueprint(auth_bp)
@@ -63,12 +64,20 @@ def create_app():
     app.register_blueprint(training_bp)
     app.register_blueprint(ask_bp)
     app.register_blueprint(prompts_bp)
+    app.register_blueprint(correction_rules_bp)
     app.register_blueprint(test_bp)
 
     # Register the main index route
     from .main import main as main_blueprint
     app.register_blueprint(main_blueprint)
 
+    # Check (and pull, if missing) the LLM model in the background so no request waits on it
+    from .core.vanna_core import warm_up_llm
+    try:
+        warm_up_llm()
+    except Exception as e:
+        app.logger.warning(f"LLM warm-up could not be started: {e}")
+
     return app
 
 # Create an instance of the app
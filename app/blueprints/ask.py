@@ -9,6 +9,7 @@ import traceback
 import threading
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.exc import OperationalError
 import plotly.express as px
 import plotly.graph_objects as go
@@ -16,6 +17,13 @@ import plotly.graph_objects as go
 from plotly.utils import PlotlyJSONEncoder
 from app.vanna_wrapper import get_vanna_instance, configure_vanna_for_request, MyVanna
 from app.core.helpers import load_prompt_template, _delete_all_ask_logs, write_ask_log
+from app.core.db_utils import get_user_db_connection, normalize_dataset_id
+from app.core.training_search import find_exact_question
+from app.core.sql_repair import SQLRepairFailed, get_schema_catalog, repair_sql
+from app.core.sql_rewrite import get_correction_rules, get_sql_rewriter
+from vanna.scoring import similarity_of
+from vanna.sql_stream import SQLStreamExtractor
+from vanna.chart_recommender import build_chart, recommend_chart, wants_custom_chart
 import textwrap
 
 logger = logging.getLogger(__name__)
@@ -49,6 +57,63 @@ def create_chart_function(code_string: str):
     except Exception as e:
         return None, f"An unexpected error occurred during function creation: {e}"
 
+# Stored QA pairs at least this similar to the question are answered with their SQL, skipping the LLM
+EXACT_MATCH_SIMILARITY = 0.95
+
+def _find_exact_qa(user_id: str, dataset_id, question: str):
+    """Normalized-question hash lookup in the training DB; runs before any embedding is computed."""
+    try:
+        with get_user_db_connection(user_id) as conn:
+            return find_exact_question(conn, normalize_dataset_id(dataset_id), question)
+    except Exception as e:
+        logger.warning(f"Exact question lookup failed for user '{user_id}': {e}")
+        return None
+
+def _context_scores(items: list, rerank_scores):
+    """Rerank scores when the rerank stage ran, otherwise the vector-store similarities (if the store provides them)."""
+    if rerank_scores is not None:
+        return rerank_scores
+    if any(similarity_of(item) for item in items):
+        return [similarity_of(item) for item in items]
+    return None
+
+# Runs SQL extracted from a still-streaming LLM response, so execution overlaps the rest of the generation
+_early_sql_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='early-sql')
+
+def _rewrite_sql(vn, sql: str) -> str:
+    """The user's correction rules and the dialect's fixups, applied in one pass before execution."""
+    rewritten = get_sql_rewriter(vn.user_id, vn.engine.dialect.name).rewrite(sql)
+    if rewritten != sql:
+        vn.log_queue.put({'type': 'info', 'content': f"已套用修正規則與方言修正:\n{rewritten}"})
+    return rewritten
+
+def _repair_failed_sql(vn, user_id: str, sql: str, error: Exception):
+    """
+    Runs the SQL repair loop (app.core.sql_repair) for a statement that failed: deterministic,
+    schema-aware fixes first, then at most `sql_repair_attempts` LLM attempts. Returns (sql, df);
+    re-raises the original error when the statement cannot be repaired.
+    """
+    max_llm_attempts = int(vn.config.get('sql_repair_attempts', 2))
+    if max_llm_attempts < 0:
+        raise error
+    vn.log_queue.put({'type': 'info', 'content': f"SQL 執行失敗，嘗試自動修復: {error}"})
+    try:
+        repaired_sql, df, steps = repair_sql(
+            vn, sql, str(error),
+            run=lambda candidate: vn.run_sql(sql=candidate),
+            catalog=get_schema_catalog(vn.engine.url.database),
+            rules=get_correction_rules(user_id),
+            max_llm_attempts=max_llm_attempts,
+            log=lambda message: vn.log_queue.put({'type': 'info', 'content': message}),
+        )
+    except SQLRepairFailed as failed:
+        write_ask_log(user_id, "sql_repair_failed", f"{len(failed.steps)} attempts, last error: {failed.error}")
+        raise error
+    vn.log_queue.put({'type': 'info', 'content': f"SQL 已自動修復（{len(steps)} 步）。"})
+    vn.log_queue.put({'type': 'sql', 'content': repaired_sql})
+    write_ask_log(user_id, "repaired_sql", repaired_sql)
+    return repaired_sql, df
+
 def run_vanna_in_thread(vn_instance: MyVanna, question: str, session_data: dict, server_paginate: bool, page: int, page_size: int):
     """This function runs the Vanna logic in a separate thread."""
     user_id = session_data['user_id']
@@ -61,63 +126,108 @@ def run_vanna_in_thread(vn_instance: MyVanna, question: str, session_data: dict,
             
             vn = configure_vanna_for_request(vn_instance, user_id, dataset_id)
 
-            similar_qa = vn.get_similar_question_sql(question=question)
-            if similar_qa:
-                vn_instance.log_queue.put({'type': 'retrieved_context', 'subtype': 'qa', 'content': similar_qa})
-
-            related_ddl = vn.get_related_ddl(question=question)
-            if related_ddl:
-                vn_instance.log_queue.put({'type': 'retrieved_context', 'subtype': 'ddl', 'content': related_ddl})
-
-            related_docs = vn.get_related_documentation(question=question)
-            if related_docs:
-                vn_instance.log_queue.put({'type': 'retrieved_context', 'subtype': 'documentation', 'content': related_docs})
+            exact_qa = _find_exact_qa(user_id, dataset_id, question)
+            similar_qa, related_ddl, related_docs = [], [], []
+            if exact_qa:
+                similar_qa = [exact_qa]
+                vn_instance.log_queue.put({'type': 'retrieved_context', 'subtype': 'qa', 'content': similar_qa, 'scores': [1.0]})
+            else:
+                # Optional cross-encoder rerank trims each context list; scores are sent along when available
+                similar_qa, qa_scores = vn.rerank_context(question, vn.get_similar_question_sql(question=question))
+                if similar_qa:
+                    vn_instance.log_queue.put({'type': 'retrieved_context', 'subtype': 'qa', 'content': similar_qa, 'scores': _context_scores(similar_qa, qa_scores)})
+
+            # Fusion and reranking may reorder the list, so look for the most similar pair rather than the first
+            best_qa = max(similar_qa, key=similarity_of) if similar_qa else None
+            if not best_qa or similarity_of(best_qa) <= EXACT_MATCH_SIMILARITY:
+                related_ddl, ddl_scores = vn.rerank_context(question, vn.get_related_ddl(question=question))
+                if related_ddl:
+                    vn_instance.log_queue.put({'type': 'retrieved_context', 'subtype': 'ddl', 'content': related_ddl, 'scores': _context_scores(related_ddl, ddl_scores)})
+
+                related_docs, doc_scores = vn.rerank_context(question, vn.get_related_documentation(question=question))
+                if related_docs:
+                    vn_instance.log_queue.put({'type': 'retrieved_context', 'subtype': 'documentation', 'content': related_docs, 'scores': _context_scores(related_docs, doc_scores)})
 
             sql = None
-            if similar_qa and similar_qa[0].get('similarity', 0) > 0.95:
-                sql = similar_qa[0]['sql']
+            early_sql, early_result = None, None
+            # Speculative candidates are rewritten before validation; they must not be rewritten twice
+            sql_rewritten = False
+            if best_qa and similarity_of(best_qa) > EXACT_MATCH_SIMILARITY:
+                sql = best_qa['sql']
                 vn_instance.log_queue.put({'type': 'info', 'content': f"找到高度相似的已存問題，直接使用其 SQL。"})
             else:
                 vn_instance.log_queue.put({'type': 'info', 'content': "正在請求 LLM 生成新的 SQL..."})
-                gen_or_resp = vn.generate_sql(
-                    question=question,
-                    ddl_list=related_ddl,
-                    doc_list=related_docs,
-                    question_sql_list=similar_qa
-                )
-
-                full_llm_response = None
-                collected_text = ""
-
-                if hasattr(gen_or_resp, '__iter__') and not isinstance(gen_or_resp, (str, bytes)):
-                    for part in gen_or_resp:
-                        chunk = str(part.get('content', '')) if isinstance(part, dict) else str(part)
-                        if chunk:
-                            vn_instance.log_queue.put({'type': 'sql_chunk', 'content': chunk})
-                            collected_text += chunk
-                    full_llm_response = collected_text
+                n_candidates = int(vn.config.get('sql_candidates', 1) or 1)
+                if n_candidates > 1:
+                    # Speculative mode: several candidates in parallel, the first one that passes EXPLAIN is used
+                    result = vn.generate_sql_candidates(
+                        question=question,
+                        ddl_list=related_ddl,
+                        doc_list=related_docs,
+                        question_sql_list=similar_qa,
+                        n=n_candidates
+                    )
+                    for failed in result['errors']:
+                        vn_instance.log_queue.put({'type': 'info', 'content': f"候選 SQL #{failed['candidate'] + 1} 驗證失敗: {failed['error']}"})
+                    if result['response']:
+                        vn_instance.log_queue.put({'type': 'thought', 'content': result['response']})
+                    sql = result['sql']
+                    if not sql:
+                        raise ValueError("未能從模型回應中提取到有效的 SQL 語句。")
+                    sql_rewritten = True
+                    if len(result['errors']) < n_candidates:
+                        vn_instance.log_queue.put({'type': 'info', 'content': f"使用通過驗證的候選 SQL #{result['candidate'] + 1}（temperature={result['temperature']}）。"})
                 else:
-                    full_llm_response = gen_or_resp
+                    gen_or_resp = vn.generate_sql(
+                        question=question,
+                        ddl_list=related_ddl,
+                        doc_list=related_docs,
+                        question_sql_list=similar_qa,
+                        stream=True
+                    )
+
+                    full_llm_response = None
+                    extractor = SQLStreamExtractor()
+
+                    if hasattr(gen_or_resp, '__iter__') and not isinstance(gen_or_resp, (str, bytes)):
+                        for part in gen_or_resp:
+                            chunk = str(part.get('content', '')) if isinstance(part, dict) else str(part)
+                            if not chunk:
+                                continue
+                            vn_instance.log_queue.put({'type': 'sql_chunk', 'content': chunk})
+                            if extractor.feed(chunk) is not None:
+                                # The SQL block is closed: start executing it while the model finishes its explanation
+                                sql = vn.extract_sql(extractor.text)
+                                if sql:
+                                    early_sql = _rewrite_sql(vn, sql)
+                                    early_result = _early_sql_executor.submit(vn.run_sql, sql=early_sql)
+                        full_llm_response = extractor.text
+                    else:
+                        full_llm_response = gen_or_resp
 
-                if full_llm_response:
-                    vn_instance.log_queue.put({'type': 'thought', 'content': full_llm_response})
+                    if full_llm_response:
+                        vn_instance.log_queue.put({'type': 'thought', 'content': full_llm_response})
+
+                    if not sql:
+                        sql = vn.extract_sql(full_llm_response)
+                    if not sql:
+                        raise ValueError("未能從模型回應中提取到有效的 SQL 語句。")
 
-                sql = vn.extract_sql(full_llm_response)
-                if not sql:
-                    raise ValueError("未能從模型回應中提取到有效的 SQL 語句。")
-            
             vn_instance.log_queue.put({'type': 'sql', 'content': sql})
             write_ask_log(user_id, "generated_sql", sql)
 
             df = pd.DataFrame()
             try:
-                # Dialect-specific SQL corrections
-                if vn.engine.dialect.name == 'sqlite':
-                    vn_instance.log_queue.put({'type': 'info', 'content': 'SQLite dialect detected. Applying date function corrections.'})
-                    sql = sql.replace("DATE_SUB(CURDATE(), INTERVAL 30 DAY)", "date('now', '-30 days')")
-                    sql = sql.replace("CURRENT_DATE - INTERVAL '30 days'", "date('now', '-30 days')")
-
-                df = vn.run_sql(sql=sql)
+                try:
+                    if early_result is not None:
+                        sql = early_sql
+                        df = early_result.result()
+                    else:
+                        if not sql_rewritten:
+                            sql = _rewrite_sql(vn, sql)
+                        df = vn.run_sql(sql=sql)
+                except Exception as e:
+                    sql, df = _repair_failed_sql(vn, user_id, sql, e)
                 
                 # More careful data cleaning: convert non-numeric types to strings, leave numbers alone
                 for col in df.columns:
@@ -155,8 +265,23 @@ def run_vanna_in_thread(vn_instance: MyVanna, question: str, session_data: dict,
             
             if not df.empty:
                 try:
-                    vn_instance.log_queue.put({'type': 'info', 'content': 'Attempting to generate Plotly code...'})
-                    chart_code = vn_instance.generate_plotly_code(question=question, sql=sql, df=df)
+                    recommendation = None
+                    if vn.config.get('chart_recommender', True) and not wants_custom_chart(question):
+                        recommendation = recommend_chart(df, question)
+
+                    chart_code = None
+                    if recommendation:
+                        try:
+                            fig = build_chart(df, recommendation)
+                            chart_json = json.dumps(fig, cls=PlotlyJSONEncoder)
+                            vn_instance.log_queue.put({'type': 'info', 'content': f"Rule-based chart: {recommendation['kind']} ({recommendation['reason']}), no LLM call needed."})
+                            vn_instance.log_queue.put({"type": "plotly_chart", "content": chart_json})
+                        except Exception as e:
+                            vn_instance.log_queue.put({'type': 'warning', 'content': f"Rule-based chart failed, falling back to the LLM: {e}"})
+                            recommendation = None
+                    if not recommendation:
+                        vn_instance.log_queue.put({'type': 'info', 'content': 'Attempting to generate Plotly code...'})
+                        chart_code = vn_instance.generate_plotly_code(question=question, sql=sql, df=df)
 
                     if chart_code:
                         # Final defensive fix: remove potential erroneous quotes around column names
@@ -193,7 +318,7 @@ def run_vanna_in_thread(vn_instance: MyVanna, question: str, session_data: dict,
                                     'type': 'error',
                                     'content': f'An exception occurred during chart function execution: {str(e)}\nTraceback: {traceback.format_exc()}'
                                 })
-                    else:
+                    elif not recommendation:
                         vn_instance.log_queue.put({'type': 'info', 'content': 'Vanna did not generate any chart code.'})
 
                 except Exception as e:
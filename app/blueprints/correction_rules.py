@@ -0,0 +1,70 @@
+from flask import Blueprint, request, jsonify, session
+import sqlite3
+
+from app.core.db_utils import get_user_db_connection
+from app.core.sql_rewrite import invalidate_sql_rewriter
+
+correction_rules_bp = Blueprint('correction_rules', __name__, url_prefix='/api')
+
+@correction_rules_bp.route('/correction_rules', methods=['GET'])
+def get_correction_rules():
+    user_id = session.get('username')
+    if not user_id:
+        return jsonify({'status': 'error', 'message': '用戶未登入'}), 401
+
+    try:
+        with get_user_db_connection(user_id) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, incorrect_name, correct_name, created_at FROM correction_rules ORDER BY id;")
+            rules = [dict(row) for row in cursor.fetchall()]
+            return jsonify({'status': 'success', 'rules': rules})
+    except sqlite3.Error as e:
+        return jsonify({'status': 'error', 'message': f"資料庫錯誤: {e}"}), 500
+
+@correction_rules_bp.route('/correction_rules', methods=['POST'])
+def add_correction_rule():
+    user_id = session.get('username')
+    if not user_id:
+        return jsonify({'status': 'error', 'message': '用戶未登入'}), 401
+
+    data = request.get_json() or {}
+    incorrect_name = (data.get('incorrect_name') or '').strip()
+    correct_name = (data.get('correct_name') or '').strip()
+    if not incorrect_name or not correct_name:
+        return jsonify({'status': 'error', 'message': '缺少錯誤名稱或正確名稱。'}), 400
+
+    try:
+        with get_user_db_connection(user_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO correction_rules (incorrect_name, correct_name) VALUES (?, ?)",
+                (incorrect_name, correct_name)
+            )
+            rule_id = cursor.lastrowid
+            conn.commit()
+        invalidate_sql_rewriter(user_id)
+        rule = {'id': rule_id, 'incorrect_name': incorrect_name, 'correct_name': correct_name}
+        return jsonify({'status': 'success', 'id': rule_id, 'rule': rule}), 201
+    except sqlite3.IntegrityError:
+        return jsonify({'status': 'error', 'message': '操作失敗：該錯誤名稱已有修正規則。'}), 409
+    except sqlite3.Error as e:
+        return jsonify({'status': 'error', 'message': f"資料庫錯誤: {e}"}), 500
+
+@correction_rules_bp.route('/correction_rules/<int:rule_id>', methods=['DELETE'])
+def delete_correction_rule(rule_id):
+    user_id = session.get('username')
+    if not user_id:
+        return jsonify({'status': 'error', 'message': '用戶未登入'}), 401
+
+    try:
+        with get_user_db_connection(user_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM correction_rules WHERE id = ?", (rule_id,))
+            if cursor.rowcount == 0:
+                return jsonify({'status': 'error', 'message': '找不到對應的修正規則。'}), 404
+            conn.commit()
+        invalidate_sql_rewriter(user_id)
+        return jsonify({'status': 'success', 'message': '修正規則已刪除。'})
+    except sqlite3.Error as e:
+        return jsonify({'status': 'error', 'message': f"資料庫錯誤: {e}"}), 500
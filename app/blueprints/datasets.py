@@ -7,12 +7,41 @@ from sqlalchemy import create_engine, inspect, text
 from werkzeug.utils import secure_filename
 
 from app.core.helpers import get_dataset_tables
-from app.core.db_utils import get_user_db_connection
+from app.core.db_utils import get_user_db_connection, normalize_dataset_id
+from app.core.sampling import invalidate_samples
+from app.core.profile_catalog import TableProfiler, INGEST_CHUNK_SIZE, save_table_profile, delete_table_profiles
 from app.vanna_wrapper import get_vanna_instance, configure_vanna_for_request
 from app.utils.decorators import login_required
 
 datasets_bp = Blueprint('datasets', __name__, url_prefix='/api/datasets')
 
+def _load_csv_into_table(stream, table_name, engine) -> dict:
+    """
+    Loads a CSV into a table chunk by chunk and profiles it in the same pass.
+    The rows go to a staging table that replaces the existing table in one transaction
+    once the whole file has loaded, so a malformed file leaves the old table untouched.
+    Returns the table profile for the dataset catalog.
+    """
+    staging_table = f'_staging_{table_name}'
+    profiler = TableProfiler(table_name)
+    conn = sqlite3.connect(engine.url.database, isolation_level=None)
+    try:
+        for i, chunk in enumerate(pd.read_csv(stream, encoding='utf-8-sig', chunksize=INGEST_CHUNK_SIZE)):
+            chunk.to_sql(staging_table, engine, index=False, if_exists='replace' if i == 0 else 'append')
+            profiler.update(chunk)
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        conn.execute(f'ALTER TABLE "{staging_table}" RENAME TO "{table_name}"')
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        conn.execute(f'DROP TABLE IF EXISTS "{staging_table}"')
+        raise
+    finally:
+        conn.close()
+    return profiler.finalize()
+
 @datasets_bp.route('', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @login_required
 def handle_datasets():
@@ -35,15 +64,17 @@ def handle_datasets():
             # Ensure the directory for the new database exists
             os.makedirs(os.path.dirname(db_path), exist_ok=True)
             engine = create_engine(f'sqlite:///{db_path}')
+            profiles = []
             for file in files:
-                df = pd.read_csv(file.stream, encoding='utf-8-sig')
                 table_name = os.path.splitext(secure_filename(file.filename))[0].replace('-', '_').replace(' ', '_')
-                df.to_sql(table_name, engine, index=False, if_exists='replace')
+                profiles.append(_load_csv_into_table(file.stream, table_name, engine))
             
             with get_user_db_connection(user_id) as conn:
                 cursor = conn.cursor()
                 cursor.execute("INSERT INTO datasets (dataset_name, db_path) VALUES (?, ?)", (dataset_name, db_path))
                 new_id = cursor.lastrowid
+                for profile in profiles:
+                    save_table_profile(conn, new_id, profile)
                 conn.commit()
                 
                 # After adding, refetch all datasets to return the updated list
@@ -115,10 +146,12 @@ def handle_datasets():
                 db_path = row[0]
                 
                 cursor.execute("DELETE FROM datasets WHERE id = ?", (dataset_id,))
+                delete_table_profiles(conn, dataset_id)
                 conn.commit()
             
             if os.path.exists(db_path):
                 os.remove(db_path)
+            invalidate_samples(db_path)
             
             # After deleting a dataset, clean up its training data from Vanna
             vn = get_vanna_instance(user_id)
@@ -158,15 +191,14 @@ def activate_dataset():
         # Check if the dataset has any training data to determine the 'is_trained' status
         with get_user_db_connection(user_id) as conn:
             cursor = conn.cursor()
+            # EXISTS probes stop at the first indexed match instead of counting every row
             cursor.execute("""
                 SELECT
-                    (SELECT COUNT(*) FROM training_ddl WHERE dataset_id = :dataset_id) +
-                    (SELECT COUNT(*) FROM training_documentation WHERE dataset_id = :dataset_id) +
-                    (SELECT COUNT(*) FROM training_qa WHERE dataset_id = :dataset_id)
-            """, {'dataset_id': dataset_id})
-            total_training_entries = cursor.fetchone()[0]
-        
-        is_trained = total_training_entries > 0
+                    EXISTS(SELECT 1 FROM training_ddl WHERE dataset_id = :dataset_id) OR
+                    EXISTS(SELECT 1 FROM training_documentation WHERE dataset_id = :dataset_id) OR
+                    EXISTS(SELECT 1 FROM training_qa WHERE dataset_id = :dataset_id)
+            """, {'dataset_id': normalize_dataset_id(dataset_id)})
+            is_trained = bool(cursor.fetchone()[0])
 
         return jsonify({
             'status': 'success', 
@@ -220,19 +252,22 @@ def handle_dataset_files():
         try:
             engine = create_engine(f'sqlite:///{db_path}')
             added_tables = []
+            profiles = []
             
             for file in files:
                 if not file.filename.endswith('.csv'):
                     continue
                 
-                df = pd.read_csv(file.stream, encoding='utf-8-sig')
                 table_name = os.path.splitext(secure_filename(file.filename))[0].replace('-', '_').replace(' ', '_')
-                with engine.connect() as connection:
-                    connection.execute(text(f'DROP TABLE IF EXISTS "{table_name}"'))
-                    connection.commit()
-                df.to_sql(table_name, engine, index=False, if_exists='append')
+                profiles.append(_load_csv_into_table(file.stream, table_name, engine))
                 added_tables.append(table_name)
             
+            # Incremental catalog refresh: only the replaced/added tables are re-profiled
+            with get_user_db_connection(user_id) as conn:
+                for profile in profiles:
+                    save_table_profile(conn, dataset_id, profile)
+                conn.commit()
+            
             tables_info, _ = get_dataset_tables(user_id, dataset_id)
             all_tables = tables_info['table_names']
             
@@ -262,6 +297,10 @@ def handle_dataset_files():
                 connection.execute(text(f'DROP TABLE IF EXISTS {table_name}'))
                 connection.commit()
             
+            with get_user_db_connection(user_id) as conn:
+                delete_table_profiles(conn, dataset_id, table_name)
+                conn.commit()
+            
             tables_info, _ = get_dataset_tables(user_id, dataset_id)
             all_tables = tables_info['table_names']
             
@@ -1,10 +1,9 @@
 from flask import Blueprint, request, jsonify, session
 import sqlite3
-import os
-import json
 
 from app.core.db_utils import get_user_db_connection
 from app.core.helpers import load_prompt_template
+from app.core.prompt_cache import load_default_prompts, invalidate_prompts
 
 prompts_bp = Blueprint('prompts', __name__, url_prefix='/api')
 
@@ -64,6 +63,7 @@ def save_prompt():
                 return jsonify({'status': 'error', 'message': '找不到對應的提示詞進行更新。'}), 404
 
             conn.commit()
+            invalidate_prompts(user_id_session)
             return jsonify({'status': 'success', 'message': '提示詞已更新。'})
     except sqlite3.IntegrityError:
         return jsonify({'status': 'error', 'message': '操作失敗：提示詞名稱必須是唯一的。'}), 409
@@ -85,17 +85,13 @@ def delete_prompt(prompt_id):
                 return jsonify({'status': 'error', 'message': '找不到可刪除的提示詞，或該提示詞為全域提示詞。'}), 404
 
             conn.commit()
+            invalidate_prompts(user_id)
             return jsonify({'status': 'success', 'message': '提示詞已刪除。'})
     except sqlite3.Error as e:
         return jsonify({'status': 'error', 'message': f"資料庫錯誤: {e}"}), 500
 
 def get_default_prompt_content(prompt_key: str) -> str:
-    prompts_file_path = os.path.join(os.getcwd(), 'prompts', 'default_prompts.json')
-    if not os.path.exists(prompts_file_path):
-        return None
-    with open(prompts_file_path, 'r', encoding='utf-8') as f:
-        all_prompts = json.load(f)
-    return all_prompts.get(prompt_key)
+    return load_default_prompts().get(prompt_key)
 
 @prompts_bp.route('/reset_prompt_to_default/<string:prompt_name>', methods=['POST'])
 def reset_prompt_to_default(prompt_name):
@@ -120,6 +116,7 @@ def reset_prompt_to_default(prompt_name):
                 return jsonify({'status': 'error', 'message': '在資料庫中找不到要重置的提示詞。'}), 404
             
             conn.commit()
+            invalidate_prompts(user_id)
             return jsonify({'status': 'success', 'message': '提示詞已重置為默認值。'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': f"重置過程中發生錯誤: {e}"}), 500
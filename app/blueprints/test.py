@@ -38,13 +38,13 @@ def test_ollama():
         logger.info(f"尝试直接调用Ollama, 提示词格式: {type(test_prompt)}")
         # 先尝试直接调用，如果失败则尝试包装成消息格式
         try:
-            response = vn.submit_prompt(test_prompt)
+            response = vn.submit_prompt(test_prompt, priority='analysis')
         except Exception as e:
             logger.warning(f"直接调用失败，尝试包装成消息格式: {str(e)}")
             # 尝试包装成标准的消息格式
             messages = [{"role": "user", "content": test_prompt}]
             logger.info(f"尝试使用消息格式: {type(messages)}, 长度: {len(messages)}")
-            response = vn.submit_prompt(messages)
+            response = vn.submit_prompt(messages, priority='analysis')
         
         logger.info(f"=== Ollama测试成功 ===")
         logger.info(f"响应类型: {type(response)}")
@@ -75,6 +75,7 @@ def fix_prompts():
     from flask import session, current_app
     from app.core.db_utils import get_user_db_connection
     from app.core.helpers import load_prompt_template
+    from app.core.prompt_cache import invalidate_prompts
     import sqlite3
 
     user_id = session.get('username')
@@ -147,6 +148,7 @@ def fix_prompts():
                     logger.error(f"Failed to process prompt '{prompt_name}': {e}")
 
             conn.commit()
+        invalidate_prompts(user_id)
             
         message = f"Prompt fix completed. Updated: {updated_count}, Inserted: {inserted_count}."
         logger.info(f"--- {message} ---")
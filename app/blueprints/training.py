@@ -5,9 +5,11 @@ from sqlalchemy import inspect, text
 import logging
 import re
 
-from app.core.db_utils import get_user_db_connection
+from app.core.db_utils import get_user_db_connection, normalize_dataset_id
 from app.vanna_wrapper import get_vanna_instance, configure_vanna_for_request
-from app.core.helpers import load_prompt_template, get_dataset_tables, extract_column_features
+from app.core.helpers import load_prompt_template, get_dataset_tables, extract_columns_features
+from app.core.profile_catalog import refresh_dataset_profiles, format_profile_for_prompt
+from app.core.training_search import UPSERT_DOCUMENTATION, search_training_data
 from app.utils.decorators import login_required
 
 def build_limited_context(ddl_list, doc_list, qa_list, max_length=6000):
@@ -59,7 +61,10 @@ def get_training_data():
     page = int(request.args.get('page', 1))
     page_size = 10
     offset = (page - 1) * page_size
-    dataset_id = session.get('active_dataset')
+    # Keyset cursors ("created_at|id") returned by the previous page; OFFSET is only used for direct page jumps
+    after = request.args.get('after')
+    before = request.args.get('before')
+    dataset_id = normalize_dataset_id(session.get('active_dataset'))
     logger.debug(f"Request parameters - table_name: '{table_name}', dataset_id: '{dataset_id}', page: {page}")
 
     if not dataset_id:
@@ -77,14 +82,38 @@ def get_training_data():
         total_count = cursor.fetchone()[0]
         total_pages = (total_count + page_size - 1) // page_size
 
-        cursor.execute("""
-            SELECT id, question, sql_query as sql
-            FROM training_qa
-            WHERE table_name = ? AND dataset_id = ?
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-        """, (table_name, dataset_id, page_size, offset))
-        qa_pairs = [dict(row) for row in cursor.fetchall()]
+        if after or before:
+            created_at, _, last_id = (after or before).rpartition('|')
+            if after:
+                cursor.execute("""
+                    SELECT id, question, sql_query as sql, created_at
+                    FROM training_qa
+                    WHERE table_name = ? AND dataset_id = ? AND (created_at, id) < (?, ?)
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                """, (table_name, dataset_id, created_at, int(last_id), page_size))
+                rows = cursor.fetchall()
+            else:
+                cursor.execute("""
+                    SELECT id, question, sql_query as sql, created_at
+                    FROM training_qa
+                    WHERE table_name = ? AND dataset_id = ? AND (created_at, id) > (?, ?)
+                    ORDER BY created_at ASC, id ASC
+                    LIMIT ?
+                """, (table_name, dataset_id, created_at, int(last_id), page_size))
+                rows = cursor.fetchall()[::-1]
+        else:
+            cursor.execute("""
+                SELECT id, question, sql_query as sql, created_at
+                FROM training_qa
+                WHERE table_name = ? AND dataset_id = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ? OFFSET ?
+            """, (table_name, dataset_id, page_size, offset))
+            rows = cursor.fetchall()
+        qa_pairs = [{'id': row['id'], 'question': row['question'], 'sql': row['sql']} for row in rows]
+        first_cursor = f"{rows[0]['created_at']}|{rows[0]['id']}" if rows else None
+        last_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}" if rows else None
         
         # Fetch both analysis and serial number results
         cursor.execute("SELECT documentation_text FROM training_documentation WHERE table_name = ? AND dataset_id = ?", ('__dataset_analysis__', dataset_id))
@@ -110,11 +139,35 @@ def get_training_data():
         'pagination': {
             'current_page': page,
             'total_pages': total_pages,
-            'total_count': total_count
+            'total_count': total_count,
+            'next_cursor': last_cursor if page < total_pages else None,
+            'prev_cursor': first_cursor if page > 1 else None
         }
     }
     return jsonify(response_data)
 
+@training_bp.route('/training_data/search', methods=['GET'])
+@login_required
+def search_training_data_route():
+    user_id = session['username']
+    query = (request.args.get('q') or '').strip()
+    kind = request.args.get('kind', 'all')
+    limit = min(int(request.args.get('limit', 20)), 100)
+    dataset_id = normalize_dataset_id(session.get('active_dataset'))
+    logger.debug(f"search_training_data called - q: '{query}', kind: '{kind}', dataset_id: '{dataset_id}'")
+
+    if not dataset_id:
+        return jsonify({'status': 'error', 'message': 'No active dataset selected.'}), 400
+    if not query:
+        return jsonify({'status': 'error', 'message': 'Query parameter q is required.'}), 400
+    if kind not in ('all', 'qa', 'documentation'):
+        return jsonify({'status': 'error', 'message': f"Unknown kind '{kind}'."}), 400
+
+    kinds = ('qa', 'documentation') if kind == 'all' else (kind,)
+    with get_user_db_connection(user_id) as conn:
+        results = search_training_data(conn, dataset_id, query, kinds=kinds, limit=limit)
+    return jsonify({'status': 'success', 'results': results})
+
 @training_bp.route('/save_documentation', methods=['POST'])
 @login_required
 def save_documentation():
@@ -133,10 +186,7 @@ def save_documentation():
         with get_user_db_connection(user_id) as conn:
             cursor = conn.cursor()
             if doc_content.strip():
-                cursor.execute(
-                    "REPLACE INTO training_documentation (dataset_id, table_name, documentation_text) VALUES (?, ?, ?)",
-                    (dataset_id, table_name, doc_content)
-                )
+                cursor.execute(UPSERT_DOCUMENTATION, (dataset_id, table_name, doc_content))
                 message = f"Documentation for table '{table_name}' saved."
             else:
                 cursor.execute("DELETE FROM training_documentation WHERE dataset_id = ? AND table_name = ?", (dataset_id, table_name))
@@ -304,7 +354,7 @@ def generate_qa_from_sql():
                         question = vn.submit_prompt([
                             {'role': 'system', 'content': qa_system_prompt},
                             {'role': 'user', 'content': sql_query}
-                        ])
+                        ], priority='bulk')
                         
                         cursor.execute(
                             "INSERT INTO training_qa (question, sql_query, table_name, dataset_id) VALUES (?, ?, ?, ?)",
@@ -333,7 +383,7 @@ def analyze_schema():
     if not user_id or not dataset_id:
         return jsonify({'status': 'error', 'message': 'User not logged in or no active dataset selected.'}), 400
 
-    def generate_analysis_stream(vn, ddl_list, doc_list, qa_list):
+    def generate_analysis_stream(vn, ddl_list, doc_list, qa_list, profiles):
         try:
             # The stream now starts after basic setup is complete
             yield f"data: {json.dumps({'type': 'info', 'message': '開始資料庫結構分析...'})}\n\n"
@@ -344,13 +394,15 @@ def analyze_schema():
             # Build limited context for the first LLM call
             context = build_limited_context(ddl_list, doc_list, qa_list)
             safe_prompt += context
+            if profiles:
+                safe_prompt += "\n\n=== 資料統計概況 ===\n" + format_profile_for_prompt(profiles)
             
             question = "請根據上述 DDL，生成一份全面的技術文件，詳細描述其架構與設計。"
             # Combine system and user prompts into a single user message
             full_prompt_for_analysis = safe_prompt + "\n\n" + question
             
             yield f"data: {json.dumps({'type': 'info', 'message': '正在呼叫 LLM 進行結構分析...'})}\n\n"
-            documentation_analysis = vn.submit_prompt([vn.user_message(full_prompt_for_analysis)])
+            documentation_analysis = vn.submit_prompt([vn.user_message(full_prompt_for_analysis)], priority='analysis')
             
             yield f"data: {json.dumps({'type': 'analysis_result', 'content': documentation_analysis})}\n\n"
             
@@ -371,7 +423,7 @@ def analyze_schema():
                 context_for_discovery = build_limited_context(ddl_list, doc_list, qa_list)
                 full_discovery_prompt = discovery_prompt + "\n\n" + context_for_discovery
                 
-                llm_response_str = vn.submit_prompt([vn.user_message(full_discovery_prompt)])
+                llm_response_str = vn.submit_prompt([vn.user_message(full_discovery_prompt)], priority='analysis')
                 
                 candidate_columns_from_llm = []
                 try:
@@ -395,7 +447,8 @@ def analyze_schema():
                 # Phase 2: Feature Extraction
                 yield f"data: {json.dumps({'type': 'info', 'message': '階段二：正在對每個候選欄位進行資料特徵提取...'})}\n\n"
                 
-                enriched_candidates = []
+                # Collect the QA literals of every candidate first, then profile all columns in one batch
+                candidate_values = {}
                 for i, candidate in enumerate(candidate_columns_from_llm):
                     table = candidate.get('表格名稱')
                     column = candidate.get('欄位名稱')
@@ -403,11 +456,22 @@ def analyze_schema():
 
                     yield f"data: {json.dumps({'type': 'info', 'message': f'正在提取 {table}.{column} 的特徵...'})}\n\n"
                     
-                    values_from_qa = [match for qa in qa_list if qa['sql'] for match in re.findall(rf"WHERE\s+`?{re.escape(column)}`?\s*(?:=|LIKE)\s*'([^']+)'", qa['sql'], re.IGNORECASE)]
-                    
-                    features = extract_column_features(values=values_from_qa)
+                    candidate_values[i] = [match for qa in qa_list if qa['sql'] for match in re.findall(rf"WHERE\s+`?{re.escape(column)}`?\s*(?:=|LIKE)\s*'([^']+)'", qa['sql'], re.IGNORECASE)]
+                    # Top values from the dataset catalog give real samples even without QA literals
+                    column_profile = profiles.get(table, {}).get('columns', {}).get(column)
+                    if column_profile:
+                        candidate_values[i] += [str(v) for v, _ in column_profile['top_values']]
+
+                features_by_candidate = extract_columns_features(candidate_values)
+
+                enriched_candidates = []
+                for i, values_from_qa in candidate_values.items():
+                    candidate = candidate_columns_from_llm[i]
+                    table = candidate.get('表格名稱')
+                    column = candidate.get('欄位名稱')
                     
                     ddl = next((d for d in ddl_list if f"CREATE TABLE {table}" in d or f'CREATE TABLE "{table}"' in d), "")
+                    column_profile = profiles.get(table, {}).get('columns', {}).get(column)
                     
                     enriched_candidates.append({
                         "排名": i + 1,
@@ -416,7 +480,8 @@ def analyze_schema():
                         "欄位名稱": column,
                         "資料類型": next((line.split()[1] for line in ddl.split('\n') if column in line), "UNKNOWN"),
                         "佐證資料": {"來自LLM的判斷依據": candidate.get('判斷依據', '')},
-                        "統計特徵": features,
+                        "統計特徵": features_by_candidate[i],
+                        "欄位概況": {k: column_profile[k] for k in ('null_fraction', 'distinct_estimate', 'min', 'max')} if column_profile else {},
                         "樣本資料": list(set(values_from_qa))[:10]
                     })
 
@@ -436,13 +501,13 @@ def analyze_schema():
 
                 full_final_prompt = final_prompt_template + "\n\n" + final_context
 
-                json_analysis_result = vn.submit_prompt([vn.user_message(full_final_prompt)])
+                json_analysis_result = vn.submit_prompt([vn.user_message(full_final_prompt)], priority='analysis')
                 yield f"data: {json.dumps({'type': 'info', 'message': '階段五：正在生成人類可讀的總結報告...'})}\n\n"
 
                 summary_prompt_template = load_prompt_template('serial_number_summary_generation')
                 full_summary_prompt = summary_prompt_template + "\n\n" + json_analysis_result
                 
-                summary_report = vn.submit_prompt([vn.user_message(full_summary_prompt)])
+                summary_report = vn.submit_prompt([vn.user_message(full_summary_prompt)], priority='analysis')
 
                 # Combine summary and JSON details into a single markdown string
                 serial_number_analysis_result = (
@@ -467,9 +532,9 @@ def analyze_schema():
             with get_user_db_connection(user_id) as conn:
                 cursor = conn.cursor()
                 if documentation_analysis.strip():
-                    cursor.execute("REPLACE INTO training_documentation (dataset_id, table_name, documentation_text) VALUES (?, ?, ?)", (dataset_id, '__dataset_analysis__', documentation_analysis))
+                    cursor.execute(UPSERT_DOCUMENTATION, (dataset_id, '__dataset_analysis__', documentation_analysis))
                 if serial_number_analysis_result.strip():
-                    cursor.execute("REPLACE INTO training_documentation (dataset_id, table_name, documentation_text) VALUES (?, ?, ?)", (dataset_id, '__serial_number_analysis__', serial_number_analysis_result))
+                    cursor.execute(UPSERT_DOCUMENTATION, (dataset_id, '__serial_number_analysis__', serial_number_analysis_result))
                 conn.commit()
             yield f"data: {json.dumps({'type': 'info', 'message': '分析結果已儲存。'})}\n\n"
 
@@ -496,13 +561,22 @@ def analyze_schema():
             cursor.execute("SELECT question, sql_query FROM training_qa WHERE dataset_id = ?", (dataset_id,))
             qa_list = [{'question': row[0], 'sql': row[1]} for row in cursor.fetchall()]
 
+            # Column statistics come from the persistent catalog; only tables missing from it are profiled
+            profiles = {}
+            cursor.execute("SELECT db_path FROM datasets WHERE id = ?", (dataset_id,))
+            row = cursor.fetchone()
+            if row:
+                dataset_info, _ = get_dataset_tables(user_id, dataset_id)
+                if dataset_info:
+                    profiles = refresh_dataset_profiles(conn, dataset_id, row[0], dataset_info['table_names'])
+
         # Add logging to inspect the fetched data
         logger.info(f"Fetched {len(ddl_list)} DDL statements for analysis.")
         logger.info(f"Fetched {len(doc_list)} documents for analysis.")
         logger.info(f"Fetched {len(qa_list)} QA pairs for analysis.")
 
         # Pass the prepared data to the generator
-        return Response(stream_with_context(generate_analysis_stream(vn, ddl_list, doc_list, qa_list)), mimetype='text/event-stream')
+        return Response(stream_with_context(generate_analysis_stream(vn, ddl_list, doc_list, qa_list, profiles)), mimetype='text/event-stream')
     except Exception as e:
         logger.exception("Error setting up analysis stream")
         # Return a single error event in case of setup failure
@@ -555,6 +629,8 @@ def clear_training_data():
         except Exception as e:
             # It's possible the collection doesn't exist, which is not a critical error in a clear operation.
             logger.warning(f"Could not delete ChromaDB collection '{dataset_id}' for user '{user_id}'. It might not exist. Error: {e}")
+        # The lexical (BM25) index mirrors the vector store and is rebuilt from it on the next query
+        vn.invalidate_lexical_index()
 
 
 
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import atexit
+import shutil
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+ASK_LOG_DIR = os.path.join(os.getcwd(), 'ask_log')
+# Buffered records are flushed at least this often, or earlier once FLUSH_MAX_RECORDS are pending.
+FLUSH_INTERVAL = 1.0
+FLUSH_MAX_RECORDS = 500
+# Each user's active segment is rotated once it exceeds MAX_SEGMENT_BYTES; MAX_SEGMENTS rotated files are kept.
+MAX_SEGMENT_BYTES = 5 * 1024 * 1024
+MAX_SEGMENTS = 3
+SEGMENT_NAME = 'ask.jsonl'
+_TRASH_DIR = '.trash'
+
+
+def _safe_name(user_id: str) -> str:
+    # No "." (as in db_utils.validate_user_id), so a name can never be ".", ".." or the trash directory
+    return "".join(c if c.isalnum() or c in '-_' else '_' for c in str(user_id)) or '_'
+
+
+class AskLogSink:
+    """
+    Buffered, append-only structured log for the ask pipeline.
+
+    Records are kept in memory per user and written by a background flusher as JSON lines to
+    `{log_dir}/{user}/ask.jsonl`, one batched append per user and flush. Segments are rotated by size.
+    Resetting a user renames their directory aside (O(1)); the flusher deletes it later.
+    """
+
+    def __init__(self, log_dir: str = ASK_LOG_DIR, flush_interval: float = FLUSH_INTERVAL,
+                 max_segment_bytes: int = MAX_SEGMENT_BYTES, max_segments: int = MAX_SEGMENTS):
+        self.log_dir = log_dir
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self._buffers = {}
+        self._pending = 0
+        # Bumped by reset(); records queued before a reset are dropped even if a flush already picked them up
+        self._generations = {}
+        self._lock = threading.Lock()
+        # Serializes file writes and resets so a reset never races a flush of the same user
+        self._io_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def _user_dir(self, user_id: str) -> str:
+        return os.path.join(self.log_dir, _safe_name(user_id))
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopped = False
+                    self._thread = threading.Thread(target=self._run, name='ask-log-flusher', daemon=True)
+                    self._thread.start()
+
+    def write(self, user_id: str, log_type: str, content):
+        """Queues one record; never touches the filesystem on the caller's thread."""
+        record = {"ts": time.time(), "type": log_type, "content": content}
+        with self._lock:
+            self._buffers.setdefault(user_id, []).append((self._generations.get(user_id, 0), record))
+            self._pending += 1
+            wake = self._pending >= FLUSH_MAX_RECORDS
+        if wake:
+            self._wakeup.set()
+        self._ensure_started()
+
+    def flush(self):
+        """Writes all buffered records to disk."""
+        with self._lock:
+            buffers, self._buffers, self._pending = self._buffers, {}, 0
+        if not buffers:
+            return
+        with self._io_lock:
+            for user_id, entries in buffers.items():
+                generation = self._generations.get(user_id, 0)
+                records = [record for gen, record in entries if gen == generation]
+                if not records:
+                    continue
+                try:
+                    self._append(user_id, records)
+                except OSError as e:
+                    logger.error(f"Failed to write ask log for user '{user_id}': {e}")
+
+    def _append(self, user_id: str, records: list):
+        user_dir = self._user_dir(user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        path = os.path.join(user_dir, SEGMENT_NAME)
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(data)
+            size = f.tell()
+        if size > self.max_segment_bytes:
+            self._rotate(path)
+
+    def _rotate(self, path: str):
+        # ask.jsonl -> ask.jsonl.1 -> ... -> ask.jsonl.{max_segments}; the oldest one is dropped
+        oldest = f"{path}.{self.max_segments}"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for i in range(self.max_segments - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        if self.max_segments > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+    def reset(self, user_id: str):
+        """Discards every record of a user, buffered or on disk, without scanning the log directory."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            dropped = self._buffers.pop(user_id, None)
+            if dropped:
+                self._pending -= len(dropped)
+        with self._io_lock:
+            user_dir = self._user_dir(user_id)
+            if not os.path.isdir(user_dir):
+                return
+            log_dir = os.path.realpath(self.log_dir)
+            if os.path.dirname(os.path.realpath(user_dir)) != log_dir:
+                # e.g. a symlink pointing elsewhere: never move (and later delete) anything outside the log directory
+                logger.error(f"Refusing to reset ask log for user '{user_id}': {user_dir} is outside {log_dir}")
+                return
+            trash_dir = os.path.join(self.log_dir, _TRASH_DIR)
+            os.makedirs(trash_dir, exist_ok=True)
+            try:
+                os.rename(user_dir, os.path.join(trash_dir, f"{_safe_name(user_id)}_{time.time_ns()}"))
+            except OSError as e:
+                logger.error(f"Failed to reset ask log for user '{user_id}': {e}")
+                return
+        self._wakeup.set()
+        self._ensure_started()
+
+    def read(self, user_id: str, limit: int = None) -> list:
+        """Returns the records of a user's active segment, oldest first, including unflushed ones."""
+        self.flush()
+        path = os.path.join(self._user_dir(user_id), SEGMENT_NAME)
+        records = []
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        return records[-limit:] if limit else records
+
+    def _purge_trash(self):
+        trash_dir = os.path.join(self.log_dir, _TRASH_DIR)
+        if not os.path.isdir(trash_dir):
+            return
+        for name in os.listdir(trash_dir):
+            shutil.rmtree(os.path.join(trash_dir, name), ignore_errors=True)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self._purge_trash()
+            except Exception as e:
+                logger.error(f"Ask log flusher error: {e}", exc_info=True)
+
+    def close(self):
+        """Stops the flusher and writes any remaining records."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+ask_log_sink = AskLogSink()
+atexit.register(ask_log_sink.close)
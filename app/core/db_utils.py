@@ -1,9 +1,12 @@
 import sqlite3
 import os
 import logging
-import json
 import re
 
+from .profile_catalog import create_catalog_tables
+from .training_search import create_training_fts, create_question_hash_index, recreate_fts_update_triggers, purge_orphaned_fts_rows
+from .prompt_cache import load_default_prompts, default_prompts_digest, invalidate_prompts
+
 handler = logging.StreamHandler()
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 handler.setFormatter(formatter)
@@ -11,6 +14,12 @@ logger = logging.getLogger(__name__)
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
+TRAINING_TABLES = ('training_ddl', 'training_documentation', 'training_qa')
+DEFAULT_PROMPTS_PATH = os.path.join(os.getcwd(), 'prompts', 'default_prompts.json')
+
+# db_path -> prompts digest this process has confirmed as seeded; lets warm connections skip schema_meta
+_seeded_digests = {}
+
 def validate_user_id(user_id: str) -> tuple[bool, str]:
     """验证用户ID是否符合要求，不含 . / 空白等特殊字符"""
     logger.debug(f"Validating user ID: '{user_id}'")
@@ -54,6 +63,11 @@ def get_user_db_connection(user_id: str) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
     
     cursor = conn.cursor()
+    # Fast path: schema is current and this process already confirmed the prompts are seeded
+    user_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if user_version == SCHEMA_VERSION and _seeded_digests.get(db_path) == default_prompts_digest(DEFAULT_PROMPTS_PATH):
+        return conn
+
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='datasets';")
     table_exists = cursor.fetchone()
     
@@ -62,9 +76,12 @@ def get_user_db_connection(user_id: str) -> sqlite3.Connection:
         _init_db_tables_and_prompts(conn, user_id)
         logger.info(f"Database initialization finished for user '{user_id}'.")
     else:
-        # This is for migrating older databases. Since we deleted the db, this won't run now,
-        # but it's good practice to keep it for future schema changes.
-        _run_migration_for_existing_db(conn, user_id)
+        # Schema migrations only run when the stored schema version is behind;
+        # default prompts are only re-seeded when the JSON file has changed.
+        if user_version < SCHEMA_VERSION:
+            _apply_migrations(conn, user_id, user_version)
+        _seed_default_prompts_if_changed(conn, user_id)
+    _seeded_digests[db_path] = default_prompts_digest(DEFAULT_PROMPTS_PATH)
 
     return conn
 
@@ -92,24 +109,51 @@ def _init_db_tables_and_prompts(conn: sqlite3.Connection, user_id: str):
         }
         for table_name, schema in tables.items():
             cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} {schema};")
+        _apply_migrations(conn, user_id, 0)
         
         _insert_default_prompts(conn)
+        _set_meta(cursor, 'default_prompts_digest', default_prompts_digest(DEFAULT_PROMPTS_PATH))
         
         conn.commit()
     except sqlite3.Error as e:
         logger.error(f"Could not initialize/update training database for user '{user_id}': {e}")
         raise
 
+def _create_schema_meta(cursor: sqlite3.Cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS schema_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+def _get_meta(cursor: sqlite3.Cursor, key: str):
+    row = cursor.execute("SELECT value FROM schema_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(cursor: sqlite3.Cursor, key: str, value):
+    cursor.execute("REPLACE INTO schema_meta (key, value) VALUES (?, ?)", (key, value))
+
+def _seed_default_prompts_if_changed(conn: sqlite3.Connection, user_id: str):
+    """Re-seeds the default prompts only when default_prompts.json differs from what was last seeded."""
+    cursor = conn.cursor()
+    _create_schema_meta(cursor)
+    digest = default_prompts_digest(DEFAULT_PROMPTS_PATH)
+    if digest is None or _get_meta(cursor, 'default_prompts_digest') == digest:
+        return
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='training_prompts';")
+    if not cursor.fetchone():
+        return
+    logger.info(f"Default prompts changed; re-seeding prompts for user '{user_id}'.")
+    _insert_default_prompts(conn)
+    _set_meta(cursor, 'default_prompts_digest', digest)
+    conn.commit()
+    invalidate_prompts(user_id)
+
 def _insert_default_prompts(conn: sqlite3.Connection):
     cursor = conn.cursor()
     try:
-        prompts_file_path = os.path.join(os.getcwd(), 'prompts', 'default_prompts.json')
+        prompts_file_path = DEFAULT_PROMPTS_PATH
         if not os.path.exists(prompts_file_path):
             logger.warning(f"Default prompts file not found at '{prompts_file_path}'. Skipping initialization.")
             return
 
-        with open(prompts_file_path, 'r', encoding='utf-8') as f:
-            default_prompts_content = json.load(f)
+        default_prompts_content = load_default_prompts(prompts_file_path)
 
         prompt_descriptions = {
             'sql_generation': '（核心）指導 AI 如何根據上下文生成 SQL 查詢。',
@@ -154,27 +198,102 @@ def _insert_default_prompts(conn: sqlite3.Connection):
     except Exception as e:
         logger.error(f"Failed to initialize default prompts from file: {e}")
 
-def _run_migration_for_existing_db(conn: sqlite3.Connection, user_id: str):
-    logger.info(f"Running migration check for existing database of user '{user_id}'.")
-    cursor = conn.cursor()
+def _add_column_if_not_exists(cursor: sqlite3.Cursor, table: str, column: str, col_type: str):
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [info[1] for info in cursor.fetchall()]:
+        logger.info(f"Applying schema migration: Adding column '{column}' to table '{table}'.")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
 
-    # Check if the prompts table exists before attempting migrations
+def _migration_001_baseline(cursor: sqlite3.Cursor):
+    """Columns added over time, the dataset profile catalog and the schema_meta table."""
+    _add_column_if_not_exists(cursor, 'training_ddl', 'dataset_id', 'TEXT')
+    _add_column_if_not_exists(cursor, 'training_qa', 'dataset_id', 'TEXT')
+    _add_column_if_not_exists(cursor, 'training_documentation', 'dataset_id', 'TEXT')
+    create_catalog_tables(cursor)
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='training_prompts';")
-    prompts_table_exists = cursor.fetchone()
+    if cursor.fetchone():
+        _add_column_if_not_exists(cursor, 'training_prompts', 'prompt_description', 'TEXT')
+    _create_schema_meta(cursor)
 
-    def add_column_if_not_exists(table, column, col_type):
-        cursor.execute(f"PRAGMA table_info({table})")
-        if column not in [info[1] for info in cursor.fetchall()]:
-            logger.info(f"Applying schema migration: Adding column '{column}' to table '{table}'.")
-            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+def _migration_002_normalize_dataset_id(cursor: sqlite3.Cursor):
+    """
+    Stores every dataset_id in its canonical TEXT form ('3', not 3, 3.0 or ' 3'), so that
+    equality lookups with normalize_dataset_id() values can always use the indexes below.
+    """
+    for table in TRAINING_TABLES:
+        cursor.execute(f"""
+            UPDATE {table}
+            SET dataset_id = CASE
+                WHEN typeof(dataset_id) IN ('integer', 'real') AND dataset_id = CAST(dataset_id AS INTEGER)
+                    THEN CAST(CAST(dataset_id AS INTEGER) AS TEXT)
+                ELSE TRIM(CAST(dataset_id AS TEXT))
+            END
+            WHERE dataset_id IS NOT NULL
+              AND (typeof(dataset_id) != 'text' OR dataset_id != TRIM(dataset_id))
+        """)
 
-    add_column_if_not_exists('training_ddl', 'dataset_id', 'TEXT')
-    add_column_if_not_exists('training_qa', 'dataset_id', 'TEXT')
-    add_column_if_not_exists('training_documentation', 'dataset_id', 'TEXT')
-    
-    # Only add description column if the table exists
-    if prompts_table_exists:
-        add_column_if_not_exists('training_prompts', 'prompt_description', 'TEXT')
-        _insert_default_prompts(conn)
-    
-    # Removed explicit commit call as the context manager handles this
\ No newline at end of file
+def _migration_003_training_indexes(cursor: sqlite3.Cursor):
+    """Composite indexes for the per-dataset lookups, counts and created_at-ordered pagination."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_training_qa_dataset_table_created ON training_qa (dataset_id, table_name, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_training_ddl_dataset ON training_ddl (dataset_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_training_documentation_dataset_table ON training_documentation (dataset_id, table_name)")
+    cursor.execute("ANALYZE")
+
+def _migration_004_training_fts(cursor: sqlite3.Cursor):
+    """FTS5 indexes (with sync triggers) over training QA and documentation."""
+    create_training_fts(cursor)
+
+def _migration_005_question_hash(cursor: sqlite3.Cursor):
+    """Normalized-question hash on training_qa for the exact-match lookup that runs before retrieval."""
+    create_question_hash_index(cursor)
+
+def _migration_006_fts_update_of_indexed_columns(cursor: sqlite3.Cursor):
+    """FTS update triggers fire only when an indexed column changes, not on question_hash backfills."""
+    recreate_fts_update_triggers(cursor)
+
+def _migration_007_purge_orphaned_fts_rows(cursor: sqlite3.Cursor):
+    """Removes FTS entries of documentation rows overwritten by REPLACE INTO; they skewed BM25 statistics."""
+    purge_orphaned_fts_rows(cursor)
+
+# Ordered (version, migration) pairs. Append new migrations here; never edit or reorder applied ones.
+MIGRATIONS = [
+    (1, _migration_001_baseline),
+    (2, _migration_002_normalize_dataset_id),
+    (3, _migration_003_training_indexes),
+    (4, _migration_004_training_fts),
+    (5, _migration_005_question_hash),
+    (6, _migration_006_fts_update_of_indexed_columns),
+    (7, _migration_007_purge_orphaned_fts_rows),
+]
+
+def _apply_migrations(conn: sqlite3.Connection, user_id: str, from_version: int):
+    """Applies every migration newer than from_version, committing and bumping user_version after each one."""
+    cursor = conn.cursor()
+    for version, migration in MIGRATIONS:
+        if version <= from_version:
+            continue
+        logger.info(f"Applying schema migration {version} ({migration.__name__}) for user '{user_id}'.")
+        try:
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Schema migration {version} failed for user '{user_id}': {e}")
+            raise
+
+def normalize_dataset_id(dataset_id) -> str:
+    """Canonical TEXT form of a dataset id as stored in the training tables (see migration 002)."""
+    if dataset_id is None:
+        return None
+    value = str(dataset_id).strip()
+    try:
+        number = float(value)
+        if number == int(number):
+            return str(int(number))
+    except (ValueError, OverflowError):
+        pass
+    return value
+
+# Latest schema version; stored in PRAGMA user_version once a DB is fully migrated.
+SCHEMA_VERSION = MIGRATIONS[-1][0]
@@ -0,0 +1,333 @@
+import json
+import math
+import sqlite3
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HLL_PRECISION = 12
+TOP_K = 10
+# Candidate counters kept per column while streaming; pruned back to this size after every chunk
+TOP_K_CAPACITY = 1000
+HISTOGRAM_BINS = 10
+RESERVOIR_SIZE = 10000
+INGEST_CHUNK_SIZE = 50000
+
+CATALOG_TABLES = {
+    "table_profiles": "(dataset_id INTEGER NOT NULL, table_name TEXT NOT NULL, row_count INTEGER NOT NULL, column_count INTEGER NOT NULL, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (dataset_id, table_name))",
+    "column_profiles": "(dataset_id INTEGER NOT NULL, table_name TEXT NOT NULL, column_name TEXT NOT NULL, ordinal INTEGER NOT NULL, data_type TEXT, row_count INTEGER NOT NULL, null_count INTEGER NOT NULL, null_fraction REAL, distinct_estimate INTEGER, min_value TEXT, max_value TEXT, top_values TEXT, histogram TEXT, hll BLOB, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (dataset_id, table_name, column_name))",
+}
+
+
+def create_catalog_tables(cursor: sqlite3.Cursor):
+    for table_name, schema in CATALOG_TABLES.items():
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} {schema};")
+
+
+class HyperLogLog:
+    """
+    Minimal HyperLogLog distinct-count sketch over 64-bit hashes, updated with NumPy.
+    Registers can be serialized and merged, so estimates stay mergeable across incremental loads.
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: np.ndarray = None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        rest_bits = 64 - self.precision
+        idx = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # rho = position of the leftmost 1-bit in the remaining bits (1-based)
+        rho = np.full(len(hashes), rest_bits + 1, dtype=np.int64)
+        nonzero = rest > 0
+        rho[nonzero] = rest_bits - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64)
+        np.maximum.at(self.registers, idx, np.clip(rho, 0, 255).astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros > 0:
+            # Small-range correction (linear counting)
+            return int(round(self.m * math.log(self.m / zeros)))
+        return int(round(raw))
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, precision: int = HLL_PRECISION) -> "HyperLogLog":
+        return cls(precision, np.frombuffer(data, dtype=np.uint8).copy())
+
+
+def _json_scalar(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if not isinstance(value, (int, float, str, bool)) and value is not None:
+        value = str(value)
+    return value
+
+
+class ColumnProfiler:
+    """Accumulates statistics for one column over a stream of chunks."""
+
+    def __init__(self, name: str, ordinal: int, rng: np.random.Generator):
+        self.name = name
+        self.ordinal = ordinal
+        self.rng = rng
+        self.data_type = None
+        self.row_count = 0
+        self.null_count = 0
+        self.hll = HyperLogLog()
+        self.min_value = None
+        self.max_value = None
+        self.counts = {}
+        self.numeric_seen = 0
+        self.reservoir = np.empty(0, dtype=np.float64)
+
+    def update(self, series: pd.Series):
+        self.row_count += len(series)
+        if self.data_type is None and len(series):
+            self.data_type = str(series.dtype)
+        values = series.dropna()
+        self.null_count += len(series) - len(values)
+        if values.empty:
+            return
+
+        self.hll.add_hashes(pd.util.hash_pandas_object(values, index=False).to_numpy())
+
+        for value, count in values.value_counts().items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        if len(self.counts) > TOP_K_CAPACITY:
+            kept = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:TOP_K_CAPACITY]
+            self.counts = dict(kept)
+
+        numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+        if numeric:
+            array = values.to_numpy(dtype=np.float64)
+            finite = np.isfinite(array)
+            if not finite.all():
+                # inf / -inf (read_csv parses "inf" and "Infinity") stay in the counts but not in the range or histogram
+                values, array = values[finite], array[finite]
+                if values.empty:
+                    return
+            self._update_reservoir(array)
+        comparable = values if numeric else values.astype(str)
+        chunk_min, chunk_max = comparable.min(), comparable.max()
+        try:
+            if self.min_value is None or chunk_min < self.min_value:
+                self.min_value = chunk_min
+            if self.max_value is None or chunk_max > self.max_value:
+                self.max_value = chunk_max
+        except TypeError:
+            # Chunks inferred with different dtypes (e.g. numbers, then text): fall back to string order
+            self.min_value = min(str(self.min_value), str(chunk_min))
+            self.max_value = max(str(self.max_value), str(chunk_max))
+
+    def _update_reservoir(self, values: np.ndarray):
+        free = RESERVOIR_SIZE - len(self.reservoir)
+        if free > 0:
+            self.reservoir = np.concatenate([self.reservoir, values[:free]])
+        rest = values[max(free, 0):]
+        if len(rest):
+            # Vectorized Algorithm R: item n replaces a random slot with probability RESERVOIR_SIZE / n
+            positions = self.numeric_seen + max(free, 0) + np.arange(1, len(rest) + 1)
+            slots = (self.rng.random(len(rest)) * positions).astype(np.int64)
+            keep = slots < RESERVOIR_SIZE
+            self.reservoir[slots[keep]] = rest[keep]
+        self.numeric_seen += len(values)
+
+    def finalize(self) -> dict:
+        non_null = self.row_count - self.null_count
+        top_values = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:TOP_K]
+        histogram = None
+        if (len(self.reservoir) and isinstance(self.min_value, (int, float, np.number)) and isinstance(self.max_value, (int, float, np.number))
+                and np.isfinite([self.min_value, self.max_value]).all()):
+            # Equi-width histogram over the reservoir, scaled up to the count of finite values
+            counts, edges = np.histogram(self.reservoir, bins=HISTOGRAM_BINS, range=(float(self.min_value), float(self.max_value)))
+            scale = self.numeric_seen / len(self.reservoir)
+            histogram = {"edges": [round(float(e), 6) for e in edges], "counts": [int(round(c * scale)) for c in counts]}
+
+        return {
+            "column_name": self.name,
+            "ordinal": self.ordinal,
+            "data_type": self.data_type,
+            "row_count": self.row_count,
+            "null_count": self.null_count,
+            "null_fraction": round(self.null_count / self.row_count, 4) if self.row_count else None,
+            "distinct_estimate": min(self.hll.estimate(), non_null),
+            "min_value": _json_scalar(self.min_value),
+            "max_value": _json_scalar(self.max_value),
+            "top_values": [[_json_scalar(v), c] for v, c in top_values],
+            "histogram": histogram,
+            "hll": self.hll.to_bytes(),
+        }
+
+
+class TableProfiler:
+    """
+    Profiles a table in one pass while it is being loaded chunk by chunk.
+
+    Example:
+        profiler = TableProfiler('orders')
+        for chunk in pd.read_csv(f, chunksize=INGEST_CHUNK_SIZE):
+            chunk.to_sql(...)
+            profiler.update(chunk)
+        profile = profiler.finalize()
+    """
+
+    def __init__(self, table_name: str, seed: int = None):
+        self.table_name = table_name
+        self.row_count = 0
+        self.columns = {}
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, df: pd.DataFrame):
+        self.row_count += len(df)
+        for column in df.columns:
+            profiler = self.columns.get(column)
+            if profiler is None:
+                profiler = self.columns[column] = ColumnProfiler(column, len(self.columns), self.rng)
+            profiler.update(df[column])
+
+    def finalize(self) -> dict:
+        return {
+            "table_name": self.table_name,
+            "row_count": self.row_count,
+            "columns": [p.finalize() for p in self.columns.values()],
+        }
+
+
+def profile_sqlite_table(db_path: str, table_name: str, chunk_size: int = INGEST_CHUNK_SIZE) -> dict:
+    """Profiles an existing table of a dataset file with one chunked sequential read."""
+    profiler = TableProfiler(table_name)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        quoted = '"' + table_name.replace('"', '""') + '"'
+        for chunk in pd.read_sql_query(f"SELECT * FROM {quoted}", conn, chunksize=chunk_size):
+            profiler.update(chunk)
+    finally:
+        conn.close()
+    return profiler.finalize()
+
+
+def save_table_profile(conn: sqlite3.Connection, dataset_id, profile: dict):
+    """Replaces the catalog entries of one table. The caller commits."""
+    cursor = conn.cursor()
+    dataset_id = int(dataset_id)
+    table_name = profile["table_name"]
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute("DELETE FROM column_profiles WHERE dataset_id = ? AND table_name = ?", (dataset_id, table_name))
+    cursor.execute(
+        "REPLACE INTO table_profiles (dataset_id, table_name, row_count, column_count, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (dataset_id, table_name, profile["row_count"], len(profile["columns"]), now)
+    )
+    cursor.executemany(
+        """INSERT INTO column_profiles (dataset_id, table_name, column_name, ordinal, data_type, row_count, null_count,
+               null_fraction, distinct_estimate, min_value, max_value, top_values, histogram, hll, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (dataset_id, table_name, col["column_name"], col["ordinal"], col["data_type"], col["row_count"],
+             col["null_count"], col["null_fraction"], col["distinct_estimate"],
+             json.dumps(col["min_value"], ensure_ascii=False), json.dumps(col["max_value"], ensure_ascii=False),
+             json.dumps(col["top_values"], ensure_ascii=False), json.dumps(col["histogram"]), col["hll"], now)
+            for col in profile["columns"]
+        ]
+    )
+
+
+def delete_table_profiles(conn: sqlite3.Connection, dataset_id, table_name: str = None):
+    """Removes catalog entries of one table, or of the whole dataset when table_name is None. The caller commits."""
+    cursor = conn.cursor()
+    for catalog_table in ("table_profiles", "column_profiles"):
+        if table_name is None:
+            cursor.execute(f"DELETE FROM {catalog_table} WHERE dataset_id = ?", (int(dataset_id),))
+        else:
+            cursor.execute(f"DELETE FROM {catalog_table} WHERE dataset_id = ? AND table_name = ?", (int(dataset_id), table_name))
+
+
+def get_dataset_profile(conn: sqlite3.Connection, dataset_id) -> dict:
+    """
+    Reads the catalog of a dataset.
+    Returns {table_name: {"row_count": int, "columns": {column_name: stats}}}, columns in ordinal order.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT table_name, row_count FROM table_profiles WHERE dataset_id = ? ORDER BY table_name", (int(dataset_id),))
+    profiles = {row[0]: {"row_count": row[1], "columns": {}} for row in cursor.fetchall()}
+    cursor.execute(
+        """SELECT table_name, column_name, data_type, null_count, null_fraction, distinct_estimate,
+                  min_value, max_value, top_values, histogram
+           FROM column_profiles WHERE dataset_id = ? ORDER BY table_name, ordinal""",
+        (int(dataset_id),)
+    )
+    for row in cursor.fetchall():
+        table = profiles.get(row[0])
+        if table is None:
+            continue
+        table["columns"][row[1]] = {
+            "data_type": row[2],
+            "null_count": row[3],
+            "null_fraction": row[4],
+            "distinct_estimate": row[5],
+            "min": json.loads(row[6]) if row[6] else None,
+            "max": json.loads(row[7]) if row[7] else None,
+            "top_values": json.loads(row[8]) if row[8] else [],
+            "histogram": json.loads(row[9]) if row[9] else None,
+        }
+    return profiles
+
+
+def refresh_dataset_profiles(conn: sqlite3.Connection, dataset_id, db_path: str, table_names: list) -> dict:
+    """
+    Incremental refresh: profiles only the tables that have no catalog entry yet and
+    drops entries of tables that no longer exist. Returns the up-to-date catalog.
+    """
+    profiles = get_dataset_profile(conn, dataset_id)
+    changed = False
+    for stale in set(profiles) - set(table_names):
+        delete_table_profiles(conn, dataset_id, stale)
+        changed = True
+    for table_name in table_names:
+        if table_name in profiles:
+            continue
+        try:
+            save_table_profile(conn, dataset_id, profile_sqlite_table(db_path, table_name))
+            changed = True
+        except Exception as e:
+            logger.warning(f"Could not profile table '{table_name}' of dataset {dataset_id}: {e}")
+    if changed:
+        conn.commit()
+        profiles = get_dataset_profile(conn, dataset_id)
+    return profiles
+
+
+def format_profile_for_prompt(profiles: dict, max_top_values: int = 5) -> str:
+    """Renders the catalog as compact text for LLM prompts."""
+    lines = []
+    for table_name, table in profiles.items():
+        lines.append(f"Table {table_name}: {table['row_count']} rows")
+        for column_name, stats in table["columns"].items():
+            parts = [f"distinct≈{stats['distinct_estimate']}"]
+            if stats["null_fraction"]:
+                parts.append(f"nulls={stats['null_fraction']:.1%}")
+            if stats["min"] is not None:
+                parts.append(f"range=[{stats['min']} .. {stats['max']}]")
+            if stats["top_values"]:
+                top = ", ".join(f"{v} ({c})" for v, c in stats["top_values"][:max_top_values])
+                parts.append(f"top: {top}")
+            lines.append(f"  - {column_name} ({stats['data_type']}): " + "; ".join(parts))
+    return "\n".join(lines)
@@ -0,0 +1,165 @@
+import numpy as np
+
+# Character classes, numbered from 1 so they can be used directly as bincount offsets (class - 1)
+LETTER, DIGIT, SYMBOL = 1, 2, 3
+_CLASS_NAMES = {LETTER: 'letter', DIGIT: 'digit', SYMBOL: 'symbol'}
+
+# Above these sizes the profiler switches from dense lookup tables / counters to sort-based np.unique
+_LUT_LIMIT = 0x10000
+_DENSE_LIMIT = 8_000_000
+
+
+def encode_samples(samples: list) -> tuple:
+    """
+    Encodes a list of values into a padded (n_samples, max_len) matrix of Unicode codepoints.
+    Returns the codepoint matrix and the length of every sample.
+    """
+    if not samples:
+        return np.zeros((0, 0), dtype=np.uint32), np.zeros(0, dtype=np.int64)
+
+    arr = np.asarray([str(s) for s in samples], dtype=np.str_)
+    width = arr.dtype.itemsize // 4
+    codes = arr.view(np.uint32).reshape(len(arr), width)
+    lengths = np.char.str_len(arr).astype(np.int64)
+    return codes, lengths
+
+
+def classify_codepoints(codepoints: np.ndarray) -> np.ndarray:
+    """
+    Maps codepoints to LETTER / DIGIT / SYMBOL using the same rules as str.isalpha / str.isdigit.
+    ASCII is classified with array comparisons; the (few) distinct non-ASCII codepoints fall back to Python.
+    """
+    codepoints = np.asarray(codepoints, dtype=np.uint32)
+    classes = np.full(codepoints.shape, SYMBOL, dtype=np.int8)
+    classes[(codepoints >= 48) & (codepoints <= 57)] = DIGIT
+    upper = (codepoints >= 65) & (codepoints <= 90)
+    lower = (codepoints >= 97) & (codepoints <= 122)
+    classes[upper | lower] = LETTER
+
+    non_ascii = codepoints > 127
+    if non_ascii.any():
+        for i in np.flatnonzero(non_ascii):
+            c = chr(int(codepoints[i]))
+            classes[i] = LETTER if c.isalpha() else DIGIT if c.isdigit() else SYMBOL
+    return classes
+
+
+def _empty_features() -> dict:
+    return {
+        "total_samples": 0,
+        "unique_count": 0,
+        "null_count": "N/A",
+        "length_distribution": {},
+        "character_composition": {}
+    }
+
+
+def profile_columns(columns: dict) -> dict:
+    """
+    Profiles many columns at once. `columns` maps a column key to its list of sampled values.
+
+    All samples are encoded into a single padded codepoint matrix, and per-position entropy,
+    character class distributions and length statistics are computed with array operations.
+    Returns a dict mapping each column key to the same feature structure as extract_column_features.
+    """
+    keys = list(columns.keys())
+    results = {key: _empty_features() for key in keys}
+
+    # Samples of each column are stored contiguously; offsets[i]:offsets[i + 1] is column i
+    all_samples, offsets = [], [0]
+    for key in keys:
+        all_samples.extend(str(v) for v in (columns[key] or []) if v is not None)
+        offsets.append(len(all_samples))
+    if not all_samples:
+        return results
+
+    codes, lengths = encode_samples(all_samples)
+    col_ids = np.repeat(np.arange(len(keys), dtype=np.int64), np.diff(offsets))
+    n_cols, width = len(keys), codes.shape[1]
+
+    # Flatten every real (non-padding) character to (column, position, codepoint)
+    valid = np.arange(width)[None, :] < lengths[:, None]
+    rows, pos = np.nonzero(valid)
+    flat_codes = codes[rows, pos]
+    flat_cols = col_ids[rows]
+
+    # Dense codepoint ids; a lookup table avoids sorting when all codepoints are in the BMP
+    if flat_codes.size and int(flat_codes.max()) < _LUT_LIMIT:
+        present = np.zeros(int(flat_codes.max()) + 1, dtype=bool)
+        present[flat_codes] = True
+        uniq_codes = np.flatnonzero(present)
+        lut = np.cumsum(present) - 1
+        code_idx = lut[flat_codes]
+    else:
+        uniq_codes, code_idx = np.unique(flat_codes, return_inverse=True)
+        code_idx = code_idx.reshape(-1)
+    n_codes = len(uniq_codes)
+    flat_classes = classify_codepoints(uniq_codes)[code_idx].astype(np.int64)
+
+    # Character composition per column
+    composition = np.bincount(flat_cols * 3 + (flat_classes - 1), minlength=n_cols * 3).reshape(n_cols, 3)
+
+    # Per (column, position) entropy over the codepoint distribution; dense counts when they fit, sparse otherwise
+    group = flat_cols * width + pos
+    n_groups = n_cols * width
+    pair_keys = group * n_codes + code_idx
+    if n_groups * n_codes <= _DENSE_LIMIT:
+        pair_counts = np.bincount(pair_keys, minlength=n_groups * n_codes)
+        pair_keys = np.flatnonzero(pair_counts)
+        pair_counts = pair_counts[pair_keys]
+    else:
+        pair_keys, pair_counts = np.unique(pair_keys, return_counts=True)
+    pair_groups = pair_keys // n_codes
+    totals = np.bincount(pair_groups, weights=pair_counts, minlength=n_groups)
+    probs = pair_counts / totals[pair_groups]
+    entropies = np.bincount(pair_groups, weights=-probs * np.log2(probs), minlength=n_groups).reshape(n_cols, width)
+    totals = totals.reshape(n_cols, width)
+
+    # Dominant character class per (column, position); ties resolve as letter > digit > symbol
+    type_counts = np.bincount(group * 3 + (flat_classes - 1), minlength=n_groups * 3).reshape(n_cols, width, 3)
+    dominant = type_counts.argmax(axis=2) + 1
+
+    for col_idx, key in enumerate(keys):
+        start, end = offsets[col_idx], offsets[col_idx + 1]
+        col_lengths = lengths[start:end]
+        if col_lengths.size == 0:
+            continue
+
+        # Mode ties resolve to the length seen first, matching Counter.most_common
+        length_counts = np.bincount(col_lengths)
+        tied = np.flatnonzero(length_counts == length_counts.max())
+        mode = int(tied[0]) if tied.size == 1 else int(col_lengths[np.isin(col_lengths, tied)][0])
+        max_len = int(col_lengths.max())
+        length_dist = {
+            "min": int(col_lengths.min()),
+            "max": max_len,
+            "mode": mode,
+            "median": int(np.median(col_lengths)),
+            "std_dev": float(np.std(col_lengths))
+        }
+
+        alpha_count, digit_count, symbol_count = (int(c) for c in composition[col_idx])
+        total_chars = alpha_count + digit_count + symbol_count
+        char_comp = {
+            "alpha_ratio": round(alpha_count / total_chars, 2) if total_chars > 0 else 0,
+            "digit_ratio": round(digit_count / total_chars, 2) if total_chars > 0 else 0,
+            "symbol_ratio": round(symbol_count / total_chars, 2) if total_chars > 0 else 0,
+        }
+        char_comp["position_analysis"] = [
+            {
+                "pos": i,
+                "type": _CLASS_NAMES[int(dominant[col_idx, i])],
+                "entropy": round(float(entropies[col_idx, i]) + 0.0, 2)
+            }
+            for i in range(max_len) if totals[col_idx, i] > 0
+        ]
+
+        results[key] = {
+            "total_samples": int(col_lengths.size),
+            "unique_count": int(len(set(all_samples[start:end]))),
+            "null_count": 0,
+            "length_distribution": length_dist,
+            "character_composition": char_comp
+        }
+
+    return results
@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPTS_PATH = os.path.join(os.getcwd(), 'prompts', 'default_prompts.json')
+
+# (user_id, prompt_type) -> ((global version, user version), prompt content)
+_template_cache = {}
+# Bumped by invalidate_prompts(); entries cached under an older version are treated as misses
+_user_versions = {}
+_global_version = 0
+_cache_lock = threading.Lock()
+
+# path -> (mtime, {prompt_type: content}, sha256 of the file)
+_defaults_cache = {}
+_defaults_lock = threading.Lock()
+
+
+def load_default_prompts(path: str = DEFAULT_PROMPTS_PATH) -> dict:
+    """
+    Returns the default prompts keyed by prompt type. The JSON file is parsed once per process
+    and only re-read when its mtime changes. Returns an empty dict if the file is missing.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+
+    with _defaults_lock:
+        cached = _defaults_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as f:
+            data = f.read()
+        raw = json.loads(data.decode('utf-8'))
+        prompts = {key: value for key, value in raw.items() if isinstance(value, str)}
+        _defaults_cache[path] = (mtime, prompts, hashlib.sha256(data).hexdigest())
+        logger.debug(f"Loaded {len(prompts)} default prompts from '{path}'.")
+        return prompts
+
+
+def default_prompts_digest(path: str = DEFAULT_PROMPTS_PATH) -> str:
+    """SHA-256 of the default prompts file (computed when the file is parsed), or None if it is missing."""
+    if not load_default_prompts(path):
+        return None
+    with _defaults_lock:
+        cached = _defaults_cache.get(path)
+        return cached[2] if cached else None
+
+
+def _current_version(user_id: str) -> tuple:
+    return (_global_version, _user_versions.get(user_id, 0))
+
+
+def get_cached_prompt(user_id: str, prompt_type: str):
+    with _cache_lock:
+        entry = _template_cache.get((user_id, prompt_type))
+        if entry and entry[0] == _current_version(user_id):
+            return entry[1]
+    return None
+
+
+def cache_prompt(user_id: str, prompt_type: str, content: str, version: tuple = None) -> str:
+    """
+    Caches a prompt for (user, prompt_type). `version` should be the value of prompt_version()
+    taken before the prompt was read, so a concurrent invalidation is never overwritten by stale content.
+    """
+    with _cache_lock:
+        current = _current_version(user_id)
+        if version is None or version == current:
+            _template_cache[(user_id, prompt_type)] = (current, content)
+    return content
+
+
+def prompt_version(user_id: str) -> tuple:
+    with _cache_lock:
+        return _current_version(user_id)
+
+
+def invalidate_prompts(user_id: str = None):
+    """Invalidates the cached prompts of one user, or of every user."""
+    global _global_version
+    with _cache_lock:
+        if user_id is None:
+            _global_version += 1
+            _template_cache.clear()
+            return
+        _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+        for key in [k for k in _template_cache if k[0] == user_id]:
+            del _template_cache[key]
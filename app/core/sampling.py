@@ -0,0 +1,163 @@
+import os
+import random
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Tables with at most this many rowids are sampled with one sequential scan; larger ones use random rowid probes.
+SCAN_THRESHOLD = 50000
+# Each probe round asks for sample_size * PROBE_FACTOR random rowids.
+PROBE_FACTOR = 4
+MAX_PROBE_ROUNDS = 8
+MAX_CACHED_TABLES = 256
+
+_sample_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _quote(identifier: str) -> str:
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def _connect_readonly(db_path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, check_same_thread=False)
+
+
+def _reservoir_scan(cursor, table_name: str, columns: list, sample_size: int, rng: random.Random) -> dict:
+    """
+    Streams the table once and keeps a uniform reservoir of distinct non-null values per column.
+    """
+    col_sql = ", ".join(_quote(c) for c in columns)
+    cursor.execute(f"SELECT {col_sql} FROM {_quote(table_name)}")
+
+    seen = [set() for _ in columns]
+    reservoirs = [[] for _ in columns]
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        for row in rows:
+            for i, value in enumerate(row):
+                if value is None or value in seen[i]:
+                    continue
+                seen[i].add(value)
+                reservoir = reservoirs[i]
+                if len(reservoir) < sample_size:
+                    reservoir.append(value)
+                else:
+                    j = rng.randrange(len(seen[i]))
+                    if j < sample_size:
+                        reservoir[j] = value
+    return {col: reservoirs[i] for i, col in enumerate(columns)}
+
+
+def _rowid_probe(cursor, table_name: str, columns: list, sample_size: int, min_rowid: int, max_rowid: int, rng: random.Random) -> tuple:
+    """
+    Fetches rows at random rowids (index lookups, no scan or sort) until every column
+    has sample_size distinct non-null values or the probe budget is spent.
+    Returns the samples and the number of rows the probes hit.
+    """
+    col_sql = ", ".join(_quote(c) for c in columns)
+    samples = [dict() for _ in columns]  # dicts keep insertion order and act as ordered sets
+    span = max_rowid - min_rowid + 1
+    probed = set()
+    rows_found = 0
+
+    for _ in range(MAX_PROBE_ROUNDS):
+        if all(len(s) >= sample_size for s in samples) or len(probed) >= span:
+            break
+        batch = []
+        for _ in range(min(sample_size * PROBE_FACTOR, span - len(probed))):
+            rowid = rng.randint(min_rowid, max_rowid)
+            if rowid not in probed:
+                probed.add(rowid)
+                batch.append(rowid)
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(batch), 900):
+            chunk = batch[start:start + 900]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(f"SELECT {col_sql} FROM {_quote(table_name)} WHERE rowid IN ({placeholders})", chunk)
+            for row in cursor.fetchall():
+                rows_found += 1
+                for i, value in enumerate(row):
+                    if value is not None and len(samples[i]) < sample_size:
+                        samples[i][value] = None
+
+    return {col: list(samples[i]) for i, col in enumerate(columns)}, rows_found
+
+
+def sample_table_columns(db_path: str, table_name: str, columns: list, sample_size: int = 100, seed: int = None) -> dict:
+    """
+    Samples distinct non-null values for several columns of the same table in a single pass.
+
+    Small tables are read once with reservoir sampling; large rowid tables are sampled
+    with random rowid probes, so no ORDER BY RANDOM() sort is ever needed.
+    Returns a dict mapping each column name to its list of sampled values.
+    """
+    rng = random.Random(seed)
+    conn = _connect_readonly(db_path)
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {_quote(table_name)}")
+            min_rowid, max_rowid = cursor.fetchone()
+        except sqlite3.OperationalError:
+            # WITHOUT ROWID tables have no rowid to probe
+            min_rowid = max_rowid = None
+
+        if min_rowid is None or max_rowid - min_rowid + 1 <= SCAN_THRESHOLD:
+            return _reservoir_scan(cursor, table_name, columns, sample_size, rng)
+
+        samples, rows_found = _rowid_probe(cursor, table_name, columns, sample_size, min_rowid, max_rowid, rng)
+        if rows_found == 0:
+            # Very sparse rowid space (e.g. after mass deletes): fall back to one sequential pass
+            logger.debug(f"Rowid probing on {table_name} hit no rows, falling back to a scan.")
+            return _reservoir_scan(cursor, table_name, columns, sample_size, rng)
+        return samples
+    finally:
+        conn.close()
+
+
+def get_column_samples(db_path: str, table_name: str, columns: list, sample_size: int = 100) -> dict:
+    """
+    Cached front-end for sample_table_columns, keyed by (db_path, table, mtime, sample_size).
+    Columns not yet cached for a table are sampled together in one pass and merged into the entry.
+    """
+    try:
+        mtime = os.path.getmtime(db_path)
+    except OSError:
+        return {col: [] for col in columns}
+
+    key = (os.path.abspath(db_path), table_name, mtime, sample_size)
+    with _cache_lock:
+        entry = _sample_cache.get(key)
+        if entry is not None:
+            _sample_cache.move_to_end(key)
+            missing = [c for c in columns if c not in entry]
+        else:
+            missing = list(columns)
+
+    if missing:
+        fresh = sample_table_columns(db_path, table_name, missing, sample_size)
+        with _cache_lock:
+            entry = _sample_cache.setdefault(key, {})
+            entry.update(fresh)
+            _sample_cache.move_to_end(key)
+            while len(_sample_cache) > MAX_CACHED_TABLES:
+                _sample_cache.popitem(last=False)
+
+    return {col: entry[col] for col in columns}
+
+
+def invalidate_samples(db_path: str = None):
+    """Drops cached samples for one database file, or all of them."""
+    with _cache_lock:
+        if db_path is None:
+            _sample_cache.clear()
+            return
+        path = os.path.abspath(db_path)
+        for key in [k for k in _sample_cache if k[0] == path]:
+            del _sample_cache[key]
@@ -0,0 +1,321 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+
+from vanna.sql_stream import stop_after_sql_block
+
+logger = logging.getLogger(__name__)
+
+# Deterministic fixes tried per failing statement before the LLM is asked
+MAX_DETERMINISTIC_STEPS = 6
+# An identifier is only replaced by a schema name at most this far away (and within a third of its length)
+MAX_EDIT_DISTANCE = 3
+
+# (abspath, mtime) -> {table: [columns]}
+_catalog_cache = {}
+_cache_lock = threading.Lock()
+
+_ERROR_PATTERNS = [
+    ("column", re.compile(r"no such column: ([\w.\"`\[\]]+)", re.IGNORECASE)),
+    ("table", re.compile(r"no such table: ([\w.\"`\[\]]+)", re.IGNORECASE)),
+    ("function", re.compile(r"no such function: (\w+)", re.IGNORECASE)),
+    ("ambiguous", re.compile(r"ambiguous column name: ([\w.]+)", re.IGNORECASE)),
+    ("syntax", re.compile(r'near "([^"]*)": syntax error', re.IGNORECASE)),
+]
+
+# Single-quoted string literals, left alone by identifier replacement
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+# Literals and double-quoted identifiers, masked before function calls are parsed
+_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+# MySQL DATE_FORMAT specifiers with a SQLite strftime equivalent
+_STRFTIME_SPECIFIERS = {"%Y": "%Y", "%m": "%m", "%d": "%d", "%H": "%H", "%i": "%M", "%s": "%S", "%S": "%S",
+                        "%j": "%j", "%w": "%w", "%T": "%H:%M:%S", "%%": "%%"}
+
+
+def _date_format(args):
+    # MySQL DATE_FORMAT(date, fmt) -> SQLite strftime(fmt, date); only literal formats can be translated
+    if len(args) != 2 or not re.fullmatch(r"'[^']*'", args[1]):
+        return None
+    fmt = args[1][1:-1]
+    if any(spec not in _STRFTIME_SPECIFIERS for spec in re.findall(r"%.", fmt)):
+        return None
+    fmt = re.sub(r"%.", lambda m: _STRFTIME_SPECIFIERS[m.group(0)], fmt)
+    return f"strftime('{fmt}', {args[0]})"
+
+
+def _isnull(args):
+    # MySQL ISNULL(x) is a test; SQL Server ISNULL(x, y) is IFNULL
+    if len(args) == 1:
+        return f"({args[0]} IS NULL)"
+    return f"IFNULL({args[0]}, {args[1]})" if len(args) == 2 else None
+
+
+def _date_part(fmt):
+    return lambda args: f"CAST(strftime('{fmt}', {args[0]}) AS INTEGER)" if len(args) == 1 else None
+
+
+# MySQL / PostgreSQL functions the model tends to write: name -> rewrite(argument texts) -> SQLite text (None: no fix)
+_FUNCTION_FIXES = {
+    "NOW": lambda args: "datetime('now')" if not args else None,
+    "CURDATE": lambda args: "date('now')" if not args else None,
+    "YEAR": _date_part("%Y"),
+    "MONTH": _date_part("%m"),
+    "DAY": _date_part("%d"),
+    "DATE_FORMAT": _date_format,
+    "ISNULL": _isnull,
+    "CONCAT": lambda args: "(" + " || ".join(args) + ")" if args else None,
+}
+
+
+def _mask_quoted(sql: str) -> str:
+    """The statement with the inside of every literal and quoted identifier blanked out, offsets unchanged."""
+    return _QUOTED.sub(lambda m: m.group(0)[0] + " " * (len(m.group(0)) - 2) + m.group(0)[-1], sql)
+
+
+def _call_arguments(masked: str, open_paren: int):
+    """(end offset past the closing parenthesis, [(start, end) of each argument]) or None if unbalanced."""
+    depth, start, spans = 0, open_paren + 1, []
+    for i in range(open_paren, len(masked)):
+        char = masked[i]
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                spans.append((start, i))
+                return i + 1, spans
+        elif char == "," and depth == 1:
+            spans.append((start, i))
+            start = i + 1
+    return None
+
+
+def rewrite_function_calls(sql: str, name: str, rewrite) -> str:
+    """
+    Rewrites every call of function `name` with rewrite([argument texts]). Calls are found on the
+    statement with literals masked, so parentheses and commas inside strings never count, and
+    arguments are split at top-level commas, so nested calls (YEAR(date(x))) stay intact.
+    Calls that rewrite() returns None for are left as they are.
+    """
+    masked = _mask_quoted(sql)
+    pattern = re.compile(rf"(?<![\w.]){re.escape(name)}\s*\(", re.IGNORECASE)
+    parts, pos = [], 0
+    for match in pattern.finditer(masked):
+        if match.start() < pos:
+            continue
+        call = _call_arguments(masked, match.end() - 1)
+        if call is None:
+            break
+        end, spans = call
+        args = [rewrite_function_calls(sql[a:b], name, rewrite).strip() for a, b in spans]
+        if args == [""]:
+            args = []
+        replacement = rewrite(args)
+        if replacement is not None:
+            parts.append(sql[pos:match.start()])
+            parts.append(replacement)
+            pos = end
+    parts.append(sql[pos:])
+    return "".join(parts)
+
+
+class SQLRepairFailed(Exception):
+    """Raised when neither the deterministic fixes nor the LLM attempts produced SQL that runs."""
+
+    def __init__(self, error: str, steps: list):
+        super().__init__(error)
+        self.error = error
+        self.steps = steps
+
+
+def get_schema_catalog(db_path: str) -> dict:
+    """{table: [columns]} of a SQLite dataset, cached until the file's mtime changes."""
+    try:
+        key = (os.path.abspath(db_path), os.path.getmtime(db_path))
+    except (OSError, TypeError):
+        return {}
+    with _cache_lock:
+        if key in _catalog_cache:
+            return _catalog_cache[key]
+
+    catalog = {}
+    conn = sqlite3.connect(f"file:{key[0]}?mode=ro", uri=True)
+    try:
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'").fetchall()
+        for (table,) in tables:
+            catalog[table] = [row[1] for row in conn.execute(f'PRAGMA table_info("{table.replace(chr(34), chr(34) * 2)}")')]
+    finally:
+        conn.close()
+
+    with _cache_lock:
+        for stale in [k for k in _catalog_cache if k[0] == key[0]]:
+            del _catalog_cache[stale]
+        _catalog_cache[key] = catalog
+    return catalog
+
+
+def parse_sql_error(message: str):
+    """Classifies a SQLite error message: {"kind": column|table|function|ambiguous|syntax, "name": ...} or None."""
+    for kind, pattern in _ERROR_PATTERNS:
+        match = pattern.search(message or "")
+        if match:
+            return {"kind": kind, "name": match.group(1).strip("\"`[]")}
+    return None
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Case-insensitive Levenshtein distance."""
+    a, b = a.lower(), b.lower()
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def nearest_identifier(name: str, candidates, rules: dict = None):
+    """
+    The schema identifier `name` most likely meant: a correction rule if one matches, otherwise the
+    closest candidate by edit distance, if it is close enough and unambiguous.
+    """
+    if rules and name.lower() in rules:
+        return rules[name.lower()]
+    limit = min(MAX_EDIT_DISTANCE, max(1, len(name) // 3))
+    scored = sorted((edit_distance(name, candidate), candidate) for candidate in set(candidates))
+    if not scored or scored[0][0] > limit or scored[0][0] == 0:
+        return None
+    if len(scored) > 1 and scored[1][0] == scored[0][0]:
+        return None
+    return scored[0][1]
+
+
+def _outside_literals(sql: str, rewrite) -> str:
+    """Applies `rewrite` to the SQL text outside single-quoted string literals."""
+    parts = _STRING_LITERAL.split(sql)
+    return "".join(part if i % 2 else rewrite(part) for i, part in enumerate(parts))
+
+
+def replace_identifier(sql: str, old: str, new: str) -> str:
+    """Replaces whole-word occurrences of an identifier (case-insensitive), leaving string literals alone."""
+    pattern = re.compile(rf"(?<![\w]){re.escape(old)}(?!\w)", re.IGNORECASE)
+    return _outside_literals(sql, lambda part: pattern.sub(lambda _: new, part))
+
+
+def deterministic_fix(sql: str, error: str, catalog: dict, rules: dict = None):
+    """
+    One cheap repair for a failing statement, or None. Returns (fixed_sql, note).
+    Unknown tables and columns are mapped to the nearest schema identifier (correction rules first),
+    MySQL-style functions are rewritten for SQLite and stray Markdown fences are removed.
+    """
+    parsed = parse_sql_error(error)
+    if parsed is None:
+        return None
+    kind, name = parsed["kind"], parsed["name"]
+
+    if kind == "table":
+        fix = nearest_identifier(name, catalog.keys(), rules)
+        if fix:
+            return replace_identifier(sql, name, fix), f"table {name} -> {fix}"
+
+    elif kind == "column":
+        qualifier, _, column = name.rpartition(".")
+        table = next((t for t in catalog if qualifier and t.lower() == qualifier.lower()), None)
+        columns = catalog[table] if table else [c for cols in catalog.values() for c in cols]
+        fix = nearest_identifier(column, columns, rules)
+        if fix:
+            if qualifier:
+                return replace_identifier(sql, name, f"{qualifier}.{fix}"), f"column {name} -> {qualifier}.{fix}"
+            return replace_identifier(sql, column, fix), f"column {column} -> {fix}"
+
+    elif kind == "function" and name.upper() in _FUNCTION_FIXES:
+        fixed = rewrite_function_calls(sql, name, _FUNCTION_FIXES[name.upper()])
+        if fixed != sql:
+            return fixed, f"function {name} rewritten for SQLite"
+
+    elif kind == "syntax" and name.strip().startswith("`"):
+        fixed = re.sub(r"```\w*", "", sql).strip()
+        if fixed != sql:
+            return fixed, "removed Markdown fences"
+
+    return None
+
+
+def referenced_tables(sql: str, catalog: dict) -> dict:
+    """The catalog restricted to tables the SQL mentions (or the whole catalog if none match)."""
+    words = {w.lower() for w in re.findall(r"\w+", sql)}
+    tables = {t: cols for t, cols in catalog.items() if t.lower() in words}
+    return tables or catalog
+
+
+def build_repair_prompt(sql: str, error: str, catalog: dict, rules: dict = None) -> str:
+    """A compact, error-focused prompt: the failing SQL, the error, and only the relevant schema."""
+    lines = [
+        "The following SQLite query failed.",
+        f"```sql\n{sql}\n```",
+        f"Error: {error}",
+    ]
+    parsed = parse_sql_error(error)
+    if parsed and parsed["kind"] in ("table", "column"):
+        names = catalog.keys() if parsed["kind"] == "table" else [c for cols in catalog.values() for c in cols]
+        close = sorted(names, key=lambda n: edit_distance(parsed["name"].rpartition(".")[2], n))[:3]
+        if close:
+            lines.append(f"Closest existing {parsed['kind']} names: {', '.join(close)}")
+    lines.append("Schema:")
+    for table, columns in referenced_tables(sql, catalog).items():
+        lines.append(f"- {table}({', '.join(columns)})")
+    if rules:
+        lines.append("Naming rules: " + "; ".join(f"{k} -> {v}" for k, v in list(rules.items())[:20]))
+    lines.append("Return only the corrected SQLite query in a ```sql block.")
+    return "\n".join(lines)
+
+
+def repair_sql(vn, sql: str, error: str, run, catalog: dict, rules: dict = None, max_llm_attempts: int = 2, log=None):
+    """
+    Repairs a failing statement. Deterministic fixes are applied first; each result is run with
+    `run(sql)`, and a new error feeds the next step. Only when no deterministic fix applies is the LLM
+    asked, at most `max_llm_attempts` times. Returns (sql, result, steps); raises SQLRepairFailed.
+    """
+    steps = []
+    seen = {sql}
+    llm_attempts = 0
+    deterministic_steps = 0
+    while True:
+        fix = deterministic_fix(sql, error, catalog, rules) if deterministic_steps < MAX_DETERMINISTIC_STEPS else None
+        if fix and fix[0] not in seen:
+            deterministic_steps += 1
+            candidate, note = fix
+            method = "deterministic"
+        elif llm_attempts < max_llm_attempts:
+            llm_attempts += 1
+            response = vn.submit_prompt(
+                [vn.user_message(build_repair_prompt(sql, error, catalog, rules))],
+                stop_condition=stop_after_sql_block(),
+            )
+            candidate = vn.extract_sql(response) if response else None
+            note = f"LLM attempt {llm_attempts}"
+            method = "llm"
+            if not candidate or candidate in seen:
+                steps.append({"method": method, "note": note, "sql": candidate, "error": "no new SQL"})
+                continue
+        else:
+            raise SQLRepairFailed(error, steps)
+
+        seen.add(candidate)
+        if log:
+            log(f"SQL repair ({note})")
+        try:
+            result = run(candidate)
+        except Exception as e:
+            error = str(e)
+            steps.append({"method": method, "note": note, "sql": candidate, "error": error})
+            sql = candidate
+            continue
+        steps.append({"method": method, "note": note, "sql": candidate, "error": None})
+        return candidate, result, steps
@@ -0,0 +1,140 @@
+import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Dialect fixups applied to generated SQL before execution: (pattern, replacement) pairs, matched
+# case-insensitively with flexible whitespace. Replacements may use the pattern's groups.
+DIALECT_FIXUPS = {
+    'sqlite': [
+        (r"DATE_SUB\(\s*CURDATE\(\s*\)\s*,\s*INTERVAL\s+(\d+)\s+DAY\s*\)", r"date('now', '-\1 days')"),
+        (r"CURRENT_DATE\s*-\s*INTERVAL\s*'(\d+)\s+days?'", r"date('now', '-\1 days')"),
+    ],
+}
+
+# Single-quoted string literals, and quoted identifiers ("x", `x`, [x])
+_LITERAL = r"'(?:[^']|'')*'"
+_QUOTED_IDENTIFIER = r'"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]'
+# A bare word followed by "(" is a function name, not a column or table
+_CALL = re.compile(r"\s*\(")
+# Bare words that are SQL syntax; rules never rewrite them (a quoted identifier of that name still is)
+_KEYWORDS = frozenset("""
+    all and as asc between by case cast collate cross delete desc distinct drop else end escape except exists
+    from full glob group having in inner insert intersect into is join left like limit natural not null offset
+    on or order outer over partition right select set table then union update using values when where with
+""".split())
+
+# (user_id, dialect) -> (version, SQLRewriter); user_id -> {incorrect (lowercased): correct}
+_rewriter_cache = {}
+_rules_cache = {}
+# Bumped by invalidate_sql_rewriter(); entries cached under an older version are rebuilt
+_user_versions = {}
+_cache_lock = threading.Lock()
+
+
+class SQLRewriter:
+    """
+    Correction rules and dialect fixups compiled into one regular expression, applied to a
+    statement in a single left-to-right pass.
+
+    The pattern tries, at each position: the dialect fixups, multi-word rule phrases, a string
+    literal, a quoted identifier, and finally a bare word. Literals are consumed whole, so nothing
+    inside them is ever rewritten; words and quoted identifiers are looked up in a dict of the
+    single-word rules. Rules are case-insensitive and only match whole identifiers; SQL keywords and
+    function names (a bare word followed by "(") are never rewritten.
+    """
+
+    def __init__(self, rules: dict = None, fixups: list = None):
+        self.words = {}
+        phrases = {}
+        for incorrect, correct in (rules or {}).items():
+            if re.fullmatch(r"\w+", incorrect):
+                self.words[incorrect.lower()] = correct
+            else:
+                phrases[self._normalize(incorrect)] = correct
+        self.phrases = phrases
+        self.fixups = [(re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in (fixups or [])]
+
+        alternatives = [f"(?P<f{i}>{pattern.pattern})" for i, (pattern, _) in enumerate(self.fixups)]
+        if phrases:
+            # Longest first, so a phrase is never shadowed by one of its prefixes
+            escaped = sorted((r"\s+".join(map(re.escape, p.split())) for p in phrases), key=len, reverse=True)
+            alternatives.append(r"(?P<phrase>(?<!\w)(?:" + "|".join(escaped) + r")(?!\w))")
+        alternatives += [f"(?P<literal>{_LITERAL})", f"(?P<quoted>{_QUOTED_IDENTIFIER})", r"(?P<word>\w+)"]
+        self.pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def _replace(self, match: re.Match) -> str:
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'word':
+            if text.lower() in _KEYWORDS or _CALL.match(match.string, match.end()):
+                return text
+            return self.words.get(text.lower(), text)
+        if kind == 'literal':
+            return text
+        if kind == 'quoted':
+            correct = self.words.get(text[1:-1].lower())
+            return f"{text[0]}{correct}{text[-1]}" if correct else text
+        if kind == 'phrase':
+            return self.phrases.get(self._normalize(text), text)
+        pattern, replacement = self.fixups[int(kind[1:])]
+        return pattern.fullmatch(text).expand(replacement)
+
+    def rewrite(self, sql: str) -> str:
+        if not sql or (not self.words and not self.phrases and not self.fixups):
+            return sql
+        return self.pattern.sub(self._replace, sql)
+
+
+def _load_rules(user_id: str) -> dict:
+    from app.core.db_utils import get_user_db_connection
+    try:
+        with get_user_db_connection(user_id) as conn:
+            rows = conn.execute("SELECT incorrect_name, correct_name FROM correction_rules ORDER BY id").fetchall()
+    except Exception as e:
+        logger.warning(f"Could not load correction rules for user '{user_id}': {e}")
+        return {}
+    return {incorrect.lower(): correct for incorrect, correct in rows if incorrect and correct}
+
+
+def get_correction_rules(user_id: str) -> dict:
+    """The user's correction_rules as {incorrect name (lowercased): correct name}, cached until they change."""
+    with _cache_lock:
+        version = _user_versions.get(user_id, 0)
+        entry = _rules_cache.get(user_id)
+        if entry and entry[0] == version:
+            return entry[1]
+    rules = _load_rules(user_id)
+    with _cache_lock:
+        # A concurrent invalidation wins over what was read before it
+        if _user_versions.get(user_id, 0) == version:
+            _rules_cache[user_id] = (version, rules)
+    return rules
+
+
+def get_sql_rewriter(user_id: str, dialect: str = 'sqlite') -> SQLRewriter:
+    """The compiled rewriter for a user's correction rules plus the dialect's fixups, cached per (user, dialect)."""
+    with _cache_lock:
+        version = _user_versions.get(user_id, 0)
+        entry = _rewriter_cache.get((user_id, dialect))
+        if entry and entry[0] == version:
+            return entry[1]
+    rewriter = SQLRewriter(get_correction_rules(user_id), DIALECT_FIXUPS.get(dialect, []))
+    with _cache_lock:
+        if _user_versions.get(user_id, 0) == version:
+            _rewriter_cache[(user_id, dialect)] = (version, rewriter)
+    return rewriter
+
+
+def invalidate_sql_rewriter(user_id: str):
+    """Drops a user's cached rules and rewriters; call after correction_rules change."""
+    with _cache_lock:
+        _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+        _rules_cache.pop(user_id, None)
+        for key in [k for k in _rewriter_cache if k[0] == user_id]:
+            del _rewriter_cache[key]
@@ -0,0 +1,241 @@
+import re
+import hashlib
+import sqlite3
+import logging
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Trigram tokenization matches substrings, which works for CJK text and identifiers like order_no
+# where unicode61 would see one long token. It needs SQLite >= 3.34; older builds fall back to unicode61.
+FTS_TOKENIZERS = ("trigram", "unicode61")
+MIN_TRIGRAM_TERM = 3
+
+# (FTS table, source table, indexed columns, bm25 column weights)
+FTS_SOURCES = {
+    "qa": ("training_qa_fts", "training_qa", ("question", "sql_query"), (2.0, 1.0)),
+    "documentation": ("training_documentation_fts", "training_documentation", ("documentation_text",), (1.0,)),
+}
+
+# Saves a table's documentation. Not REPLACE INTO: its implicit delete does not fire the FTS delete
+# trigger (recursive_triggers is off), which would leave the old text in the index.
+UPSERT_DOCUMENTATION = """
+    INSERT INTO training_documentation (dataset_id, table_name, documentation_text) VALUES (?, ?, ?)
+    ON CONFLICT(dataset_id, table_name) DO UPDATE SET documentation_text = excluded.documentation_text
+"""
+
+
+# Trailing punctuation and whitespace that do not change what a question asks
+_QUESTION_TRAILING = "?？!！.。;；,，、 "
+
+
+def normalize_question(question: str) -> str:
+    """NFKC-folds (full-width -> half-width), lowercases, collapses whitespace and strips trailing punctuation."""
+    text = unicodedata.normalize("NFKC", question or "").lower()
+    return re.sub(r"\s+", " ", text).strip().rstrip(_QUESTION_TRAILING)
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+
+
+def create_question_hash_index(cursor: sqlite3.Cursor):
+    """
+    Adds training_qa.question_hash (normalized-question SHA-256) and its lookup index.
+    Rows written without a hash (every insert path stays unchanged) are hashed lazily by find_exact_question;
+    a trigger clears the hash when a question is edited so it is recomputed.
+    """
+    cursor.execute("PRAGMA table_info(training_qa)")
+    if "question_hash" not in [info[1] for info in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE training_qa ADD COLUMN question_hash TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_training_qa_dataset_question_hash ON training_qa (dataset_id, question_hash)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS training_qa_question_hash_au AFTER UPDATE OF question ON training_qa
+        WHEN new.question IS NOT old.question BEGIN
+            UPDATE training_qa SET question_hash = NULL WHERE id = new.id;
+        END
+    """)
+    _backfill_question_hashes(cursor)
+
+
+def _backfill_question_hashes(cursor: sqlite3.Cursor, dataset_id=None) -> int:
+    if dataset_id is None:
+        cursor.execute("SELECT id, question FROM training_qa WHERE question_hash IS NULL")
+    else:
+        cursor.execute("SELECT id, question FROM training_qa WHERE dataset_id = ? AND question_hash IS NULL", (dataset_id,))
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany("UPDATE training_qa SET question_hash = ? WHERE id = ?",
+                           [(question_hash(question), row_id) for row_id, question in rows])
+    return len(rows)
+
+
+def find_exact_question(conn: sqlite3.Connection, dataset_id, question: str):
+    """
+    Looks a question up by its normalized hash, without any embedding call.
+    Returns the newest matching {"id", "question", "sql", "similarity": 1.0} of the dataset, or None.
+    """
+    cursor = conn.cursor()
+    if _backfill_question_hashes(cursor, dataset_id):
+        conn.commit()
+    cursor.execute("""
+        SELECT id, question, sql_query FROM training_qa
+        WHERE dataset_id = ? AND question_hash = ?
+        ORDER BY id DESC LIMIT 1
+    """, (dataset_id, question_hash(question)))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return {"id": row[0], "question": row[1], "sql": row[2], "similarity": 1.0}
+
+
+def create_training_fts(cursor: sqlite3.Cursor):
+    """
+    Creates the FTS5 indexes over training QA and documentation, the triggers that keep them
+    in sync with their source tables, and backfills existing rows. Safe to call repeatedly.
+    """
+    for fts_table, source_table, columns, _ in FTS_SOURCES.values():
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (fts_table,))
+        exists = cursor.fetchone() is not None
+        if not exists:
+            column_sql = ", ".join(columns)
+            for tokenizer in FTS_TOKENIZERS:
+                try:
+                    cursor.execute(f"CREATE VIRTUAL TABLE {fts_table} USING fts5({column_sql}, tokenize='{tokenizer}')")
+                    break
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"FTS5 tokenizer '{tokenizer}' unavailable for {fts_table}: {e}")
+            else:
+                raise sqlite3.OperationalError(f"Could not create FTS5 table {fts_table}")
+
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        column_sql = ", ".join(columns)
+        # The FTS rowid is the source row id; source tables use AUTOINCREMENT, so ids are never reused
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source_table} BEGIN
+                INSERT INTO {fts_table} (rowid, {column_sql}) VALUES (new.id, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source_table} BEGIN
+                DELETE FROM {fts_table} WHERE rowid = old.id;
+            END
+        """)
+        _create_fts_update_trigger(cursor, fts_table, source_table, columns)
+        if not exists:
+            cursor.execute(f"INSERT INTO {fts_table} (rowid, {column_sql}) SELECT id, {column_sql} FROM {source_table}")
+
+
+def _create_fts_update_trigger(cursor: sqlite3.Cursor, fts_table: str, source_table: str, columns: tuple):
+    # Only edits of the indexed columns reindex the row; question_hash backfills and other updates do not
+    column_sql = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_sql} ON {source_table} BEGIN
+            DELETE FROM {fts_table} WHERE rowid = old.id;
+            INSERT INTO {fts_table} (rowid, {column_sql}) VALUES (new.id, {new_values});
+        END
+    """)
+
+
+def recreate_fts_update_triggers(cursor: sqlite3.Cursor):
+    """Replaces FTS update triggers created before they were limited to the indexed columns."""
+    for fts_table, source_table, columns, _ in FTS_SOURCES.values():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_au")
+        _create_fts_update_trigger(cursor, fts_table, source_table, columns)
+
+
+def purge_orphaned_fts_rows(cursor: sqlite3.Cursor):
+    """Deletes index entries whose source row is gone (left behind by REPLACE INTO before it was replaced by an upsert)."""
+    for fts_table, source_table, _, _ in FTS_SOURCES.values():
+        cursor.execute(f"DELETE FROM {fts_table} WHERE rowid NOT IN (SELECT id FROM {source_table})")
+
+
+def _fts_tokenizer(cursor: sqlite3.Cursor, fts_table: str) -> str:
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (fts_table,))
+    row = cursor.fetchone()
+    return "trigram" if row and "trigram" in row[0] else "unicode61"
+
+
+def _search_terms(query: str) -> list:
+    return list(dict.fromkeys(t for t in re.split(r"[\s,;，；、]+", query or "") if t))
+
+
+def short_search_terms(query: str, tokenizer: str = "trigram") -> list:
+    """Terms the trigram tokenizer cannot match (e.g. two-character CJK words); they are searched with LIKE instead."""
+    if tokenizer != "trigram":
+        return []
+    return [t for t in _search_terms(query) if len(t) < MIN_TRIGRAM_TERM]
+
+
+def build_match_query(query: str, tokenizer: str = "trigram", match_any: bool = True) -> str:
+    """
+    Turns free text into an FTS5 MATCH expression: every term is quoted (so user input can never
+    be parsed as FTS syntax) and terms are OR-ed (match_any) or AND-ed.
+    Returns None if no term is long enough to be matched.
+    """
+    terms = _search_terms(query)
+    if tokenizer == "trigram":
+        terms = [t for t in terms if len(t) >= MIN_TRIGRAM_TERM]
+    if not terms:
+        return None
+    quoted = ['"' + t.replace('"', '""') + '"' for t in terms]
+    return (" OR " if match_any else " AND ").join(quoted)
+
+
+def _like_pattern(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search_training_data(conn: sqlite3.Connection, dataset_id, query: str, kinds=("qa", "documentation"),
+                         limit: int = 20, match_any: bool = True) -> list:
+    """
+    BM25-ranked search over a dataset's training QA and documentation.
+    Returns dicts with kind, id, table_name, the matched fields and `score` (higher is better), best first.
+    """
+    cursor = conn.cursor()
+    results = []
+    for kind in kinds:
+        fts_table, source_table, columns, weights = FTS_SOURCES[kind]
+        tokenizer = _fts_tokenizer(cursor, fts_table)
+        match = build_match_query(query, tokenizer, match_any)
+        short_terms = short_search_terms(query, tokenizer)
+        if match is None and not short_terms:
+            continue
+        weight_sql = ", ".join(str(w) for w in weights)
+        select_columns = ", ".join(f"s.{c}" for c in columns)
+        if not short_terms:
+            cursor.execute(f"""
+                SELECT s.id, s.table_name, {select_columns}, bm25({fts_table}, {weight_sql}) AS rank
+                FROM {fts_table}
+                JOIN {source_table} s ON s.id = {fts_table}.rowid
+                WHERE {fts_table} MATCH ? AND s.dataset_id = ?
+                ORDER BY rank
+                LIMIT ?
+            """, (match, dataset_id, limit))
+        else:
+            # Short terms are matched with LIKE; each one found counts like a BM25 point
+            term_hits = ["(" + " OR ".join(f"s.{c} LIKE ? ESCAPE '\\'" for c in columns) + ")" for _ in short_terms]
+            like_params = [_like_pattern(t) for t in short_terms for _ in columns]
+            if match is None:
+                fts_join, fts_params, conditions = "", [], term_hits
+            else:
+                fts_join = (f"LEFT JOIN (SELECT rowid, bm25({fts_table}, {weight_sql}) AS rank FROM {fts_table} "
+                            f"WHERE {fts_table} MATCH ?) m ON m.rowid = s.id")
+                fts_params, conditions = [match], ["m.rowid IS NOT NULL"] + term_hits
+            rank_sql = "COALESCE(m.rank, 0)" if fts_join else "0"
+            hits_sql = " + ".join(term_hits)
+            cursor.execute(f"""
+                SELECT s.id, s.table_name, {select_columns}, {rank_sql} - ({hits_sql}) AS rank
+                FROM {source_table} s {fts_join}
+                WHERE s.dataset_id = ? AND ({(" OR " if match_any else " AND ").join(conditions)})
+                ORDER BY rank
+                LIMIT ?
+            """, (*like_params, *fts_params, dataset_id, *like_params, limit))
+        for row in cursor.fetchall():
+            item = {"kind": kind, "id": row[0], "table_name": row[1], "score": -row[-1]}
+            item.update(zip(columns, row[2:-1]))
+            results.append(item)
+
+    results.sort(key=lambda r: r["score"], reverse=True)
+    return results[:limit]
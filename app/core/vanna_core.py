@@ -8,8 +8,12 @@ from queue import Queue
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
 
-from vanna.ollama import Ollama
+from vanna.ollama import Ollama, get_model_registry
 from vanna.chromadb import ChromaDB_VectorStore
+from vanna.hybrid import HybridRetrieval
+from vanna.rerank import RerankRetrieval
+from vanna.llm_cache import LLMResponseCache
+from vanna.llm_scheduler import ScheduledLLM, all_scheduler_metrics
 from app.core.db_utils import get_user_db_connection
 
 # Configure logger
@@ -20,7 +24,7 @@ logger = logging.getLogger(__name__)
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
-class MyVanna(Ollama, ChromaDB_VectorStore):
+class MyVanna(LLMResponseCache, ScheduledLLM, RerankRetrieval, HybridRetrieval, Ollama, ChromaDB_VectorStore):
     def __init__(self, user_id: str, config=None):
         self.user_id = user_id
         self.log_queue = Queue() # 初始化 log_queue
@@ -32,20 +36,73 @@ class MyVanna(Ollama, ChromaDB_VectorStore):
         
         ollama_config = {
             'model': os.getenv('OLLAMA_MODEL', 'llama3'),
-            'ollama_host': os.getenv('OLLAMA_HOST', 'http://localhost:11434'),
+            'ollama_host': ollama_host(),
             'ollama_timeout': 240.0,
+            # One pooled, keep-alive client per host is shared by every user's instance
+            'ollama_pool_size': int(os.getenv('OLLAMA_POOL_SIZE', 20)),
             'options': {
-                'num_ctx': int(os.getenv('OLLAMA_NUM_CTX', 4096))
+                'num_ctx': int(os.getenv('OLLAMA_NUM_CTX', 4096)),
+                **({'temperature': float(os.getenv('OLLAMA_TEMPERATURE'))} if os.getenv('OLLAMA_TEMPERATURE') else {}),
             }
         }
 
         # 2. 确保初始化self.config，修复AttributeError: 'MyVanna' object has no attribute 'config'
         self.config = config if config is not None else {}
-        
+        # Optional cross-encoder rerank stage (vanna.rerank); disabled unless RERANK_MODEL is set
+        if os.getenv('RERANK_MODEL'):
+            self.config.setdefault('rerank_model', os.getenv('RERANK_MODEL'))
+            self.config.setdefault('rerank_top_k', int(os.getenv('RERANK_TOP_K', 5)))
+            self.config.setdefault('rerank_min_score', float(os.getenv('RERANK_MIN_SCORE', 0.05)))
+        # LLM response cache (vanna.llm_cache), shared by all users; LLM_CACHE=true/false forces it on or off,
+        # otherwise it is used only with OLLAMA_TEMPERATURE=0
+        self.config.setdefault('llm_cache_path', os.path.join(os.getcwd(), 'user_data', 'llm_cache.sqlite'))
+        if os.getenv('LLM_CACHE'):
+            self.config.setdefault('llm_cache', os.getenv('LLM_CACHE').lower() in ('1', 'true', 'yes'))
+        # Shared LLM admission control (vanna.llm_scheduler): interactive asks go ahead of analysis and bulk QA generation
+        self.config.setdefault('llm_max_concurrency', int(os.getenv('LLM_MAX_CONCURRENCY', 8)))
+        if os.getenv('LLM_LATENCY_TARGET'):
+            self.config.setdefault('llm_latency_target', float(os.getenv('LLM_LATENCY_TARGET')))
+        self.config.setdefault('llm_queue_limits', {'bulk': int(os.getenv('LLM_BULK_QUEUE_LIMIT', 200))})
+        # SQL generation stops at the end of the SQL block; STOP_AFTER_SQL=false keeps the explanation after it
+        self.config.setdefault('stop_after_sql', os.getenv('STOP_AFTER_SQL', 'true').lower() in ('1', 'true', 'yes'))
+        # SQL_CANDIDATES>1 generates that many SQL candidates in parallel and keeps the first that passes EXPLAIN
+        self.config.setdefault('sql_candidates', int(os.getenv('SQL_CANDIDATES', 1)))
+        # Failed SQL is repaired with schema-aware fixes first, then up to SQL_REPAIR_ATTEMPTS LLM calls (-1 disables repair)
+        self.config.setdefault('sql_repair_attempts', int(os.getenv('SQL_REPAIR_ATTEMPTS', 2)))
+        # Common result shapes are charted by rules (vanna.chart_recommender); CHART_RECOMMENDER=false always asks the LLM
+        self.config.setdefault('chart_recommender', os.getenv('CHART_RECOMMENDER', 'true').lower() in ('1', 'true', 'yes'))
+
         # 3. Call parent __init__ methods with their own, isolated configs
         ChromaDB_VectorStore.__init__(self, config=chroma_config)
         Ollama.__init__(self, config=ollama_config)
 
+def ollama_host() -> str:
+    return os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+
+def ollama_model() -> str:
+    # Same normalization as vanna.ollama.Ollama, so registry lookups use the instance's model name
+    model = os.getenv('OLLAMA_MODEL', 'llama3')
+    return model if ':' in model else f"{model}:latest"
+
+def warm_up_llm():
+    """Starts the background model check (and pull) at app startup, before any user asks a question."""
+    if os.getenv('LLM_CHOICE', 'ollama') != 'ollama':
+        return
+    status = get_model_registry(ollama_host()).ensure(ollama_model())
+    logger.info(f"Ollama model {status['model']} on {ollama_host()}: {status['state']}")
+
+def get_llm_status() -> dict:
+    """Readiness flag for the UI: {"model", "state", "error", "updated_at", "ready"}."""
+    if os.getenv('LLM_CHOICE', 'ollama') != 'ollama':
+        return {'model': None, 'state': 'ready', 'error': None, 'updated_at': None, 'ready': True}
+    status = get_model_registry(ollama_host()).ensure(ollama_model())
+    status['ready'] = status['state'] == 'ready'
+    return status
+
+def get_llm_metrics() -> list:
+    """Concurrency limit, queue depths and p95 wait/latency per priority for every LLM backend."""
+    return all_scheduler_metrics()
+
 _vanna_instances = {}
 
 def get_vanna_instance(user_id: str) -> MyVanna:
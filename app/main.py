@@ -1,4 +1,4 @@
-from flask import Blueprint, session, redirect, url_for, render_template, Response
+from flask import Blueprint, session, redirect, url_for, render_template, Response, jsonify
 
 main = Blueprint('main', __name__)
 
@@ -8,6 +8,13 @@ def index():
         return redirect(url_for('auth.login'))
     return render_template('index.html', username=session.get('username'))
 
+@main.route('/api/llm_status')
+def llm_status():
+    if 'username' not in session:
+        return jsonify({'status': 'error', 'message': 'User not authenticated.'}), 401
+    from app.core.vanna_core import get_llm_status, get_llm_metrics
+    return jsonify({'status': 'success', 'llm': get_llm_status(), 'scheduler': get_llm_metrics()})
+
 # 处理 @vite/client 请求的路由 - 解决 404 错误
 @main.route('/@vite/client')
 def vite_client():
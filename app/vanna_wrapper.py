@@ -2,8 +2,13 @@ from app.core.vanna_core import MyVanna as BaseMyVanna
 import os
 import logging
 import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from app.core.helpers import load_prompt_template, write_ask_log
 from app.core.db_utils import validate_user_id
+from app.core.sql_rewrite import get_sql_rewriter
+from vanna.log import LazyMessage, capped_payload, is_enabled
+from vanna.sql_stream import GenerationCancelled, cancellable, stop_after_sql_block
 import pandas as pd
 from queue import Queue
 
@@ -13,7 +18,8 @@ formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(messag
 handler.setFormatter(formatter)
 logger = logging.getLogger(__name__)
 logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)  # 设置为DEBUG级别以记录更多详细信息
+# 预设 INFO；需要完整除错资讯时设定 APP_LOG_LEVEL=DEBUG
+logger.setLevel(os.getenv('APP_LOG_LEVEL', 'INFO').upper())
 
 class MyVanna(BaseMyVanna):
     def __init__(self, user_id=None, model=None, api_key=None, config=None):
@@ -58,7 +64,11 @@ class MyVanna(BaseMyVanna):
             event_type (str): 事件類型。
             details (dict): 包含除錯資訊的字典。
         """
-        logger.debug(f"Queueing debug info: {event_type} - {details}")
+        # 只有在 DEBUG 開啟時才排入佇列，且大型內容（prompt、回應）會被截斷
+        if not is_enabled(logging.DEBUG, logger):
+            return
+        details = capped_payload(details)
+        logger.debug("Queueing debug info: %s - %s", event_type, LazyMessage(details))
         self.log_queue.put({'event_type': event_type, 'details': details})
 
     def get_sql_prompt(self, prompt_type='sql_generation', **kwargs):
@@ -151,7 +161,7 @@ class MyVanna(BaseMyVanna):
             # 调用父类方法，但只传递必要的参数
             # Explicitly pass only known arguments to the parent method to avoid unexpected behavior.
             similar_questions = super().get_similar_question_sql(question=question, top_n=n)
-            write_ask_log(self.user_id, "get_similar_question_sql_results", str(similar_questions))
+            write_ask_log(self.user_id, "get_similar_question_sql_results", LazyMessage(similar_questions))
             logger.debug(f"Successfully retrieved {len(similar_questions) if similar_questions else 0} similar question SQL items")
             return similar_questions
         except Exception as e:
@@ -163,7 +173,7 @@ class MyVanna(BaseMyVanna):
     def get_related_ddl(self, question, n=5, **kwargs):
         try:
             related_ddl = super().get_related_ddl(question, top_n=n, **kwargs)
-            write_ask_log(self.user_id, "get_related_ddl_results", str(related_ddl))
+            write_ask_log(self.user_id, "get_related_ddl_results", LazyMessage(related_ddl))
             return related_ddl
         except Exception as e:
             logger.error(f"Error getting related DDL: {e}")
@@ -173,7 +183,7 @@ class MyVanna(BaseMyVanna):
     def get_related_documentation(self, question, n=5, **kwargs):
         try:
             related_docs = super().get_related_documentation(question, top_n=n, **kwargs)
-            write_ask_log(self.user_id, "get_related_documentation_results", str(related_docs))
+            write_ask_log(self.user_id, "get_related_documentation_results", LazyMessage(related_docs))
             return related_docs
         except Exception as e:
             logger.error(f"Error getting related documentation: {e}")
@@ -183,10 +193,12 @@ class MyVanna(BaseMyVanna):
     def get_sql_hints(self, question, **kwargs):
         return []
     
-    def generate_sql(self, question: str, ddl_list: list = None, doc_list: list = None, question_sql_list: list = None, **kwargs) -> str:
+    def generate_sql(self, question: str, ddl_list: list = None, doc_list: list = None, question_sql_list: list = None, stream: bool = False, **kwargs):
         """
         Generates SQL for a given question using the provided context.
         This is a pure function that only constructs a prompt and calls the LLM.
+        With stream=True it returns a generator of response chunks instead of the full response.
+        kwargs: temperature (per-call override) and stop_condition (replaces the stop-after-SQL-block default).
         """
         logger.info("Constructing SQL prompt with provided context...")
 
@@ -214,21 +226,113 @@ class MyVanna(BaseMyVanna):
         logger.info("Submitting final prompt to LLM for SQL generation.")
         self.log_debug_info('final_sql_generation_prompt', {'prompt': final_prompt})
 
+        llm_kwargs = {'temperature': kwargs['temperature']} if kwargs.get('temperature') is not None else {}
+        # Stop generating once the SQL block is closed; text after it is never used by extract_sql
+        stop_condition = kwargs.get('stop_condition')
+        if stop_condition is None and self.config.get('stop_after_sql', True):
+            stop_condition = stop_after_sql_block()
+        if stop_condition is not None:
+            llm_kwargs['stop_condition'] = stop_condition
+
+        if stream:
+            return self._logged_sql_stream(self.submit_prompt([self.user_message(final_prompt)], stream=True, **llm_kwargs))
+
         try:
-            response = self.submit_prompt([self.user_message(final_prompt)])
+            response = self.submit_prompt([self.user_message(final_prompt)], **llm_kwargs)
             # Return the full response to include the thought process
             logger.info(f"LLM full response received. Length: {len(response)} chars.")
             self.log_debug_info('generate_sql_full_response', {'response': response})
             return response
+        except GenerationCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error during final SQL generation call: {e}", exc_info=True)
             self.log_debug_info('error_generate_sql', {'error': str(e), 'traceback': traceback.format_exc()})
             return f"-- Error generating SQL: {e}"
 
+    def validate_sql(self, sql: str):
+        """
+        Dry-runs the SQL with EXPLAIN against the active dataset: the statement is compiled (tables,
+        columns and syntax are checked) but not executed. Returns the error message, or None if valid.
+        """
+        if not sql or not sql.strip():
+            return "Empty SQL"
+        try:
+            with self.engine.connect() as conn:
+                # exec_driver_sql: no bind-parameter parsing, so literals such as '%H:%M' pass through untouched
+                conn.exec_driver_sql(f"EXPLAIN {sql.strip().rstrip(';')}")
+            return None
+        except Exception as e:
+            return str(getattr(e, 'orig', None) or e)
+
+    def generate_sql_candidates(self, question: str, ddl_list: list = None, doc_list: list = None,
+                                question_sql_list: list = None, n: int = 3) -> dict:
+        """
+        Speculative SQL generation: n candidates are generated in parallel at increasing temperatures
+        (0, 0.3, 0.6, ...) and each is validated with validate_sql() as soon as it arrives. The first
+        valid candidate wins; candidates still generating are cancelled at their next chunk.
+        Candidates are validated and returned after the user's correction rules and the dialect
+        fixups (app.core.sql_rewrite), i.e. as they will be executed.
+
+        Returns {'sql', 'response', 'candidate', 'temperature', 'errors'}. When no candidate is
+        valid, the first candidate with any SQL is returned and 'errors' lists every failure.
+        """
+        temperatures = [round(min(1.0, 0.3 * i), 2) for i in range(n)]
+        cancelled = threading.Event()
+        rewriter = get_sql_rewriter(self.user_id, self.engine.dialect.name)
+
+        def generate(index):
+            if cancelled.is_set():
+                # A winner exists already: do not queue for an LLM slot
+                raise GenerationCancelled()
+            stop_condition = cancellable(stop_after_sql_block(), cancelled)
+            return self.generate_sql(question, ddl_list, doc_list, question_sql_list,
+                                     temperature=temperatures[index], stop_condition=stop_condition)
+
+        executor = ThreadPoolExecutor(max_workers=n, thread_name_prefix='sql-candidate')
+        futures = {executor.submit(generate, i): i for i in range(n)}
+        results, errors = {}, []
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    response = future.result()
+                except GenerationCancelled:
+                    continue
+                sql = self.extract_sql(response) if response else None
+                if sql:
+                    sql = rewriter.rewrite(sql)
+                error = self.validate_sql(sql) if sql else "No SQL in response"
+                self.log_debug_info('sql_candidate', {'candidate': index, 'temperature': temperatures[index], 'sql': sql, 'error': error})
+                if error is None:
+                    return {'sql': sql, 'response': response, 'candidate': index,
+                            'temperature': temperatures[index], 'errors': errors}
+                errors.append({'candidate': index, 'sql': sql, 'error': error})
+                if sql:
+                    results[index] = (sql, response)
+        finally:
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if not results:
+            return {'sql': None, 'response': None, 'candidate': None, 'temperature': None, 'errors': errors}
+        index = min(results)
+        return {'sql': results[index][0], 'response': results[index][1], 'candidate': index,
+                'temperature': temperatures[index], 'errors': errors}
+
+    def _logged_sql_stream(self, chunks):
+        collected = []
+        for chunk in chunks:
+            collected.append(chunk)
+            yield chunk
+        response = "".join(collected)
+        logger.info(f"LLM streamed response complete. Length: {len(response)} chars.")
+        self.log_debug_info('generate_sql_full_response', {'response': response})
+
     def get_sql_result_prompt(self, question, sql, results, **kwargs):
         try:
             logger.info(f"Getting SQL prompt for: {question[:100]}...")
-            logger.debug(f"Get SQL prompt kwargs before processing: {kwargs}")
+            logger.debug("Get SQL prompt kwargs before processing: %s", LazyMessage(kwargs))
             
             # 确保config属性存在
             if not hasattr(self, 'config'):
@@ -396,7 +500,7 @@ class MyVanna(BaseMyVanna):
             return pd.DataFrame()
 
         try:
-            logger.debug(f"Executing SQL: {sql[:1000]}")
+            logger.debug("Executing SQL: %s", LazyMessage(sql, max_chars=1000))
             # Use the configured engine to execute the query
             if self.run_sql_is_set:
                 # The lambda set in configure_vanna_for_request handles connection management
@@ -461,6 +565,9 @@ class MyVanna(BaseMyVanna):
 
             logger.info("=== submit_prompt in wrapper completed successfully ===")
             return response
+        except GenerationCancelled:
+            logger.debug("submit_prompt in wrapper: generation cancelled by the caller.")
+            raise
         except Exception as e:
             logger.error(f"=== submit_prompt in wrapper failed: {e} ===", exc_info=True)
             raise
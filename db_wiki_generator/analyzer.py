@@ -1,12 +1,14 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone
 
-def analyze_schema(raw_schema: Dict[str, Any]) -> Dict[str, Any]:
+def analyze_schema(raw_schema: Dict[str, Any], profiles: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Analyzes the raw schema and enriches it with semantic information.
     This corresponds to Phase 2 of our schema extraction plan.
 
     :param raw_schema: The raw schema dictionary from a DBConnector.
+    :param profiles: Optional dataset profile catalog ({table: {"row_count", "columns": {...}}})
+                     used to fill row counts and column stats.
     :return: An enriched schema dictionary.
     """
     print("Starting schema analysis...")
@@ -18,11 +20,14 @@ def analyze_schema(raw_schema: Dict[str, Any]) -> Dict[str, Any]:
         "tables": []
     }
 
+    profiles = profiles or {}
     for table in raw_schema.get("tables", []):
+        table_profile = profiles.get(table["name"], {})
+        column_profiles = table_profile.get("columns", {})
         enriched_table = {
             "table_name": table["name"],
             "description": f"Auto-generated description for table {table['name']}.",
-            "row_count": -1, # Placeholder, to be filled by profiling
+            "row_count": table_profile.get("row_count", -1),
             "columns": [],
             "relationships": [] # Placeholder
         }
@@ -39,7 +44,7 @@ def analyze_schema(raw_schema: Dict[str, Any]) -> Dict[str, Any]:
                 "inferred_semantic_type": inferred_type,
                 "description": f"Auto-generated description for column {col_name}.",
                 "tags": tags,
-                "stats": {} # Placeholder for profiling stats
+                "stats": column_profiles.get(col_name, {})
             }
             enriched_table["columns"].append(enriched_column)
         
@@ -47,7 +52,6 @@ def analyze_schema(raw_schema: Dict[str, Any]) -> Dict[str, Any]:
 
     print("Schema analysis completed.")
     return enriched_schema
-    return enriched_schema
 
 def _infer_semantics(name: str, tech_type: str, is_pk: bool) -> (str, List[str]):
     """
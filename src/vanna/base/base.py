@@ -54,7 +54,7 @@ import re
 import sqlite3
 import traceback
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Union
+from typing import Callable, List, Tuple, Union
 from urllib.parse import urlparse
 
 from app.blueprints.prompts import get_prompt
@@ -65,7 +65,9 @@ import plotly.graph_objects as go
 import requests
 import sqlparse
 
+from ..chart_recommender import build_chart, recommend_chart
 from ..exceptions import DependencyError, ImproperlyConfigured, ValidationError
+from ..log import level_for_title, log_lazy
 from ..types import TrainingPlan, TrainingPlanItem
 from ..utils import validate_config_path
 
@@ -83,8 +85,12 @@ class VannaBase(ABC):
         self.max_tokens = self.config.get("max_tokens", 14000)
         self.user_id = self.config.get("user_id", None)
 
-    def log(self, message: str, title: str = "Info"):
-        print(f"{title}: {message}")
+    def log(self, message: Union[str, Callable[[], str]], title: str = "Info"):
+        """
+        Routes through the vanna logging facade. `message` may be a zero-argument callable so that
+        large payloads are only built when the level implied by `title` is enabled.
+        """
+        log_lazy(level_for_title(title), message, title=title)
 
     def _response_language(self) -> str:
         if self.language is None:
@@ -2086,28 +2092,12 @@ class VannaBase(ABC):
             self.log(f"LLM-generated Plotly code failed to execute: {e}", title="Warning")
             self.log("Activating fallback chart generation strategy.", title="Info")
 
-            # Inspect data types
-            numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
-            categorical_cols = df.select_dtypes(
-                include=["object", "category"]
-            ).columns.tolist()
-            
-            self.log(f"Detected {len(numeric_cols)} numeric columns: {numeric_cols}", title="Debug")
-            self.log(f"Detected {len(categorical_cols)} categorical columns: {categorical_cols}", title="Debug")
-
-            # Decision-making for plot type
-            if len(numeric_cols) >= 2:
-                self.log("Strategy: Found >= 2 numeric columns. Using Scatter Plot.", title="Info")
-                fig = px.scatter(df, x=numeric_cols[0], y=numeric_cols[1])
-            elif len(numeric_cols) == 1 and len(categorical_cols) >= 1:
-                self.log("Strategy: Found 1 numeric and >= 1 categorical column. Using Bar Chart.", title="Info")
-                fig = px.bar(df, x=categorical_cols[0], y=numeric_cols[0])
-            elif len(categorical_cols) >= 1 and df[categorical_cols[0]].nunique() < 10:
-                self.log("Strategy: Found >= 1 categorical column with < 10 unique values. Using Pie Chart.", title="Info")
-                fig = px.pie(df, names=categorical_cols[0])
+            recommendation = recommend_chart(df)
+            if recommendation:
+                self.log(f"Strategy: {recommendation['reason']}. Using {recommendation['kind']} chart.", title="Info")
+                fig = build_chart(df, recommendation)
             else:
-                self.log("Strategy: Defaulting to Line Plot.", title="Info")
-                fig = px.line(df)
+                fig = self._fallback_plotly_figure(df)
 
         if fig is None:
             return None
@@ -2116,3 +2106,29 @@ class VannaBase(ABC):
             fig.update_layout(template="plotly_dark")
 
         return fig
+
+    def _fallback_plotly_figure(self, df: pd.DataFrame) -> plotly.graph_objs.Figure:
+        """Last-resort chart by column types, for results the chart recommender has no rule for."""
+        # Inspect data types
+        numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
+        categorical_cols = df.select_dtypes(
+            include=["object", "category"]
+        ).columns.tolist()
+        
+        self.log(f"Detected {len(numeric_cols)} numeric columns: {numeric_cols}", title="Debug")
+        self.log(f"Detected {len(categorical_cols)} categorical columns: {categorical_cols}", title="Debug")
+
+        # Decision-making for plot type
+        if len(numeric_cols) >= 2:
+            self.log("Strategy: Found >= 2 numeric columns. Using Scatter Plot.", title="Info")
+            fig = px.scatter(df, x=numeric_cols[0], y=numeric_cols[1])
+        elif len(numeric_cols) == 1 and len(categorical_cols) >= 1:
+            self.log("Strategy: Found 1 numeric and >= 1 categorical column. Using Bar Chart.", title="Info")
+            fig = px.bar(df, x=categorical_cols[0], y=numeric_cols[0])
+        elif len(categorical_cols) >= 1 and df[categorical_cols[0]].nunique() < 10:
+            self.log("Strategy: Found >= 1 categorical column with < 10 unique values. Using Pie Chart.", title="Info")
+            fig = px.pie(df, names=categorical_cols[0])
+        else:
+            self.log("Strategy: Defaulting to Line Plot.", title="Info")
+            fig = px.line(df)
+        return fig
@@ -0,0 +1,201 @@
+"""
+Rule-based chart recommendation for query results.
+
+recommend_chart() looks at a result DataFrame's column types, cardinality, time columns and row
+count and picks a chart for the common shapes (KPI, time series, category comparison, scatter,
+distribution). build_chart() turns the recommendation into a Plotly figure directly, so those
+results need no LLM-generated plotting code. When no rule is confident, recommend_chart() returns
+None and callers fall back to the LLM.
+"""
+import re
+from typing import List, Optional
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Most categories shown on one bar chart; more than this and the LLM decides how to present it
+MAX_BAR_CATEGORIES = 50
+MAX_PIE_SLICES = 6
+MAX_COLOR_GROUPS = 10
+MAX_SERIES = 5
+# Values sampled when deciding whether a text column holds dates
+DATE_SAMPLE_SIZE = 50
+
+_DATE_VALUE = re.compile(r"^\d{4}([-/.]\d{1,2}){1,2}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?$|^\d{4}[-/]?Q[1-4]$", re.IGNORECASE)
+_TIME_NAME = re.compile(r"date|time|day|month|year|week|quarter|period|日期|時間|时间|年|月|週|周|季", re.IGNORECASE)
+# Names of period-number columns (month 1-12, week, hour, ...): the name ends with the period, so
+# measures such as monthly_total or days_overdue do not match
+_PERIOD_NAME = re.compile(r"(^|_)(year|quarter|month|week|day|weekday|hour|period)$|(年|年度|季|季度|月|月份|週|周|日|小時|小时|時段|时段)$", re.IGNORECASE)
+_ID_NAME = re.compile(r"(^|_)(id|no|number|code)$|編號|编号|代碼|代码", re.IGNORECASE)
+_SHARE_WORDS = re.compile(r"比例|佔比|占比|比重|分佈|分布|share|proportion|percentage|breakdown", re.IGNORECASE)
+# The user asked for a specific visualisation: leave it to the LLM
+_CHART_WORDS = re.compile(
+    r"圖|图|chart|plot|graph|visuali[sz]|pie|scatter|heatmap|histogram|"
+    r"圓餅|圆饼|散佈|散点|散點|熱力|热力|折線|折线|長條|长条|柱狀|柱状|直方|地圖|地图",
+    re.IGNORECASE,
+)
+
+
+def wants_custom_chart(question: Optional[str]) -> bool:
+    """True if the question itself asks for a chart, so its wording should drive the chart type."""
+    return bool(question and _CHART_WORDS.search(question))
+
+
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == object or pd.api.types.is_string_dtype(series)
+
+
+def _is_time_column(series: pd.Series) -> bool:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return True
+    values = _numeric_values(series)
+    if values is not None:
+        # Year columns (named like a period, holding plausible years) and period numbers such as
+        # month 1-12: ordered positions on a time axis, not measures
+        values = values.dropna()
+        if values.empty or not (values == values.round()).all():
+            return False
+        name = str(series.name)
+        return bool(_PERIOD_NAME.search(name)) or (bool(_TIME_NAME.search(name)) and values.between(1900, 2100).all())
+    if not _is_text(series):
+        return False
+    sample = [str(v).strip() for v in series.dropna().head(DATE_SAMPLE_SIZE) if str(v).strip()]
+    if not sample:
+        return False
+    return sum(bool(_DATE_VALUE.match(v)) for v in sample) >= 0.9 * len(sample)
+
+
+def _is_identifier(series: pd.Series) -> bool:
+    """Integer keys (order_id, 編號, ...) are labels, not measures."""
+    return bool(_ID_NAME.search(str(series.name))) and series.nunique(dropna=True) == series.count()
+
+
+def _numeric_values(series: pd.Series) -> Optional[pd.Series]:
+    """The series as numbers, if it is numeric or is text that is (almost) entirely numeric."""
+    if pd.api.types.is_bool_dtype(series):
+        return None
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    if not _is_text(series):
+        return None
+    stripped = series.astype(str).str.strip()
+    non_empty = stripped[stripped != ""]
+    if non_empty.empty:
+        return None
+    converted = pd.to_numeric(non_empty, errors="coerce")
+    if converted.notna().mean() < 0.95:
+        return None
+    return pd.to_numeric(stripped.where(stripped != ""), errors="coerce")
+
+
+def profile_columns(df: pd.DataFrame) -> dict:
+    """Splits the columns into time, numeric (measures) and categorical, with each categorical column's cardinality."""
+    time_cols: List[str] = []
+    numeric_cols: List[str] = []
+    categorical_cols: List[str] = []
+    for col in df.columns:
+        series = df[col]
+        if _is_time_column(series):
+            time_cols.append(col)
+        elif _numeric_values(series) is not None and not _is_identifier(series):
+            numeric_cols.append(col)
+        else:
+            categorical_cols.append(col)
+    cardinality = {col: int(df[col].nunique(dropna=True)) for col in categorical_cols}
+    return {"time": time_cols, "numeric": numeric_cols, "categorical": categorical_cols, "cardinality": cardinality}
+
+
+def recommend_chart(df: pd.DataFrame, question: str = None) -> Optional[dict]:
+    """
+    A chart for the result, or None when no rule is confident. The recommendation is a dict:
+    {"kind": indicator|line|bar|pie|scatter|histogram, "x", "y" (list), "color", "reason"}.
+    """
+    if df is None or df.empty or df.shape[1] == 0:
+        return None
+    profile = profile_columns(df)
+    time_cols, numeric_cols, categorical_cols = profile["time"], profile["numeric"], profile["categorical"]
+    cardinality = profile["cardinality"]
+    rows = len(df)
+
+    def chart(kind, x=None, y=None, color=None, reason=""):
+        return {"kind": kind, "x": x, "y": list(y or []), "color": color, "reason": reason}
+
+    if not numeric_cols:
+        return None
+
+    if rows == 1:
+        if len(numeric_cols) == 1 and df.shape[1] <= 2:
+            return chart("indicator", y=numeric_cols, reason="single value")
+        if not time_cols and len(numeric_cols) <= MAX_SERIES * 2:
+            return chart("bar", y=numeric_cols, reason="one row of several measures")
+        return None
+
+    series = numeric_cols[:MAX_SERIES]
+    if len(time_cols) == 1 and len(categorical_cols) <= 1:
+        color = categorical_cols[0] if categorical_cols and cardinality[categorical_cols[0]] <= MAX_COLOR_GROUPS else None
+        if categorical_cols and color is None:
+            return None
+        if color and len(numeric_cols) > 1:
+            return None
+        return chart("line", x=time_cols[0], y=series, color=color, reason="measure over time")
+
+    if time_cols:
+        return None
+
+    if len(categorical_cols) == 1:
+        category = categorical_cols[0]
+        if cardinality[category] > MAX_BAR_CATEGORIES:
+            return None
+        if cardinality[category] < rows and len(numeric_cols) == 1:
+            # Repeated categories are not aggregated by the query; leave the presentation to the LLM
+            return None
+        values = _numeric_values(df[numeric_cols[0]])
+        if (len(numeric_cols) == 1 and cardinality[category] <= MAX_PIE_SLICES and question
+                and _SHARE_WORDS.search(question) and (values.dropna() >= 0).all()):
+            return chart("pie", x=category, y=numeric_cols, reason="share of a total across few categories")
+        return chart("bar", x=category, y=series, reason="measure by category")
+
+    if len(categorical_cols) == 2 and len(numeric_cols) == 1:
+        first, second = sorted(categorical_cols, key=lambda c: cardinality[c], reverse=True)
+        if cardinality[first] <= MAX_BAR_CATEGORIES and cardinality[second] <= MAX_COLOR_GROUPS:
+            return chart("bar", x=first, y=numeric_cols, color=second, reason="measure by two categories")
+        return None
+
+    if not categorical_cols:
+        if len(numeric_cols) == 1:
+            return chart("histogram", x=numeric_cols[0], reason="distribution of one measure")
+        if len(numeric_cols) == 2 and rows >= 3:
+            return chart("scatter", x=numeric_cols[0], y=numeric_cols[1:], reason="relationship between two measures")
+    return None
+
+
+def build_chart(df: pd.DataFrame, recommendation: dict) -> go.Figure:
+    """Builds the Plotly figure for a recommend_chart() result."""
+    kind, x, y, color = recommendation["kind"], recommendation["x"], recommendation["y"], recommendation["color"]
+    data = df.copy()
+    for col in y + ([x] if kind in ("histogram", "scatter") else []):
+        data[col] = _numeric_values(data[col])
+
+    if kind == "indicator":
+        return go.Figure(go.Indicator(mode="number", value=float(data[y[0]].iloc[0]), title={"text": str(y[0])}))
+    if kind == "bar" and x is None:
+        row = data[y].iloc[0]
+        return px.bar(x=[str(c) for c in y], y=row.values, labels={"x": "", "y": ""})
+    if kind == "line":
+        if not pd.api.types.is_datetime64_any_dtype(data[x]):
+            numbers = _numeric_values(data[x])
+            data[x] = numbers if numbers is not None else pd.to_datetime(data[x], errors="coerce")
+        data = data.sort_values(x)
+        return px.line(data, x=x, y=y if len(y) > 1 else y[0], color=color, markers=len(data) <= 30)
+    if kind == "bar":
+        if len(y) == 1 and color is None:
+            data = data.sort_values(y[0], ascending=False)
+        return px.bar(data, x=x, y=y if len(y) > 1 else y[0], color=color, barmode="group")
+    if kind == "pie":
+        return px.pie(data, names=x, values=y[0])
+    if kind == "scatter":
+        return px.scatter(data, x=x, y=y[0])
+    if kind == "histogram":
+        return px.histogram(data, x=x)
+    raise ValueError(f"Unknown chart kind: {kind}")
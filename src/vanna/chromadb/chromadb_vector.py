@@ -3,15 +3,41 @@ from typing import List
 
 import chromadb
 import pandas as pd
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
 
 from ..base import VannaBase
+from ..embedding import get_embedding_batcher
+from ..scoring import scored
 from ..utils import deterministic_uuid
 
 default_ef = embedding_functions.DefaultEmbeddingFunction()
 
 
+class BatchedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Routes a Chroma embedding function through the shared micro-batching service (vanna.embedding),
+    so concurrent queries from every instance using the same function are embedded together.
+    """
+
+    def __init__(self, embedding_function, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedding_function = embedding_function
+        self._batcher = get_embedding_batcher(
+            ("chromadb", id(embedding_function)), embedding_function,
+            max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+        )
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self._batcher.embed_many(list(input))
+
+    def __getattr__(self, name):
+        # name(), get_config() and friends come from the wrapped function
+        if name == "embedding_function":
+            raise AttributeError(name)
+        return getattr(self.embedding_function, name)
+
+
 class ChromaDB_VectorStore(VannaBase):
     def __init__(self, config=None):
         # VannaBase.__init__(self, config=config)
@@ -20,6 +46,12 @@ class ChromaDB_VectorStore(VannaBase):
 
         path = config.get("path", ".")
         self.embedding_function = config.get("embedding_function", default_ef)
+        if config.get("embedding_batching", True) and not isinstance(self.embedding_function, BatchedEmbeddingFunction):
+            self.embedding_function = BatchedEmbeddingFunction(
+                self.embedding_function,
+                max_batch_size=config.get("embedding_batch_size", 32),
+                max_wait_ms=config.get("embedding_max_wait_ms", 5.0),
+            )
         curr_client = config.get("client", "persistent")
         client_settings = config.get("client_settings", Settings(anonymized_telemetry=False))
         collection_metadata = config.get("collection_metadata", None)
@@ -259,26 +291,39 @@ class ChromaDB_VectorStore(VannaBase):
 
             return documents
 
-    def get_similar_question_sql(self, question: str, **kwargs) -> list:
-        return ChromaDB_VectorStore._extract_documents(
-            self.sql_collection.query(
+    @staticmethod
+    def _extract_scored_documents(query_results, metric: str = "l2") -> list:
+        """
+        Like _extract_documents, but attaches the calibrated similarity of each document
+        (see vanna.scoring): QA dicts gain "similarity"/"distance" keys, strings become ScoredText.
+        """
+        documents = ChromaDB_VectorStore._extract_documents(query_results) or []
+        distances = (query_results or {}).get("distances") or [[]]
+        distances = distances[0] if distances else []
+        if len(distances) != len(documents):
+            return documents
+        return [scored(doc, dist, metric) for doc, dist in zip(documents, distances)]
+
+    @staticmethod
+    def _distance_metric(collection) -> str:
+        # Chroma collections default to squared L2 unless created with {"hnsw:space": "cosine" | "ip"}
+        return (collection.metadata or {}).get("hnsw:space", "l2")
+
+    def _query_scored(self, collection, question: str, n_results: int) -> list:
+        return ChromaDB_VectorStore._extract_scored_documents(
+            collection.query(
                 query_texts=[question],
-                n_results=self.n_results_sql,
-            )
+                n_results=n_results,
+                include=["documents", "distances"],
+            ),
+            ChromaDB_VectorStore._distance_metric(collection),
         )
 
+    def get_similar_question_sql(self, question: str, **kwargs) -> list:
+        return self._query_scored(self.sql_collection, question, self.n_results_sql)
+
     def get_related_ddl(self, question: str, **kwargs) -> list:
-        return ChromaDB_VectorStore._extract_documents(
-            self.ddl_collection.query(
-                query_texts=[question],
-                n_results=self.n_results_ddl,
-            )
-        )
+        return self._query_scored(self.ddl_collection, question, self.n_results_ddl)
 
     def get_related_documentation(self, question: str, **kwargs) -> list:
-        return ChromaDB_VectorStore._extract_documents(
-            self.documentation_collection.query(
-                query_texts=[question],
-                n_results=self.n_results_documentation,
-            )
-        )
+        return self._query_scored(self.documentation_collection, question, self.n_results_documentation)
@@ -0,0 +1 @@
+from .batcher import EmbeddingBatcher, get_embedding_batcher
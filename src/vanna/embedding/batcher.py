@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Hashable, List, Sequence
+
+# A batch is dispatched once it holds this many texts, or when the oldest waiting text has waited MAX_WAIT_MS.
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+
+
+def _as_list(vector) -> List[float]:
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into micro-batches.
+
+    Callers block on embed() / embed_many() while a dedicated worker thread drains the queue:
+    it takes the first waiting text, keeps collecting until `max_batch_size` texts are queued or
+    `max_wait_ms` has passed, and runs `embed_batch` once for the whole batch (identical texts are
+    embedded once). Batched inference amortizes the per-call model overhead, which is most of the
+    cost of embedding one short question on CPU.
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], Sequence], max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS, name: str = "embedding"):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopped = False
+                    self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, texts: Sequence[str]) -> List[Future]:
+        """Queues texts and returns one Future per text, resolving to its embedding (a list of floats)."""
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        self._ensure_started()
+        return futures
+
+    def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        return [future.result() for future in self.submit(texts)]
+
+    def embed(self, text: str) -> List[float]:
+        return self.embed_many([text])[0]
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Whatever is already queued joins the batch even once the window has closed
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped = True
+                break
+            batch.append(item)
+        return batch
+
+    def _process(self, batch: list):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = self.embed_batch(texts)
+            by_text = {text: _as_list(vector) for text, vector in zip(texts, vectors)}
+            if len(by_text) != len(texts):
+                raise ValueError(f"Embedding function returned {len(vectors)} vectors for {len(texts)} texts")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for text, future in batch:
+            future.set_result(by_text[text])
+
+    def _run(self):
+        while not self._stopped:
+            first = self._queue.get()
+            if first is None:
+                break
+            self._process(self._collect(first))
+
+    def close(self):
+        """Stops the worker once the requests queued so far are served."""
+        self._queue.put(None)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_embedding_batcher(key: Hashable, embed_batch: Callable[[List[str]], Sequence], **kwargs) -> EmbeddingBatcher:
+    """
+    Process-wide batcher per embedding model, so every vector store (and every user's instance)
+    that embeds with the same model shares one queue and one worker.
+    """
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = EmbeddingBatcher(embed_batch, name=str(key), **kwargs)
+        return batcher
@@ -1,6 +1,9 @@
-import os 
+import os
 import json
 import uuid
+import hashlib
+import threading
+from functools import partial
 from typing import List, Dict, Any
 
 import faiss
@@ -8,9 +11,59 @@ import numpy as np
 import pandas as pd
 
 from ..base import VannaBase
+from ..embedding import get_embedding_batcher
 from ..exceptions import DependencyError
+from ..scoring import ScoredText, scored
+from .storage import FaissStorage
+
+# Training data type -> prefix of the collection (sql_index.faiss, doc entries in the store, ...)
+_COLLECTIONS = {"sql": "sql", "ddl": "ddl", "documentation": "doc"}
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+STORE_FILENAME = "faiss_store.sqlite"
+
+# model name -> SentenceTransformer, shared by every FAISS instance in the process
+_embedding_models = {}
+_embedding_models_lock = threading.Lock()
+
+
+def _load_embedding_model(model_name: str):
+    with _embedding_models_lock:
+        model = _embedding_models.get(model_name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = _embedding_models[model_name] = SentenceTransformer(model_name)
+        return model
+
+
+def _encode_batch(model_name: str, texts: List[str]):
+    # Resolves the model by name, so a shared batcher never holds on to the instance that created it
+    return _load_embedding_model(model_name).encode(texts)
 
 class FAISS(VannaBase):
+    """
+    FAISS vector store. Every index is an IndexIDMap2 keyed by a 63-bit id derived from the entry id,
+    so deletes never depend on positions.
+
+    Metadata and embeddings live in SQLite (see FaissStorage); indexes can therefore be rebuilt or
+    trained without re-running the embedding model. With the persistent client an insert is one
+    SQLite transaction that also appends to a write-ahead log; the index file is a snapshot written
+    only on compaction (every `wal_compact_every` logged operations, or compact()). Startup maps the
+    snapshot (IO_FLAG_MMAP) and replays the log on top of it.
+
+    Config keys:
+        index_type          "flat" (exact, default), "hnsw" or "ivfpq"; a snapshot of another type is rebuilt at startup
+        hnsw_m, hnsw_ef_construction, hnsw_ef_search   HNSW graph parameters (32, 40, 64)
+        hnsw_max_deleted_ratio   HNSW cannot remove vectors; deleted ids are filtered at search time
+                                 and the graph is rebuilt once they exceed this share (default 0.2)
+        ivf_nlist, ivf_nprobe, pq_m, pq_nbits   IVF-PQ parameters (256, 16, 16, 8)
+        ivf_train_min       vectors needed before IVF-PQ is trained; until then a flat index is used
+                            (default max(39 * ivf_nlist, 2 ** pq_nbits))
+        wal_compact_every   logged operations per collection before a new snapshot is written (default 1000)
+        mmap                memory-map index snapshots when loading (default True)
+        embedding_batching  embed through the shared micro-batching service, vanna.embedding (default True)
+        embedding_batch_size, embedding_max_wait_ms   batching limits (32, 5)
+    """
+
     def __init__(self, config=None):
         if config is None:
             config = {}
@@ -38,96 +91,280 @@ class FAISS(VannaBase):
         self.n_results_documentation = config.get('n_results_documentation', config.get("n_results", 10))
         self.curr_client = config.get("client", "persistent")
 
+        self.index_type = config.get("index_type", "flat")
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported index_type was set in config: {self.index_type}")
+        self.hnsw_m = config.get("hnsw_m", 32)
+        self.hnsw_ef_construction = config.get("hnsw_ef_construction", 40)
+        self.hnsw_ef_search = config.get("hnsw_ef_search", 64)
+        self.hnsw_max_deleted_ratio = config.get("hnsw_max_deleted_ratio", 0.2)
+        self.ivf_nlist = config.get("ivf_nlist", 256)
+        self.ivf_nprobe = config.get("ivf_nprobe", 16)
+        self.pq_m = config.get("pq_m", 16)
+        self.pq_nbits = config.get("pq_nbits", 8)
+        self.ivf_train_min = config.get("ivf_train_min", max(39 * self.ivf_nlist, 2 ** self.pq_nbits))
+        if self.index_type == "ivfpq" and self.embedding_dim % self.pq_m != 0:
+            raise ValueError(f"pq_m ({self.pq_m}) must divide embedding_dim ({self.embedding_dim})")
+        self.wal_compact_every = config.get("wal_compact_every", 1000)
+        self.mmap = config.get("mmap", True)
+
         if self.curr_client == 'persistent':
-            self.sql_index = self._load_or_create_index('sql_index.faiss')
-            self.ddl_index = self._load_or_create_index('ddl_index.faiss')
-            self.doc_index = self._load_or_create_index('doc_index.faiss')
+            os.makedirs(self.path, exist_ok=True)
+            self.storage = FaissStorage(os.path.join(self.path, STORE_FILENAME))
+            indexes = [None, None, None]
         elif self.curr_client == 'in-memory':
-            self.sql_index = faiss.IndexFlatL2(self.embedding_dim)
-            self.ddl_index = faiss.IndexFlatL2(self.embedding_dim)
-            self.doc_index = faiss.IndexFlatL2(self.embedding_dim)
+            self.storage = FaissStorage()
+            indexes = [None, None, None]
         elif isinstance(self.curr_client, list) and len(self.curr_client) == 3 and all(isinstance(idx, faiss.Index) for idx in self.curr_client):
-            self.sql_index = self.curr_client[0]
-            self.ddl_index = self.curr_client[1]
-            self.doc_index = self.curr_client[2]
+            self.storage = FaissStorage()
+            indexes = self.curr_client
         else:
             raise ValueError(f"Unsupported storage type was set in config: {self.curr_client}")
 
-        self.sql_metadata: List[Dict[str, Any]] = self._load_or_create_metadata('sql_metadata.json')
-        self.ddl_metadata: List[Dict[str, str]] = self._load_or_create_metadata('ddl_metadata.json')
-        self.doc_metadata: List[Dict[str, str]] = self._load_or_create_metadata('doc_metadata.json')
+        # Serializes index mutations with their log entries so a snapshot never misses an operation
+        self._write_lock = threading.RLock()
+        for prefix, index in zip(_COLLECTIONS.values(), indexes):
+            self._init_collection(prefix, index)
+
+        self.embedding_model_name = config.get('embedding_model', 'all-MiniLM-L6-v2')
+        self._embedding_batcher = None
+        if config.get("embedding_batching", True):
+            # Keyed by model name: every FAISS instance using the model shares one queue and worker
+            self._embedding_batcher = get_embedding_batcher(
+                ("sentence_transformers", self.embedding_model_name), partial(_encode_batch, self.embedding_model_name),
+                max_batch_size=config.get("embedding_batch_size", 32),
+                max_wait_ms=config.get("embedding_max_wait_ms", 5.0),
+            )
 
-        model_name = config.get('embedding_model', 'all-MiniLM-L6-v2')
-        self.embedding_model = SentenceTransformer(model_name)
+    @property
+    def embedding_model(self):
+        """The SentenceTransformer for `embedding_model`, loaded on first use and shared per model name."""
+        return _load_embedding_model(self.embedding_model_name)
 
-    def _load_or_create_index(self, filename):
-        filepath = os.path.join(self.path, filename)
-        if os.path.exists(filepath):
-            return faiss.read_index(filepath)
-        return faiss.IndexFlatL2(self.embedding_dim)
+    @property
+    def sql_metadata(self) -> List[Dict[str, Any]]:
+        return self.storage.entries("sql")
 
-    def _load_or_create_metadata(self, filename):
-        filepath = os.path.join(self.path, filename)
-        if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                return json.load(f)
-        return []
+    @property
+    def ddl_metadata(self) -> List[Dict[str, str]]:
+        return self.storage.entries("ddl")
 
-    def _save_index(self, index, filename):
+    @property
+    def doc_metadata(self) -> List[Dict[str, str]]:
+        return self.storage.entries("doc")
+
+    @staticmethod
+    def _vector_id(entry_id: str) -> int:
+        """Stable non-negative int64 id for an entry id (entry ids are uuid4 strings)."""
+        try:
+            value = uuid.UUID(str(entry_id)).int
+        except ValueError:
+            value = int.from_bytes(hashlib.sha1(str(entry_id).encode("utf-8")).digest()[:8], "big")
+        return value & 0x7FFF_FFFF_FFFF_FFFF
+
+    def _snapshot_path(self, prefix: str) -> str:
+        return os.path.join(self.path, f'{prefix}_index.faiss')
+
+    def _read_snapshot(self, prefix: str):
+        filepath = self._snapshot_path(prefix)
+        if self.curr_client != 'persistent' or not os.path.exists(filepath):
+            return None
+        return faiss.read_index(filepath, faiss.IO_FLAG_MMAP if self.mmap else 0)
+
+    def _import_legacy(self, prefix: str, index):
+        """
+        Moves a collection written by the JSON-metadata layout ({prefix}_metadata.json plus a
+        positional IndexFlatL2, or an IndexIDMap2 with {prefix}_vectors.npz) into the store.
+        """
+        metadata_path = os.path.join(self.path, f'{prefix}_metadata.json')
+        if not os.path.exists(metadata_path) or self.storage.count(prefix):
+            return
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+        vectors_path = os.path.join(self.path, f'{prefix}_vectors.npz')
+        if os.path.exists(vectors_path):
+            with np.load(vectors_path) as data:
+                vectors = {int(i): v for i, v in zip(data["ids"], data["vectors"])}
+        else:
+            if index is None and os.path.exists(self._snapshot_path(prefix)):
+                index = faiss.read_index(self._snapshot_path(prefix))
+            stored = index.reconstruct_n(0, index.ntotal) if index is not None and index.ntotal else []
+            vectors = {self._vector_id(m["id"]): stored[i] for i, m in enumerate(metadata[:len(stored)])}
+        for entry in metadata:
+            vid = self._vector_id(entry["id"])
+            if vid in vectors:
+                self.storage.add(prefix, entry["id"], vid, {k: v for k, v in entry.items() if k != "id"}, vectors[vid])
         if self.curr_client == 'persistent':
-            filepath = os.path.join(self.path, filename)
-            faiss.write_index(index, filepath)
+            os.replace(metadata_path, metadata_path + '.migrated')
+            if os.path.exists(vectors_path):
+                os.remove(vectors_path)
+            if os.path.exists(self._snapshot_path(prefix)):
+                os.remove(self._snapshot_path(prefix))
 
-    def _save_metadata(self, metadata, filename):
+    def _init_collection(self, prefix: str, index):
+        self._import_legacy(prefix, index)
+        # Ids still inside an HNSW snapshot after their entry was removed; filtered out at search time
+        setattr(self, f"{prefix}_deleted", self.storage.tombstones(prefix))
+        if index is None:
+            index = self._read_snapshot(prefix)
+        if isinstance(index, faiss.IndexIDMap2) and self._matches_config(prefix, index):
+            self._set_search_params(index)
+            setattr(self, f"{prefix}_index", index)
+            self._replay(prefix)
+            if index.ntotal - len(getattr(self, f"{prefix}_deleted")) == self.storage.count(prefix):
+                return
+        self._rebuild_index(prefix)
+
+    def _matches_config(self, prefix: str, index) -> bool:
+        """True if a loaded snapshot has the configured dimension and index type; otherwise it is rebuilt."""
+        if index.d != self.embedding_dim:
+            return False
+        inner = faiss.downcast_index(index.index)
+        if self.index_type == "hnsw":
+            return isinstance(inner, faiss.IndexHNSW)
+        if self.index_type == "ivfpq":
+            # The flat bootstrap index is right only while there are too few vectors to train on
+            return isinstance(inner, faiss.IndexIVF) or (
+                isinstance(inner, faiss.IndexFlat) and self.storage.count(prefix) < self.ivf_train_min)
+        return isinstance(inner, faiss.IndexFlat)
+
+    def _replay(self, prefix: str):
+        """Applies the logged operations newer than the snapshot to the loaded index."""
+        ops = self.storage.pending(prefix, self.storage.snapshot_seq(prefix))
+        added = [vid for _, op, vid in ops if op == 'add']
+        # Entries removed again after being logged are gone from the store and are simply not added
+        vectors = self.storage.vectors(prefix, added)
+        if vectors:
+            index = getattr(self, f"{prefix}_index")
+            ids = np.fromiter(vectors.keys(), dtype=np.int64, count=len(vectors))
+            index.add_with_ids(np.vstack(list(vectors.values())), ids)
+        logged = set(added)
+        for _, op, vid in ops:
+            if op == 'remove' and vid not in logged:
+                self._remove_from_index(prefix, vid)
+
+    def _new_index(self, n_vectors: int):
+        if self.index_type == "hnsw":
+            inner = faiss.IndexHNSWFlat(self.embedding_dim, self.hnsw_m)
+            inner.hnsw.efConstruction = self.hnsw_ef_construction
+        elif self.index_type == "ivfpq" and n_vectors >= self.ivf_train_min:
+            quantizer = faiss.IndexFlatL2(self.embedding_dim)
+            inner = faiss.IndexIVFPQ(quantizer, self.embedding_dim, self.ivf_nlist, self.pq_m, self.pq_nbits)
+        else:
+            inner = faiss.IndexFlatL2(self.embedding_dim)
+        index = faiss.IndexIDMap2(inner)
+        self._set_search_params(index)
+        return index
+
+    def _set_search_params(self, index):
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.hnsw_ef_search
+        elif isinstance(inner, faiss.IndexIVF):
+            inner.nprobe = self.ivf_nprobe
+
+    def _is_untrained_ivfpq(self, index) -> bool:
+        """True while an ivfpq store is still served by its flat bootstrap index."""
+        return self.index_type == "ivfpq" and not isinstance(faiss.downcast_index(index.index), faiss.IndexIVF)
+
+    def _rebuild_index(self, prefix: str):
+        """Rebuilds (and trains, for IVF-PQ) a collection's index from the stored vectors, then snapshots it."""
+        with self._write_lock:
+            index = self._new_index(self.storage.count(prefix))
+            if not index.is_trained:
+                # k-means gains little beyond ~100 points per list; train on a bounded prefix of the store
+                sample, size = [], 0
+                for _, batch in self.storage.iter_vectors(prefix):
+                    sample.append(batch)
+                    size += len(batch)
+                    if size >= max(self.ivf_train_min, 100 * self.ivf_nlist):
+                        break
+                index.train(np.vstack(sample))
+            for ids, batch in self.storage.iter_vectors(prefix):
+                index.add_with_ids(batch, ids)
+            setattr(self, f"{prefix}_index", index)
+            getattr(self, f"{prefix}_deleted").clear()
+            self._write_snapshot(prefix)
+
+    def _write_snapshot(self, prefix: str):
+        seq = self.storage.last_seq()
         if self.curr_client == 'persistent':
-            filepath = os.path.join(self.path, filename)
-            with open(filepath, 'w') as f:
-                json.dump(metadata, f)
+            # Write aside and rename, so a crash never leaves a torn snapshot and mapped readers keep the old file
+            filepath = self._snapshot_path(prefix)
+            faiss.write_index(getattr(self, f"{prefix}_index"), filepath + '.tmp')
+            os.replace(filepath + '.tmp', filepath)
+        self.storage.set_tombstones(prefix, getattr(self, f"{prefix}_deleted"))
+        self.storage.mark_snapshot(prefix, seq)
+
+    def compact(self, collection_name: str = None):
+        """Writes fresh index snapshots (one collection, or all) and truncates the write-ahead log."""
+        prefixes = [_COLLECTIONS[collection_name]] if collection_name else list(_COLLECTIONS.values())
+        with self._write_lock:
+            for prefix in prefixes:
+                self._write_snapshot(prefix)
+
+    def _maybe_compact(self, prefix: str):
+        if self.storage.pending_count(prefix) >= self.wal_compact_every:
+            self._write_snapshot(prefix)
 
     def generate_embedding(self, data: str, **kwargs) -> List[float]:
-        embedding = self.embedding_model.encode(data)
-        assert embedding.shape[0] == self.embedding_dim, \
-            f"Embedding dimension mismatch: expected {self.embedding_dim}, got {embedding.shape[0]}"
-        return embedding.tolist()
+        if self._embedding_batcher is not None:
+            embedding = self._embedding_batcher.embed(data)
+        else:
+            embedding = self.embedding_model.encode(data).tolist()
+        assert len(embedding) == self.embedding_dim, \
+            f"Embedding dimension mismatch: expected {self.embedding_dim}, got {len(embedding)}"
+        return embedding
 
-    def _add_to_index(self, index, metadata_list, text, extra_metadata=None) -> str:
-        embedding = self.generate_embedding(text)
-        index.add(np.array([embedding], dtype=np.float32))
+    def _add_to_index(self, prefix, text, extra_metadata=None) -> str:
+        vector = np.array(self.generate_embedding(text), dtype=np.float32)
         entry_id = str(uuid.uuid4())
-        metadata_list.append({"id": entry_id, **(extra_metadata or {})})
+        vid = self._vector_id(entry_id)
+        with self._write_lock:
+            self.storage.add(prefix, entry_id, vid, extra_metadata or {}, vector)
+            index = getattr(self, f"{prefix}_index")
+            if self._is_untrained_ivfpq(index) and self.storage.count(prefix) >= self.ivf_train_min:
+                # Enough vectors to train IVF-PQ: replace the flat bootstrap index
+                self._rebuild_index(prefix)
+            else:
+                index.add_with_ids(vector.reshape(1, -1), np.array([vid], dtype=np.int64))
+                self._maybe_compact(prefix)
         return entry_id
     
     def add_question_sql(self, question: str, sql: str, **kwargs) -> str:
-        entry_id = self._add_to_index(self.sql_index, self.sql_metadata, question + " " + sql, {"question": question, "sql": sql})
-        self._save_index(self.sql_index, 'sql_index.faiss')
-        self._save_metadata(self.sql_metadata, 'sql_metadata.json')
-        return entry_id
+        return self._add_to_index("sql", question + " " + sql, {"question": question, "sql": sql})
 
     def add_ddl(self, ddl: str, **kwargs) -> str:
-        entry_id = self._add_to_index(self.ddl_index, self.ddl_metadata, ddl, {"ddl": ddl})
-        self._save_index(self.ddl_index, 'ddl_index.faiss')
-        self._save_metadata(self.ddl_metadata, 'ddl_metadata.json')
-        return entry_id
+        return self._add_to_index("ddl", ddl, {"ddl": ddl})
 
     def add_documentation(self, documentation: str, **kwargs) -> str:
-        entry_id = self._add_to_index(self.doc_index, self.doc_metadata, documentation, {"documentation": documentation})
-        self._save_index(self.doc_index, 'doc_index.faiss')
-        self._save_metadata(self.doc_metadata, 'doc_metadata.json')
-        return entry_id
+        return self._add_to_index("doc", documentation, {"documentation": documentation})
 
-    def _get_similar(self, index, metadata_list, text, n_results) -> list:
+    def _get_similar(self, prefix, text, n_results) -> list:
+        index = getattr(self, f"{prefix}_index")
+        if index.ntotal == 0:
+            return []
+        deleted = getattr(self, f"{prefix}_deleted")
         embedding = self.generate_embedding(text)
-        D, I = index.search(np.array([embedding], dtype=np.float32), k=n_results)
-        return [] if len(I[0]) == 0 or I[0][0] == -1 else [metadata_list[i] for i in I[0]]
+        # Over-fetch by the number of tombstoned ids so that filtering them still leaves n_results
+        k = min(index.ntotal, n_results + len(deleted))
+        D, I = index.search(np.array([embedding], dtype=np.float32), k=k)
+        # FAISS pads with -1 when it finds fewer than k vectors
+        hits = [(int(vid), float(d)) for d, vid in zip(D[0], I[0]) if vid >= 0 and vid not in deleted]
+        payloads = self.storage.get(prefix, [vid for vid, _ in hits])
+        # Distances are (approximate) squared L2
+        return [scored(payloads[vid], d, "l2") for vid, d in hits if vid in payloads][:n_results]
 
     def get_similar_question_sql(self, question: str, **kwargs) -> list:
-        return self._get_similar(self.sql_index, self.sql_metadata, question, self.n_results_sql)
+        return self._get_similar("sql", question, self.n_results_sql)
     
     def get_related_ddl(self, question: str, **kwargs) -> list:
-        return [metadata["ddl"] for metadata in self._get_similar(self.ddl_index, self.ddl_metadata, question, self.n_results_ddl)]
+        return [ScoredText(metadata["ddl"], metadata["similarity"], metadata["distance"])
+                for metadata in self._get_similar("ddl", question, self.n_results_ddl)]
 
     def get_related_documentation(self, question: str, **kwargs) -> list:
-        return [metadata["documentation"] for metadata in self._get_similar(self.doc_index, self.doc_metadata, question, self.n_results_documentation)]
+        return [ScoredText(metadata["documentation"], metadata["similarity"], metadata["distance"])
+                for metadata in self._get_similar("doc", question, self.n_results_documentation)]
 
     def get_training_data(self, **kwargs) -> pd.DataFrame:
         sql_data = pd.DataFrame(self.sql_metadata)
@@ -141,36 +378,31 @@ class FAISS(VannaBase):
 
         return pd.concat([sql_data, ddl_data, doc_data], ignore_index=True)
 
+    def _remove_from_index(self, prefix: str, vid: int):
+        index = getattr(self, f"{prefix}_index")
+        if isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW):
+            getattr(self, f"{prefix}_deleted").add(vid)
+        else:
+            index.remove_ids(np.array([vid], dtype=np.int64))
+
     def remove_training_data(self, id: str, **kwargs) -> bool:
-        for metadata_list, index, index_name in [
-            (self.sql_metadata, self.sql_index, 'sql_index.faiss'),
-            (self.ddl_metadata, self.ddl_index, 'ddl_index.faiss'),
-            (self.doc_metadata, self.doc_index, 'doc_index.faiss')
-        ]:
-            for i, item in enumerate(metadata_list):
-                if item['id'] == id:
-                    del metadata_list[i]
-                    new_index = faiss.IndexFlatL2(self.embedding_dim)
-                    embeddings = [self.generate_embedding(json.dumps(m)) for m in metadata_list]
-                    if embeddings:
-                        new_index.add(np.array(embeddings, dtype=np.float32))
-                    setattr(self, index_name.split('.')[0], new_index)
-                    
-                    if self.curr_client == 'persistent':
-                        self._save_index(new_index, index_name)
-                        self._save_metadata(metadata_list, f"{index_name.split('.')[0]}_metadata.json")
-                    
-                    return True
-        return False
+        with self._write_lock:
+            removed = self.storage.remove(id)
+            if removed is None:
+                return False
+            prefix, vid = removed
+            self._remove_from_index(prefix, vid)
+            if len(getattr(self, f"{prefix}_deleted")) > self.hnsw_max_deleted_ratio * getattr(self, f"{prefix}_index").ntotal:
+                self._rebuild_index(prefix)
+            else:
+                self._maybe_compact(prefix)
+            return True
 
     def remove_collection(self, collection_name: str) -> bool:
-        if collection_name in ["sql", "ddl", "documentation"]:
-            setattr(self, f"{collection_name}_index", faiss.IndexFlatL2(self.embedding_dim))
-            setattr(self, f"{collection_name}_metadata", [])
-            
-            if self.curr_client == 'persistent':
-                self._save_index(getattr(self, f"{collection_name}_index"), f"{collection_name}_index.faiss")
-                self._save_metadata([], f"{collection_name}_metadata.json")
-            
-            return True
-        return False
\ No newline at end of file
+        prefix = _COLLECTIONS.get(collection_name)
+        if prefix is None:
+            return False
+        with self._write_lock:
+            self.storage.clear(prefix)
+            self._rebuild_index(prefix)
+        return True
@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+class FaissStorage:
+    """
+    SQLite-backed metadata, vector and write-ahead-log storage for the FAISS store.
+
+    - `entries` holds every live entry: its payload (question/sql, ddl or documentation) and its
+      embedding, so indexes can be rebuilt without re-embedding.
+    - `wal` is an append-only log of index operations (add / remove) newer than the last index
+      snapshot written for the collection; replaying it on top of the snapshot restores the index.
+    - `snapshots` records the last WAL sequence number each snapshot covers.
+    - `tombstones` holds ids still present in a snapshot of an index type that cannot delete (HNSW).
+
+    `path=None` keeps everything in an in-memory database.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._lock:
+            if path:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    vid INTEGER PRIMARY KEY,
+                    entry_id TEXT NOT NULL UNIQUE,
+                    collection TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    vector BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_collection ON entries (collection, vid);
+                CREATE TABLE IF NOT EXISTS wal (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    vid INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_wal_collection ON wal (collection, seq);
+                CREATE TABLE IF NOT EXISTS snapshots (collection TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS tombstones (collection TEXT NOT NULL, vid INTEGER NOT NULL, PRIMARY KEY (collection, vid));
+            """)
+            self._conn.commit()
+
+    def add(self, collection: str, entry_id: str, vid: int, payload: dict, vector: np.ndarray):
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO entries (vid, entry_id, collection, payload, vector) VALUES (?, ?, ?, ?, ?)",
+                (vid, entry_id, collection, json.dumps(payload, ensure_ascii=False), blob),
+            )
+            self._conn.execute("INSERT INTO wal (collection, op, vid) VALUES (?, 'add', ?)", (collection, vid))
+
+    def remove(self, entry_id: str) -> Optional[Tuple[str, int]]:
+        """Deletes an entry and logs the removal. Returns (collection, vid), or None if it does not exist."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT collection, vid FROM entries WHERE entry_id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("DELETE FROM entries WHERE vid = ?", (row[1],))
+            self._conn.execute("INSERT INTO wal (collection, op, vid) VALUES (?, 'remove', ?)", row)
+            return row[0], row[1]
+
+    def clear(self, collection: str):
+        with self._lock, self._conn:
+            for table in ("entries", "wal", "snapshots", "tombstones"):
+                self._conn.execute(f"DELETE FROM {table} WHERE collection = ?", (collection,))
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def get(self, collection: str, vids: List[int]) -> Dict[int, dict]:
+        """Payloads (with "id") of the given vector ids; unknown ids are left out."""
+        if not vids:
+            return {}
+        placeholders = ", ".join("?" * len(vids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT vid, entry_id, payload FROM entries WHERE collection = ? AND vid IN ({placeholders})",
+                (collection, *vids),
+            ).fetchall()
+        return {vid: {"id": entry_id, **json.loads(payload)} for vid, entry_id, payload in rows}
+
+    def entries(self, collection: str) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry_id, payload FROM entries WHERE collection = ? ORDER BY rowid", (collection,)
+            ).fetchall()
+        return [{"id": entry_id, **json.loads(payload)} for entry_id, payload in rows]
+
+    def iter_vectors(self, collection: str, batch_size: int = 10000) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yields (ids, vectors) batches of a collection in vid order, without loading it all at once."""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT vid, vector FROM entries WHERE collection = ? AND vid > ? ORDER BY vid LIMIT ?",
+                    (collection, last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            yield ids, np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            last = rows[-1][0]
+
+    def vectors(self, collection: str, vids: List[int]) -> Dict[int, np.ndarray]:
+        if not vids:
+            return {}
+        placeholders = ", ".join("?" * len(vids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT vid, vector FROM entries WHERE collection = ? AND vid IN ({placeholders})",
+                (collection, *vids),
+            ).fetchall()
+        return {vid: np.frombuffer(blob, dtype=np.float32) for vid, blob in rows}
+
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM wal").fetchone()[0]
+
+    def snapshot_seq(self, collection: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT seq FROM snapshots WHERE collection = ?", (collection,)).fetchone()
+        return row[0] if row else 0
+
+    def pending(self, collection: str, after_seq: int) -> List[Tuple[int, str, int]]:
+        """WAL operations (seq, op, vid) of a collection newer than after_seq, oldest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, op, vid FROM wal WHERE collection = ? AND seq > ? ORDER BY seq", (collection, after_seq)
+            ).fetchall()
+
+    def pending_count(self, collection: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM wal WHERE collection = ? AND seq > COALESCE((SELECT seq FROM snapshots WHERE collection = ?), 0)",
+                (collection, collection),
+            ).fetchone()[0]
+
+    def mark_snapshot(self, collection: str, seq: int):
+        """Records that a snapshot covers the WAL up to seq and truncates the covered log."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO snapshots (collection, seq) VALUES (?, ?)", (collection, seq))
+            self._conn.execute("DELETE FROM wal WHERE collection = ? AND seq <= ?", (collection, seq))
+
+    def tombstones(self, collection: str) -> set:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT vid FROM tombstones WHERE collection = ?", (collection,))}
+
+    def set_tombstones(self, collection: str, vids):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tombstones WHERE collection = ?", (collection,))
+            self._conn.executemany("INSERT INTO tombstones (collection, vid) VALUES (?, ?)", [(collection, v) for v in vids])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
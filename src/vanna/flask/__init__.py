@@ -190,6 +190,7 @@ class VannaFlaskAPI:
 
         if self.debug:
             def log(message, title="Info"):
+                message = message() if callable(message) else message
                 [ws.send(json.dumps({'message': message, 'title': title})) for ws in self.ws_clients]
 
             self.vn.log = log
@@ -0,0 +1,2 @@
+from .bm25 import BM25Index, tokenize
+from .hybrid_retrieval import HybridRetrieval, reciprocal_rank_fusion
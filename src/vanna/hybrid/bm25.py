@@ -0,0 +1,100 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Hashable, List, Tuple
+
+_WORD_RE = re.compile(r"[a-z0-9_]+|[㐀-鿿豈-﫿]+")
+_CJK_RE = re.compile(r"[㐀-鿿豈-﫿]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lexical tokens for BM25. ASCII words are lowercased; snake_case identifiers also yield their parts
+    (so "order_no" matches "order"), and CJK runs are split into character bigrams, which
+    approximates word segmentation without a dictionary.
+    """
+    tokens = []
+    for word in _WORD_RE.findall((text or "").lower()):
+        if _CJK_RE.match(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+            if "_" in word:
+                tokens.extend(part for part in word.split("_") if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    A small in-memory Okapi BM25 index with incremental add/remove, keyed by caller-provided ids.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self._doc_lengths = {}
+        self._doc_terms = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._doc_lengths
+
+    def add(self, doc_id: Hashable, text: str):
+        counts = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self._doc_lengths:
+                self._remove_locked(doc_id)
+            for term, tf in counts.items():
+                self._postings[term][doc_id] = tf
+            length = sum(counts.values())
+            self._doc_lengths[doc_id] = length
+            self._doc_terms[doc_id] = tuple(counts)
+            self._total_length += length
+
+    def remove(self, doc_id: Hashable):
+        with self._lock:
+            if doc_id in self._doc_lengths:
+                self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: Hashable):
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_lengths.clear()
+            self._doc_terms.clear()
+            self._total_length = 0
+
+    def search(self, query: str, n: int = 10) -> List[Tuple[Hashable, float]]:
+        """Returns up to n (doc_id, score) pairs, best first. Documents sharing no term are omitted."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_lengths)
+            if not n_docs or not terms:
+                return []
+            avg_length = self._total_length / n_docs or 1.0
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n]
@@ -0,0 +1,174 @@
+import json
+import threading
+from typing import Dict, Hashable, List, Sequence
+
+from ..base import VannaBase
+from .bm25 import BM25Index
+
+# Training data types as reported by get_training_data()
+_KINDS = ("sql", "ddl", "documentation")
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[Sequence[Hashable]], weights: Sequence[float] = None,
+                           k: int = 60) -> List[Hashable]:
+    """
+    Fuses several rankings of the same keys: score(key) = sum(weight / (k + rank)), rank starting at 1.
+    Returns the keys ordered by fused score (ties keep first-seen order).
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    scores = {}
+    for ranking, weight in zip(ranked_lists, weights):
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores, key=lambda key: scores[key], reverse=True)
+
+
+class HybridRetrieval(VannaBase):
+    """
+    Mixin that combines a lexical BM25 index with the dense results of any vector-store mixin
+    through reciprocal rank fusion. Put it before the vector store in the bases:
+
+        class MyVanna(HybridRetrieval, Ollama, ChromaDB_VectorStore): ...
+
+    The BM25 index is kept in memory, built lazily from the store's get_training_data() and
+    updated by add_question_sql / add_ddl / add_documentation.
+
+    Config keys (read from self.config):
+        hybrid_rrf_k             RRF constant k (default 60)
+        hybrid_dense_weight      weight of the vector ranking (default 1.0)
+        hybrid_lexical_weight    weight of the BM25 ranking (default 1.0)
+        hybrid_lexical_candidates  BM25 hits considered per query (default 20)
+        hybrid_top_n             results returned; default: `top_n`/`n` kwarg, else as many as the store returned
+    """
+
+    def _hybrid_config(self, key: str, default):
+        config = getattr(self, "config", None) or {}
+        return config.get(key, default)
+
+    def _lexical_state(self) -> dict:
+        state = self.__dict__.get("_lexical")
+        if state is None:
+            state = self.__dict__.setdefault("_lexical", {
+                "lock": threading.Lock(),
+                "loaded": False,
+                "indexes": {kind: BM25Index() for kind in _KINDS},
+                "documents": {kind: {} for kind in _KINDS},
+            })
+        return state
+
+    @staticmethod
+    def _document_key(kind: str, document) -> Hashable:
+        if kind == "sql":
+            if isinstance(document, dict):
+                return (document.get("question"), document.get("sql"))
+            return ("", str(document))
+        return document if isinstance(document, str) else json.dumps(document, ensure_ascii=False, sort_keys=True)
+
+    @staticmethod
+    def _document_text(kind: str, document) -> str:
+        if kind == "sql" and isinstance(document, dict):
+            return f"{document.get('question') or ''}\n{document.get('sql') or ''}"
+        return document if isinstance(document, str) else str(document)
+
+    def _index_document(self, kind: str, document):
+        state = self._lexical_state()
+        key = self._document_key(kind, document)
+        state["documents"][kind][key] = document
+        state["indexes"][kind].add(key, self._document_text(kind, document))
+
+    def _ensure_lexical_index(self):
+        state = self._lexical_state()
+        if state["loaded"]:
+            return
+        with state["lock"]:
+            if state["loaded"]:
+                return
+            try:
+                # super() skips app-level get_training_data overrides and reaches the vector store
+                df = super().get_training_data()
+            except Exception as e:
+                self.log(f"Could not load training data for the lexical index: {e}", title="Warning")
+                df = None
+            if df is not None and len(df):
+                for row in df.itertuples(index=False):
+                    kind = getattr(row, "training_data_type", None)
+                    if kind not in _KINDS:
+                        continue
+                    if kind == "sql":
+                        self._index_document(kind, {"question": row.question, "sql": row.content})
+                    else:
+                        self._index_document(kind, row.content)
+            state["loaded"] = True
+
+    def invalidate_lexical_index(self):
+        """Drops the BM25 index; it is rebuilt from the vector store on the next query."""
+        state = self._lexical_state()
+        with state["lock"]:
+            for kind in _KINDS:
+                state["indexes"][kind].clear()
+                state["documents"][kind].clear()
+            state["loaded"] = False
+
+    def lexical_search(self, kind: str, question: str, n: int) -> list:
+        """BM25 candidates for one training data type, best first, in the same shape the vector store returns."""
+        self._ensure_lexical_index()
+        state = self._lexical_state()
+        documents = state["documents"][kind]
+        return [documents[key] for key, _ in state["indexes"][kind].search(question, n) if key in documents]
+
+    def _fuse(self, kind: str, question: str, dense: list, kwargs: Dict) -> list:
+        dense = list(dense or [])
+        lexical = self.lexical_search(kind, question, self._hybrid_config("hybrid_lexical_candidates", 20))
+        if not lexical:
+            return dense
+
+        by_key = {}
+        dense_keys, lexical_keys = [], []
+        for document in dense:
+            key = self._document_key(kind, document)
+            by_key.setdefault(key, document)
+            dense_keys.append(key)
+        for document in lexical:
+            key = self._document_key(kind, document)
+            by_key.setdefault(key, document)
+            lexical_keys.append(key)
+
+        fused = reciprocal_rank_fusion(
+            [dense_keys, lexical_keys],
+            weights=[self._hybrid_config("hybrid_dense_weight", 1.0), self._hybrid_config("hybrid_lexical_weight", 1.0)],
+            k=self._hybrid_config("hybrid_rrf_k", 60),
+        )
+        top_n = self._hybrid_config("hybrid_top_n", None) or kwargs.get("top_n") or kwargs.get("n") or len(dense) or len(lexical)
+        return [by_key[key] for key in fused[:top_n]]
+
+    def get_similar_question_sql(self, question: str, **kwargs) -> list:
+        return self._fuse("sql", question, super().get_similar_question_sql(question, **kwargs), kwargs)
+
+    def get_related_ddl(self, question: str, **kwargs) -> list:
+        return self._fuse("ddl", question, super().get_related_ddl(question, **kwargs), kwargs)
+
+    def get_related_documentation(self, question: str, **kwargs) -> list:
+        return self._fuse("documentation", question, super().get_related_documentation(question, **kwargs), kwargs)
+
+    def add_question_sql(self, question: str, sql: str, **kwargs) -> str:
+        doc_id = super().add_question_sql(question, sql, **kwargs)
+        if self._lexical_state()["loaded"]:
+            self._index_document("sql", {"question": question, "sql": sql})
+        return doc_id
+
+    def add_ddl(self, ddl: str, **kwargs) -> str:
+        doc_id = super().add_ddl(ddl, **kwargs)
+        if self._lexical_state()["loaded"]:
+            self._index_document("ddl", ddl)
+        return doc_id
+
+    def add_documentation(self, documentation: str, **kwargs) -> str:
+        doc_id = super().add_documentation(documentation, **kwargs)
+        if self._lexical_state()["loaded"]:
+            self._index_document("documentation", documentation)
+        return doc_id
+
+    def remove_training_data(self, id: str, **kwargs) -> bool:
+        removed = super().remove_training_data(id, **kwargs)
+        self.invalidate_lexical_index()
+        return removed
@@ -0,0 +1,2 @@
+from .cached_llm import LLMResponseCache
+from .response_cache import ResponseCache, cache_key, get_response_cache
@@ -0,0 +1,113 @@
+from typing import Any, Dict
+
+from ..base import VannaBase
+from .response_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, cache_key, get_response_cache
+
+
+class LLMResponseCache(VannaBase):
+    """
+    Mixin caching submit_prompt() responses of any LLM mixin. Put it before the LLM in the bases:
+
+        class MyVanna(LLMResponseCache, Ollama, ChromaDB_VectorStore): ...
+
+    Responses are keyed by the backend class, model, generation options and the exact messages.
+    Caching is on when the effective temperature is 0, or when config["llm_cache"] is True;
+    config["llm_cache"] = False turns it off. Streaming calls are answered from the cache when
+    possible and stored once the stream completes, but are never coalesced.
+
+    Config keys:
+        llm_cache              True / False / None (default: only when temperature is 0)
+        llm_cache_path         SQLite file (default "llm_cache.sqlite")
+        llm_cache_max_entries  LRU capacity (default 5000)
+        llm_cache_ttl          seconds before an entry expires (default: never)
+    """
+
+    # submit_prompt only wraps the next LLM's; backend names skip classes marked like this
+    _llm_passthrough = True
+
+    def _llm_cache_config(self, key: str, default):
+        config = getattr(self, "config", None) or {}
+        return config.get(key, default)
+
+    def _llm_temperature(self):
+        temperature = getattr(self, "temperature", None)
+        if temperature is None:
+            temperature = (getattr(self, "ollama_options", None) or {}).get("temperature")
+        if temperature is None:
+            temperature = self._llm_cache_config("temperature", None)
+        return temperature
+
+    @property
+    def llm_cache_enabled(self) -> bool:
+        return self._llm_cache_enabled_for(None)
+
+    def _llm_cache_enabled_for(self, temperature) -> bool:
+        """Whether a call is cached; `temperature` is a per-call override (submit_prompt(temperature=...))."""
+        enabled = self._llm_cache_config("llm_cache", None)
+        if enabled is not None:
+            return bool(enabled)
+        return (self._llm_temperature() if temperature is None else temperature) == 0
+
+    def _llm_backend(self) -> str:
+        """Name of the LLM mixin whose submit_prompt this cache fronts, past pass-through mixins such as ScheduledLLM."""
+        mro = type(self).__mro__
+        for cls in mro[mro.index(LLMResponseCache) + 1:]:
+            if "submit_prompt" in cls.__dict__ and not cls.__dict__.get("_llm_passthrough", False):
+                return cls.__name__
+        return type(self).__name__
+
+    def _llm_identity(self) -> Dict[str, Any]:
+        return {
+            "backend": self._llm_backend(),
+            "model": getattr(self, "model", None) or self._llm_cache_config("model", None),
+            "temperature": self._llm_temperature(),
+            "options": getattr(self, "ollama_options", None),
+            "max_tokens": getattr(self, "max_tokens", None),
+        }
+
+    def _response_cache(self):
+        return get_response_cache(
+            self._llm_cache_config("llm_cache_path", DEFAULT_CACHE_PATH),
+            max_entries=self._llm_cache_config("llm_cache_max_entries", DEFAULT_MAX_ENTRIES),
+            ttl=self._llm_cache_config("llm_cache_ttl", None),
+        )
+
+    def submit_prompt(self, prompt, **kwargs) -> str:
+        if not self._llm_cache_enabled_for(kwargs.get("temperature")):
+            return super().submit_prompt(prompt, **kwargs)
+        try:
+            cache = self._response_cache()
+            identity = self._llm_identity()
+            if kwargs.get("temperature") is not None:
+                identity["temperature"] = kwargs["temperature"]
+            if kwargs.get("stop") or kwargs.get("stop_condition"):
+                # A stopped generation is a prefix of the full one; never serve one for the other
+                stop_condition = kwargs.get("stop_condition")
+                identity["stop"] = [kwargs.get("stop"), getattr(stop_condition, "__qualname__", None)]
+            key = cache_key(identity, prompt)
+        except Exception as e:
+            self.log(f"LLM cache unavailable, calling the model directly: {e}", title="Warning")
+            return super().submit_prompt(prompt, **kwargs)
+
+        if kwargs.get("stream", False):
+            cached = cache.get(key)
+            if cached is not None:
+                cache.hits += 1
+                return iter([cached])
+            return self._caching_stream(cache, key, identity["model"], super().submit_prompt(prompt, **kwargs))
+
+        return cache.get_or_compute(key, lambda: super(LLMResponseCache, self).submit_prompt(prompt, **kwargs), identity["model"])
+
+    @staticmethod
+    def _caching_stream(cache, key: str, model: str, stream):
+        if isinstance(stream, str):
+            cache.put(key, stream, model)
+            yield stream
+            return
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk if isinstance(chunk, str) else str(chunk))
+            yield chunk
+        # Stored only when the stream ran to completion
+        if chunks:
+            cache.put(key, "".join(chunks), model)
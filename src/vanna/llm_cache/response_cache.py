@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from ..sql_stream import GenerationCancelled
+
+DEFAULT_CACHE_PATH = "llm_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def cache_key(identity: Dict[str, Any], prompt: Any) -> str:
+    """SHA-256 over the backend identity (class, model, options) and the exact messages."""
+    payload = json.dumps({"identity": identity, "prompt": prompt}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed LLM response cache with LRU eviction and in-flight request coalescing.
+
+    get_or_compute(key, compute) returns the stored response if there is one; otherwise the first
+    caller for a key runs `compute` while concurrent callers with the same key wait for its result,
+    so N identical requests cost one generation. If the first caller cancels its generation
+    (GenerationCancelled), the waiters compute the response themselves. Entries beyond `max_entries` are evicted least
+    recently used first; `ttl` (seconds) optionally expires entries.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key: str, response: str, model: str = None):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_responses WHERE key IN (SELECT key FROM llm_responses ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+
+    def get_or_compute(self, key: str, compute: Callable[[], str], model: str = None) -> str:
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            self.coalesced += 1
+            try:
+                return future.result()
+            except GenerationCancelled:
+                # The owner abandoned its own generation; that says nothing about this request
+                return self.get_or_compute(key, compute, model)
+
+        self.misses += 1
+        try:
+            response = compute()
+            # Only complete text is cached; errors and non-string results are returned but never stored
+            if isinstance(response, str) and response:
+                self.put(key, response, model)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_responses")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(path: str = DEFAULT_CACHE_PATH, **kwargs) -> ResponseCache:
+    """Process-wide cache per file, so every instance (and user) writing to it shares hits and in-flight requests."""
+    key = os.path.abspath(path) if path != ":memory:" else path
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ResponseCache(path, **kwargs)
+        return cache
@@ -0,0 +1,11 @@
+from .scheduled_llm import ScheduledLLM
+from .scheduler import (
+    ANALYSIS,
+    BULK,
+    INTERACTIVE,
+    LLMQueueFull,
+    LLMQueueTimeout,
+    LLMScheduler,
+    all_scheduler_metrics,
+    get_scheduler,
+)
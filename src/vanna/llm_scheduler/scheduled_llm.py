@@ -0,0 +1,120 @@
+import time
+import weakref
+
+from ..base import VannaBase
+from ..sql_stream import GenerationCancelled
+from .scheduler import INTERACTIVE, get_scheduler
+
+
+class ScheduledLLM(VannaBase):
+    """
+    Mixin routing submit_prompt() through the process-wide LLMScheduler of the backend. Put it
+    before the LLM in the bases (and after LLMResponseCache, so cache hits never queue):
+
+        class MyVanna(LLMResponseCache, ScheduledLLM, Ollama, ChromaDB_VectorStore): ...
+
+    Callers pass `priority="interactive" | "analysis" | "bulk"` to submit_prompt; self.user_id (if
+    set) is used for per-user fairness. A streamed response holds its slot until the stream ends, is
+    closed or is discarded.
+
+    Config keys:
+        llm_scheduler            False disables scheduling (default True)
+        llm_default_priority     priority of calls that pass none (default "interactive")
+        llm_initial_concurrency  starting concurrency limit per backend (default 2)
+        llm_max_concurrency      upper bound of the adaptive limit (default 8)
+        llm_latency_target       seconds; default: twice the backend's long-run average latency
+        llm_queue_limits         {priority: max waiting requests}, e.g. {"bulk": 100}
+        llm_queue_timeout        seconds a request may wait for a slot (default: no limit)
+    """
+
+    # submit_prompt only wraps the next LLM's (see LLMResponseCache._llm_backend)
+    _llm_passthrough = True
+
+    def _llm_scheduler_config(self, key: str, default):
+        config = getattr(self, "config", None) or {}
+        return config.get(key, default)
+
+    def _llm_scheduler_name(self) -> str:
+        mro = type(self).__mro__
+        backend = next((cls.__name__ for cls in mro[mro.index(ScheduledLLM) + 1:] if "submit_prompt" in cls.__dict__ and not cls.__dict__.get("_llm_passthrough", False)),
+                       type(self).__name__)
+        host = getattr(self, "host", None)
+        return f"{backend}@{host}" if host else backend
+
+    def llm_scheduler(self):
+        return get_scheduler(
+            self._llm_scheduler_name(),
+            initial_limit=self._llm_scheduler_config("llm_initial_concurrency", 2),
+            max_limit=self._llm_scheduler_config("llm_max_concurrency", 8),
+            latency_target=self._llm_scheduler_config("llm_latency_target", None),
+            max_queue=self._llm_scheduler_config("llm_queue_limits", None),
+        )
+
+    def submit_prompt(self, prompt, priority: str = None, **kwargs):
+        if not self._llm_scheduler_config("llm_scheduler", True):
+            return super().submit_prompt(prompt, **kwargs)
+        priority = priority or self._llm_scheduler_config("llm_default_priority", INTERACTIVE)
+        scheduler = self.llm_scheduler()
+        waited = scheduler.acquire(priority, getattr(self, "user_id", None), self._llm_scheduler_config("llm_queue_timeout", None))
+        if waited > 1.0:
+            self.log(f"{priority} LLM request waited {waited:.1f}s for a slot (limit {scheduler.limit:.1f})", title="Info")
+
+        started = time.monotonic()
+        cancelled = getattr(kwargs.get("stop_condition"), "cancelled", None)
+        if cancelled is not None and cancelled.is_set():
+            # Abandoned while it waited for the slot: hand the slot straight to the next request
+            scheduler.abandon()
+            raise GenerationCancelled()
+        try:
+            response = super().submit_prompt(prompt, **kwargs)
+        except GenerationCancelled:
+            # Abandoned by the caller, not a backend failure
+            scheduler.release(priority, time.monotonic() - started)
+            raise
+        except BaseException:
+            scheduler.release(priority, time.monotonic() - started, ok=False)
+            raise
+        if kwargs.get("stream", False) and not isinstance(response, str):
+            return _ScheduledStream(scheduler, priority, started, response)
+        scheduler.release(priority, time.monotonic() - started)
+        return response
+
+
+def _finish_stream(scheduler, priority: str, started: float, outcome: dict, stream):
+    close = getattr(stream, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+    scheduler.release(priority, time.monotonic() - started, outcome["ok"])
+
+
+class _ScheduledStream:
+    """
+    A streamed response holding a scheduler slot. The slot is released exactly once: when the
+    stream is exhausted, raises, is closed, or is garbage-collected without being consumed.
+    """
+
+    def __init__(self, scheduler, priority: str, started: float, stream):
+        self._stream = iter(stream)
+        self._outcome = {"ok": True}
+        # The finalizer must not reference self, or the stream could never be collected
+        self._finish = weakref.finalize(self, _finish_stream, scheduler, priority, started, self._outcome, stream)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._stream)
+        except (StopIteration, GenerationCancelled):
+            self._finish()
+            raise
+        except BaseException:
+            self._outcome["ok"] = False
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
@@ -0,0 +1,192 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+ANALYSIS = "analysis"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, ANALYSIS, BULK)
+
+_LATENCY_WINDOW = 200
+
+
+class LLMQueueFull(Exception):
+    """Raised when a priority class already has `max_queue` requests waiting (backpressure)."""
+
+
+class LLMQueueTimeout(Exception):
+    """Raised when a request waited longer than its timeout for a slot."""
+
+
+def _percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+class LLMScheduler:
+    """
+    Admission control for one LLM backend.
+
+    At most `limit` requests run at once. The limit adapts AIMD-style: every request that finishes
+    within the latency target raises it by 1/limit (about +1 per round of requests), and a slow or
+    failed request multiplies it by `decrease_factor`. The target is `latency_target` seconds if
+    set, otherwise `latency_tolerance` times the long-run average latency of the backend.
+
+    Waiting requests are granted strictly by priority class (interactive, then analysis, then bulk);
+    within a class users are served round-robin, so one user's batch job cannot starve another user.
+    """
+
+    def __init__(self, name: str = "llm", initial_limit: float = 2, min_limit: float = 1, max_limit: float = 8,
+                 decrease_factor: float = 0.5, latency_target: float = None, latency_tolerance: float = 2.0,
+                 max_queue: Dict[str, int] = None):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.latency_tolerance = latency_tolerance
+        self.max_queue = max_queue or {}
+        self.in_flight = 0
+        self._baseline = None
+        self._cond = threading.Condition()
+        # priority -> user -> deque of waiting tickets; OrderedDict order is the round-robin order
+        self._waiting = {priority: OrderedDict() for priority in PRIORITIES}
+        self._granted = set()
+        self._tickets = itertools.count()
+        self._latencies = {priority: deque(maxlen=_LATENCY_WINDOW) for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=_LATENCY_WINDOW) for priority in PRIORITIES}
+        self._completed = {priority: 0 for priority in PRIORITIES}
+        self._rejected = {priority: 0 for priority in PRIORITIES}
+        self._errors = 0
+
+    def _queued(self, priority: str) -> int:
+        return sum(len(tickets) for tickets in self._waiting[priority].values())
+
+    def _dispatch(self):
+        """Grants free slots to the next waiters; called with the condition held."""
+        while self.in_flight < int(self.limit):
+            for priority in PRIORITIES:
+                users = self._waiting[priority]
+                if users:
+                    user, tickets = next(iter(users.items()))
+                    ticket = tickets.popleft()
+                    users.pop(user)
+                    if tickets:
+                        # Back of the line, so the next user of this class goes first
+                        users[user] = tickets
+                    self._granted.add(ticket)
+                    self.in_flight += 1
+                    break
+            else:
+                break
+        self._cond.notify_all()
+
+    def acquire(self, priority: str = INTERACTIVE, user: str = None, timeout: float = None) -> float:
+        """Blocks until a slot is granted; returns the time spent waiting."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            max_queue = self.max_queue.get(priority)
+            if max_queue is not None and self._queued(priority) >= max_queue:
+                self._rejected[priority] += 1
+                raise LLMQueueFull(f"{self.name}: {self._queued(priority)} {priority} requests already waiting")
+            ticket = next(self._tickets)
+            self._waiting[priority].setdefault(user, deque()).append(ticket)
+            self._dispatch()
+            while ticket not in self._granted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    tickets = self._waiting[priority].get(user)
+                    if tickets is not None and ticket in tickets:
+                        tickets.remove(ticket)
+                        if not tickets:
+                            self._waiting[priority].pop(user)
+                    raise LLMQueueTimeout(f"{self.name}: no slot within {timeout}s for a {priority} request")
+                self._cond.wait(remaining)
+            self._granted.discard(ticket)
+        waited = time.monotonic() - started
+        self._waits[priority].append(waited)
+        return waited
+
+    def release(self, priority: str, latency: float, ok: bool = True):
+        """Frees a slot and adapts the limit to the observed latency."""
+        with self._cond:
+            self.in_flight -= 1
+            self._completed[priority] += 1
+            self._latencies[priority].append(latency)
+            target = self.latency_target
+            if target is None and self._baseline is not None:
+                target = self._baseline * self.latency_tolerance
+            if not ok:
+                self._errors += 1
+            if not ok or (target is not None and latency > target):
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            if ok:
+                self._baseline = latency if self._baseline is None else 0.95 * self._baseline + 0.05 * latency
+            self._dispatch()
+
+    def abandon(self):
+        """Frees a slot that was never used for a request, without counting it or adapting the limit."""
+        with self._cond:
+            self.in_flight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: str = INTERACTIVE, user: str = None, timeout: float = None):
+        self.acquire(priority, user, timeout)
+        started = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.release(priority, time.monotonic() - started, ok)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "name": self.name,
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "errors": self._errors,
+                "priorities": {
+                    priority: {
+                        "queued": self._queued(priority),
+                        "completed": self._completed[priority],
+                        "rejected": self._rejected[priority],
+                        "p95_wait": _percentile(self._waits[priority], 0.95),
+                        "p95_latency": _percentile(self._latencies[priority], 0.95),
+                    }
+                    for priority in PRIORITIES
+                },
+            }
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name: str, **kwargs) -> LLMScheduler:
+    """Process-wide scheduler per backend (e.g. one per Ollama host), shared by every instance using it."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(name)
+        if scheduler is None:
+            scheduler = _schedulers[name] = LLMScheduler(name, **kwargs)
+        return scheduler
+
+
+def all_scheduler_metrics() -> list:
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return [scheduler.metrics() for scheduler in schedulers]
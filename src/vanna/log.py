@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import random
+from typing import Any, Callable, Union
+
+logger = logging.getLogger("vanna")
+
+# Payloads (prompts, LLM responses, retrieval results) are cut to this many characters when logged.
+MAX_PAYLOAD_CHARS = int(os.getenv("VANNA_LOG_MAX_PAYLOAD", "2000"))
+# Fraction of DEBUG payload records that are actually emitted (1.0 = all of them).
+PAYLOAD_SAMPLE_RATE = float(os.getenv("VANNA_LOG_SAMPLE_RATE", "1.0"))
+
+_TITLE_LEVELS = {
+    "error": logging.ERROR,
+    "warning": logging.WARNING,
+    "info": logging.INFO,
+}
+
+
+def truncate(text: str, max_chars: int = None) -> str:
+    max_chars = MAX_PAYLOAD_CHARS if max_chars is None else max_chars
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [truncated {len(text) - max_chars} chars]"
+
+
+def _render(value: Any) -> str:
+    if callable(value):
+        value = value()
+    if isinstance(value, str):
+        return value
+    try:
+        return json.dumps(value, ensure_ascii=False, default=str)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class LazyMessage:
+    """
+    Defers building (and capping) a log message until a handler actually formats it.
+    `value` may be a string, any object, or a zero-argument callable returning one.
+    """
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Union[Any, Callable[[], Any]], max_chars: int = None):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        return truncate(_render(self.value), self.max_chars)
+
+
+def level_for_title(title: str) -> int:
+    """Maps VannaBase.log titles to levels; anything that is not an explicit Info/Warning/Error is DEBUG."""
+    return _TITLE_LEVELS.get((title or "").lower(), logging.DEBUG)
+
+
+def is_enabled(level: int, target: logging.Logger = None) -> bool:
+    return (target or logger).isEnabledFor(level)
+
+
+def log_lazy(level: int, message: Union[Any, Callable[[], Any]], title: str = None,
+             target: logging.Logger = None, max_chars: int = None, sample_rate: float = None):
+    """
+    Logs `message` only if `level` is enabled on the target logger. Nothing is built when it is not.
+    DEBUG records are sampled with `sample_rate` (default PAYLOAD_SAMPLE_RATE) to bound hot-path volume.
+    """
+    target = target or logger
+    if not target.isEnabledFor(level):
+        return
+    if level <= logging.DEBUG:
+        rate = PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            return
+    if title:
+        target.log(level, "%s: %s", title, LazyMessage(message, max_chars))
+    else:
+        target.log(level, "%s", LazyMessage(message, max_chars))
+
+
+def capped_payload(details: Any, max_chars: int = None) -> Any:
+    """Caps the string values of a payload dict (e.g. debug events) without serializing the whole thing."""
+    if isinstance(details, dict):
+        return {k: truncate(v, max_chars) if isinstance(v, str) else v for k, v in details.items()}
+    if isinstance(details, str):
+        return truncate(details, max_chars)
+    return details
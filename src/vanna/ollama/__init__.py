@@ -1 +1,3 @@
 from .ollama import Ollama
+from .model_registry import OllamaModelRegistry, get_model_registry
+from .client_pool import close_shared_clients, get_shared_client
@@ -0,0 +1,58 @@
+import atexit
+import importlib.util
+import threading
+from typing import Dict, Tuple
+
+from httpx import Limits, Timeout
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+_clients: Dict[Tuple, object] = {}
+_clients_lock = threading.Lock()
+
+
+def _http2_available(host: str) -> bool:
+  # httpx negotiates HTTP/2 through TLS ALPN only, and needs the optional h2 package
+  return host.startswith("https://") and importlib.util.find_spec("h2") is not None
+
+
+def get_shared_client(host: str, timeout: float = 240.0, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                      max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE,
+                      keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY, http2: bool = None):
+  """
+  One ollama.Client (and so one httpx connection pool) per host and transport settings, shared by
+  every Ollama instance in the process. httpx clients are thread-safe; idle connections are kept
+  alive for `keepalive_expiry` seconds so consecutive asks skip the TCP (and TLS) handshake.
+  `http2=None` enables HTTP/2 when the host is https and h2 is installed.
+  """
+  if http2 is None:
+    http2 = _http2_available(host)
+  key = (host, timeout, max_connections, max_keepalive_connections, keepalive_expiry, http2)
+  with _clients_lock:
+    client = _clients.get(key)
+    if client is None:
+      import ollama
+      client = _clients[key] = ollama.Client(
+        host,
+        timeout=Timeout(timeout),
+        limits=Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections,
+                      keepalive_expiry=keepalive_expiry),
+        http2=http2,
+      )
+    return client
+
+
+def close_shared_clients():
+  with _clients_lock:
+    clients = list(_clients.values())
+    _clients.clear()
+  for client in clients:
+    try:
+      client._client.close()
+    except Exception:
+      pass
+
+
+atexit.register(close_shared_clients)
@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Model states reported by OllamaModelRegistry.status()
+UNKNOWN = "unknown"
+CHECKING = "checking"
+PULLING = "pulling"
+READY = "ready"
+ERROR = "error"
+
+DEFAULT_TTL = 300.0
+
+
+class OllamaModelRegistry:
+  """
+  Process-level record of which models an Ollama host has.
+
+  ensure() never blocks: it returns the cached state and, when the state is unknown or older than
+  `ttl`, checks the host's model list in a background thread and pulls a missing model there.
+  Only one check or pull per model runs at a time. Callers that need the model can wait_until_ready().
+  """
+
+  def __init__(self, host: str, client_factory: Callable[[], object], ttl: float = DEFAULT_TTL):
+    self.host = host
+    self.client_factory = client_factory
+    self.ttl = ttl
+    self._states: Dict[str, dict] = {}
+    self._lock = threading.Lock()
+    self._changed = threading.Condition(self._lock)
+
+  def _set(self, model: str, state: str, error: str = None):
+    with self._changed:
+      self._states[model] = {"model": model, "state": state, "error": error, "updated_at": time.time()}
+      self._changed.notify_all()
+
+  def status(self, model: str) -> dict:
+    with self._lock:
+      return dict(self._states.get(model) or {"model": model, "state": UNKNOWN, "error": None, "updated_at": None})
+
+  def is_ready(self, model: str) -> bool:
+    return self.status(model)["state"] == READY
+
+  def ensure(self, model: str, pull: bool = True) -> dict:
+    """Returns the model's current status, starting a background check (and pull) if it is stale."""
+    with self._lock:
+      current = self._states.get(model)
+      busy = current is not None and current["state"] in (CHECKING, PULLING)
+      fresh = current is not None and current["state"] == READY and time.time() - current["updated_at"] < self.ttl
+      if not busy and not fresh:
+        self._states[model] = {"model": model, "state": CHECKING, "error": None, "updated_at": time.time()}
+        threading.Thread(target=self._check, args=(model, pull), name=f"ollama-check-{model}", daemon=True).start()
+    return self.status(model)
+
+  def _check(self, model: str, pull: bool):
+    try:
+      client = self.client_factory()
+      model_response = client.list()
+      model_lists = [model_element['model'] for model_element in model_response.get('models', [])]
+      if model not in model_lists:
+        if not pull:
+          self._set(model, ERROR, f"Model '{model}' is not available on {self.host}")
+          return
+        self._set(model, PULLING)
+        client.pull(model)
+      self._set(model, READY)
+    except Exception as e:
+      self._set(model, ERROR, str(e))
+
+  def wait_until_ready(self, model: str, timeout: float = None) -> bool:
+    """Blocks while the model is being checked or pulled. Returns True if it ended up ready."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with self._changed:
+      while (self._states.get(model) or {}).get("state") in (CHECKING, PULLING):
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+          break
+        self._changed.wait(remaining)
+      return (self._states.get(model) or {}).get("state") == READY
+
+
+_registries: Dict[str, OllamaModelRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(host: str, client_factory: Optional[Callable[[], object]] = None,
+                       ttl: float = DEFAULT_TTL) -> OllamaModelRegistry:
+  """The registry for an Ollama host, created on first use (client_factory defaults to the shared client)."""
+  with _registries_lock:
+    registry = _registries.get(host)
+    if registry is None:
+      if client_factory is None:
+        from .client_pool import get_shared_client
+
+        def client_factory():
+          return get_shared_client(host)
+      registry = _registries[host] = OllamaModelRegistry(host, client_factory, ttl)
+    return registry
@@ -5,6 +5,9 @@ from httpx import Timeout
 
 from ..base import VannaBase
 from ..exceptions import DependencyError
+from ..sql_stream import truncate_stream
+from .client_pool import DEFAULT_MAX_CONNECTIONS, DEFAULT_MAX_KEEPALIVE, get_shared_client
+from .model_registry import PULLING, READY, get_model_registry
 
 class Ollama(VannaBase):
   def __init__(self, config=None):
@@ -28,19 +31,30 @@ class Ollama(VannaBase):
 
     self.ollama_timeout = config.get("ollama_timeout", 240.0)
 
-    self.ollama_client = ollama.Client(self.host, timeout=Timeout(self.ollama_timeout))
+    if config.get("ollama_shared_client", True):
+      # The transport is process-wide; an instance only carries its own model and options
+      self.ollama_client = get_shared_client(
+        self.host,
+        timeout=self.ollama_timeout,
+        max_connections=config.get("ollama_pool_size", DEFAULT_MAX_CONNECTIONS),
+        max_keepalive_connections=config.get("ollama_keepalive_connections", DEFAULT_MAX_KEEPALIVE),
+        http2=config.get("ollama_http2", None),
+      )
+    else:
+      self.ollama_client = ollama.Client(self.host, timeout=Timeout(self.ollama_timeout))
     self.keep_alive = config.get('keep_alive', None)
     self.ollama_options = config.get('options', {})
     self.num_ctx = self.ollama_options.get('num_ctx', 2048)
-    self.__pull_model_if_ne(self.ollama_client, self.model)
+    # The model check (and pull, if missing) runs once per host and model in the background;
+    # construction never waits for the Ollama API
+    client = self.ollama_client
+    self.model_registry = get_model_registry(
+      self.host, lambda: client, ttl=config.get("ollama_model_check_ttl", 300.0))
+    self.model_registry.ensure(self.model, pull=config.get("ollama_pull_missing", True))
 
-  @staticmethod
-  def __pull_model_if_ne(ollama_client, model):
-    model_response = ollama_client.list()
-    model_lists = [model_element['model'] for model_element in
-                   model_response.get('models', [])]
-    if model not in model_lists:
-      ollama_client.pull(model)
+  def model_status(self) -> dict:
+    """Readiness of this instance's model: {"model", "state", "error", "updated_at"}."""
+    return self.model_registry.ensure(self.model)
 
   def system_message(self, message: str) -> any:
     return {"role": "system", "content": message}
@@ -75,24 +89,38 @@ class Ollama(VannaBase):
                             re.IGNORECASE | re.DOTALL)
     if sql:
       self.log(
-        f"Output from LLM: {llm_response} \nExtracted SQL: {sql.group(1)}")
+        lambda: f"Output from LLM: {llm_response} \nExtracted SQL: {sql.group(1)}", title="Extracted SQL")
       return sql.group(1).replace("```", "")
     elif select_with:
       self.log(
-        f"Output from LLM: {llm_response} \nExtracted SQL: {select_with.group(0)}")
+        lambda: f"Output from LLM: {llm_response} \nExtracted SQL: {select_with.group(0)}", title="Extracted SQL")
       return select_with.group(0)
     else:
       return llm_response
 
   def submit_prompt(self, prompt, **kwargs) -> str:
+      """
+      kwargs:
+        stream          return a generator of content chunks
+        stop            stop sequences, passed to Ollama as options["stop"]
+        stop_condition  callable(chunk) -> bool; generation is cancelled (the HTTP stream closed)
+                        after the first chunk for which it is true, also for non-streaming calls
+        temperature     overrides options["temperature"] for this call
+      """
       stream = kwargs.get('stream', False)
+      stop_condition = kwargs.get('stop_condition')
+      options = self.ollama_options
+      if kwargs.get('stop'):
+          options = {**options, 'stop': list(kwargs['stop'])}
+      if kwargs.get('temperature') is not None:
+          options = {**options, 'temperature': kwargs['temperature']}
 
       self.log(
-          f"Ollama parameters:\n"
+          lambda: f"Ollama parameters:\n"
           f"model={self.model},\n"
           f"options={self.ollama_options},\n"
           f"keep_alive={self.keep_alive},\n"
-          f"stream={stream}")
+          f"stream={stream}", title="Ollama Request")
       
       # Ensure all message content fields are strings
       if isinstance(prompt, list):
@@ -101,24 +129,41 @@ class Ollama(VannaBase):
                   if not isinstance(message['content'], str):
                       prompt[i]['content'] = str(message['content'])
       
-      self.log(f"Prompt Content:\n{json.dumps(prompt, ensure_ascii=False, indent=2)}")
+      self.log(lambda: json.dumps(prompt, ensure_ascii=False, indent=2), title="Prompt Content")
 
-      if stream:
+      # A request that arrives while the model is still being pulled waits for the pull instead of failing
+      if self.model_registry.status(self.model)["state"] != READY:
+        if self.model_registry.status(self.model)["state"] == PULLING:
+          self.log(f"Waiting for Ollama model {self.model} to finish downloading", title="Info")
+        self.model_registry.wait_until_ready(self.model, timeout=self.ollama_timeout)
+
+      if stream or stop_condition:
           # Handle streaming response
           response_stream = self.ollama_client.chat(
               model=self.model,
               messages=prompt,
               stream=True,
-              options=self.ollama_options,
+              options=options,
               keep_alive=self.keep_alive
           )
           
           def stream_generator():
-              for chunk in response_stream:
-                  if 'content' in chunk['message']:
-                      yield chunk['message']['content']
-          
-          return stream_generator()
+              try:
+                  for chunk in response_stream:
+                      if 'content' in chunk['message']:
+                          yield chunk['message']['content']
+              finally:
+                  # Closing the response stream drops the connection, which stops generation on the server
+                  close = getattr(response_stream, 'close', None)
+                  if close is not None:
+                      close()
+
+          chunks = stream_generator()
+          if stop_condition:
+              chunks = truncate_stream(chunks, stop_condition)
+          if stream:
+              return chunks
+          return "".join(chunks)
 
       else:
           # Handle non-streaming response
@@ -126,11 +171,11 @@ class Ollama(VannaBase):
               model=self.model,
               messages=prompt,
               stream=False,
-              options=self.ollama_options,
+              options=options,
               keep_alive=self.keep_alive
           )
 
-          self.log(f"Ollama Response:\n{str(response_dict)}")
+          self.log(lambda: str(response_dict), title="Ollama Response")
           
           content = response_dict['message']['content']
           if not isinstance(content, str):
@@ -3,6 +3,7 @@ import os
 from openai import OpenAI
 
 from ..base import VannaBase
+from ..sql_stream import truncate_stream
 
 
 class OpenAI_Chat(VannaBase):
@@ -57,6 +58,15 @@ class OpenAI_Chat(VannaBase):
         if len(prompt) == 0:
             raise Exception("Prompt is empty")
 
+        # stop: stop sequences sent to the API; stop_condition: callable(chunk) -> bool, the response
+        # is streamed and cancelled after the first chunk for which it is true
+        stop = kwargs.get("stop", None)
+        stop_condition = kwargs.get("stop_condition", None)
+        stream = kwargs.get("stream", False) or stop_condition is not None
+        temperature = kwargs.get("temperature", None)
+        if temperature is None:
+            temperature = self.temperature
+
         # Count the number of tokens in the message log
         # Use 4 as an approximation for the number of characters per token
         num_tokens = 0
@@ -71,8 +81,9 @@ class OpenAI_Chat(VannaBase):
             response = self.client.chat.completions.create(
                 model=model,
                 messages=prompt,
-                stop=None,
-                temperature=self.temperature,
+                stop=stop,
+                stream=stream,
+                temperature=temperature,
             )
         elif kwargs.get("engine", None) is not None:
             engine = kwargs.get("engine", None)
@@ -82,8 +93,9 @@ class OpenAI_Chat(VannaBase):
             response = self.client.chat.completions.create(
                 engine=engine,
                 messages=prompt,
-                stop=None,
-                temperature=self.temperature,
+                stop=stop,
+                stream=stream,
+                temperature=temperature,
             )
         elif self.config is not None and "engine" in self.config:
             print(
@@ -92,8 +104,9 @@ class OpenAI_Chat(VannaBase):
             response = self.client.chat.completions.create(
                 engine=self.config["engine"],
                 messages=prompt,
-                stop=None,
-                temperature=self.temperature,
+                stop=stop,
+                stream=stream,
+                temperature=temperature,
             )
         elif self.config is not None and "model" in self.config:
             print(
@@ -102,8 +115,9 @@ class OpenAI_Chat(VannaBase):
             response = self.client.chat.completions.create(
                 model=self.config["model"],
                 messages=prompt,
-                stop=None,
-                temperature=self.temperature,
+                stop=stop,
+                stream=stream,
+                temperature=temperature,
             )
         else:
             if num_tokens > 3500:
@@ -115,10 +129,17 @@ class OpenAI_Chat(VannaBase):
             response = self.client.chat.completions.create(
                 model=model,
                 messages=prompt,
-                stop=None,
-                temperature=self.temperature,
+                stop=stop,
+                stream=stream,
+                temperature=temperature,
             )
 
+        if stream:
+            chunks = self._stream_content(response)
+            if stop_condition is not None:
+                chunks = truncate_stream(chunks, stop_condition)
+            return chunks if kwargs.get("stream", False) else "".join(chunks)
+
         # Find the first response from the chatbot that has text in it (some responses may not have text)
         for choice in response.choices:
             if "text" in choice:
@@ -126,3 +147,12 @@ class OpenAI_Chat(VannaBase):
 
         # If no response with text is found, return the first response's content (which may be empty)
         return response.choices[0].message.content
+
+    @staticmethod
+    def _stream_content(response):
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.close()
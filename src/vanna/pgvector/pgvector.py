@@ -10,6 +10,7 @@ from sqlalchemy import create_engine, text
 
 from .. import ValidationError
 from ..base import VannaBase
+from ..scoring import scored
 from ..types import TrainingPlan, TrainingPlanItem
 
 
@@ -95,16 +96,17 @@ class PG_VectorStore(VannaBase):
                 raise ValueError("Specified collection does not exist.")
 
     def get_similar_question_sql(self, question: str) -> list:
-        documents = self.sql_collection.similarity_search(query=question, k=self.n_results)
-        return [ast.literal_eval(document.page_content) for document in documents]
+        # PGVector's default distance strategy is cosine distance
+        documents = self.sql_collection.similarity_search_with_score(query=question, k=self.n_results)
+        return [scored(ast.literal_eval(document.page_content), distance, "cosine") for document, distance in documents]
 
     def get_related_ddl(self, question: str, **kwargs) -> list:
-        documents = self.ddl_collection.similarity_search(query=question, k=self.n_results)
-        return [document.page_content for document in documents]
+        documents = self.ddl_collection.similarity_search_with_score(query=question, k=self.n_results)
+        return [scored(document.page_content, distance, "cosine") for document, distance in documents]
 
     def get_related_documentation(self, question: str, **kwargs) -> list:
-        documents = self.documentation_collection.similarity_search(query=question, k=self.n_results)
-        return [document.page_content for document in documents]
+        documents = self.documentation_collection.similarity_search_with_score(query=question, k=self.n_results)
+        return [scored(document.page_content, distance, "cosine") for document, distance in documents]
 
     def train(
         self,
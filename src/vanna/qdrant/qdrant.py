@@ -1,14 +1,31 @@
-from functools import cached_property
+import threading
+from functools import cached_property, partial
 from typing import List, Tuple
 
 import pandas as pd
 from qdrant_client import QdrantClient, grpc, models
 
 from ..base import VannaBase
+from ..embedding import get_embedding_batcher
+from ..scoring import scored
 from ..utils import deterministic_uuid
 
 SCROLL_SIZE = 1000
 
+# fastembed model name -> TextEmbedding, shared by every batched Qdrant instance in the process
+_fastembed_models = {}
+_fastembed_models_lock = threading.Lock()
+
+
+def _embed_batch(model_name: str, texts: List[str]) -> list:
+    # Resolves the model by name, so a shared batcher never holds on to the client that created it
+    with _fastembed_models_lock:
+        model = _fastembed_models.get(model_name)
+        if model is None:
+            from fastembed import TextEmbedding
+            model = _fastembed_models[model_name] = TextEmbedding(model_name=model_name)
+    return list(model.embed(texts))
+
 
 class Qdrant_VectorStore(VannaBase):
     """
@@ -33,6 +50,9 @@ class Qdrant_VectorStore(VannaBase):
             - documentation_collection_name: Name of the collection to store documentation. Defaults to `"documentation"`.
             - ddl_collection_name: Name of the collection to store DDL. Defaults to `"ddl"`.
             - sql_collection_name: Name of the collection to store SQL. Defaults to `"sql"`.
+            - embedding_batching: If `true` - embed through the shared micro-batching service (`vanna.embedding`). Default: `True`.
+            - embedding_batch_size: Maximum texts per embedding batch. Defaults to 32.
+            - embedding_max_wait_ms: Longest a text waits for its batch to fill. Defaults to 5.
 
     Raises:
         TypeError: If config["client"] is not a `qdrant_client.QdrantClient` instance
@@ -77,6 +97,13 @@ class Qdrant_VectorStore(VannaBase):
         self.sql_collection_name = config.get(
             "sql_collection_name", "sql"
         )
+        self._embedding_batcher = None
+        if config.get("embedding_batching", True):
+            self._embedding_batcher = get_embedding_batcher(
+                ("fastembed", self.fastembed_model), partial(_embed_batch, self.fastembed_model),
+                max_batch_size=config.get("embedding_batch_size", 32),
+                max_wait_ms=config.get("embedding_max_wait_ms", 5.0),
+            )
 
         self.id_suffixes = {
             self.ddl_collection_name: "ddl",
@@ -240,7 +267,7 @@ class Qdrant_VectorStore(VannaBase):
             with_payload=True,
         ).points
 
-        return [dict(result.payload) for result in results]
+        return [self._scored(dict(result.payload), result.score) for result in results]
 
     def get_related_ddl(self, question: str, **kwargs) -> list:
         results = self._client.query_points(
@@ -250,7 +277,7 @@ class Qdrant_VectorStore(VannaBase):
             with_payload=True,
         ).points
 
-        return [result.payload["ddl"] for result in results]
+        return [self._scored(result.payload["ddl"], result.score) for result in results]
 
     def get_related_documentation(self, question: str, **kwargs) -> list:
         results = self._client.query_points(
@@ -260,9 +287,20 @@ class Qdrant_VectorStore(VannaBase):
             with_payload=True,
         ).points
 
-        return [result.payload["documentation"] for result in results]
+        return [self._scored(result.payload["documentation"], result.score) for result in results]
+
+    def _scored(self, document, score: float):
+        # Qdrant scores are similarities for COSINE/DOT and (unsquared) distances for EUCLID
+        if self.distance_metric == models.Distance.EUCLID:
+            return scored(document, score * score, "l2")
+        if self.distance_metric == models.Distance.MANHATTAN:
+            return scored(document, None)
+        return scored(document, score, "inner_product")
 
     def generate_embedding(self, data: str, **kwargs) -> List[float]:
+        if self._embedding_batcher is not None:
+            return self._embedding_batcher.embed(data)
+
         embedding_model = self._client._get_or_init_model(
             model_name=self.fastembed_model
         )
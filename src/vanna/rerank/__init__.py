@@ -0,0 +1,2 @@
+from .cross_encoder import CrossEncoderReranker, get_reranker
+from .rerank_retrieval import RerankRetrieval
@@ -0,0 +1,103 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Sequence, Tuple
+
+from ..exceptions import DependencyError
+
+# Multilingual MiniLM cross-encoder: small enough for CPU, handles Chinese questions and schema text.
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, passage) pairs with a local sentence-transformers CrossEncoder on CPU.
+
+    The model is loaded on first use. Pairs are scored in batches and raw logits are mapped to
+    0..1 with a sigmoid so that one threshold works across queries. Scores are kept in an LRU
+    cache keyed by (query, passage), so repeated context (the same DDL for every question on a
+    dataset, retried questions) is only scored once.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, batch_size: int = 16, max_length: int = 512,
+                 cache_size: int = 4096, device: str = "cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self.device = device
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _load_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    try:
+                        from sentence_transformers import CrossEncoder
+                    except ImportError:
+                        raise DependencyError(
+                            "You need to install required dependencies to execute this method, run command:"
+                            " \npip install sentence-transformers"
+                        )
+                    self._model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+        return self._model
+
+    @staticmethod
+    def _cache_key(query: str, passage: str) -> str:
+        return hashlib.sha1(f"{query}\x00{passage}".encode("utf-8")).hexdigest()
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        model = self._load_model()
+        logits = model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return [1.0 / (1.0 + math.exp(-float(logit))) for logit in logits]
+
+    def score(self, query: str, passages: Sequence[str]) -> List[float]:
+        """Relevance of every passage to the query, in 0..1."""
+        keys = [self._cache_key(query, p) for p in passages]
+        scores = [None] * len(passages)
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            fresh = self._predict([(query, passages[i]) for i in missing])
+            with self._cache_lock:
+                for i, value in zip(missing, fresh):
+                    scores[i] = value
+                    self._cache[keys[i]] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, items: Sequence, text_fn: Callable = str, top_k: int = None,
+               min_score: float = 0.0) -> List[Tuple[object, float]]:
+        """
+        Orders items by cross-encoder score, drops those below min_score and keeps at most top_k.
+        Returns (item, score) pairs, best first.
+        """
+        if not items:
+            return []
+        scores = self.score(query, [text_fn(item) for item in items])
+        ranked = sorted(zip(items, scores), key=lambda pair: pair[1], reverse=True)
+        ranked = [(item, s) for item, s in ranked if s >= min_score]
+        return ranked[:top_k] if top_k else ranked
+
+
+_rerankers = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(model_name: str = DEFAULT_RERANK_MODEL, **kwargs) -> CrossEncoderReranker:
+    """Process-wide reranker per model, so the model weights and score cache are shared by all instances."""
+    with _rerankers_lock:
+        reranker = _rerankers.get(model_name)
+        if reranker is None:
+            reranker = _rerankers[model_name] = CrossEncoderReranker(model_name, **kwargs)
+        return reranker
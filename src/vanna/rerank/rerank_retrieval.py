@@ -0,0 +1,54 @@
+from typing import List, Optional, Tuple
+
+from ..base import VannaBase
+from .cross_encoder import get_reranker
+
+
+class RerankRetrieval(VannaBase):
+    """
+    Mixin adding an optional cross-encoder rerank stage for retrieved context.
+
+    Disabled unless config["rerank_model"] is set. Other config keys:
+        rerank_top_k       items kept per context type (default 5)
+        rerank_min_score   items scoring below this (0..1) are dropped (default 0.05)
+        rerank_batch_size  cross-encoder batch size (default 16)
+    """
+
+    def _rerank_config(self, key: str, default):
+        config = getattr(self, "config", None) or {}
+        return config.get(key, default)
+
+    @property
+    def rerank_enabled(self) -> bool:
+        return bool(self._rerank_config("rerank_model", None))
+
+    @staticmethod
+    def _context_text(item) -> str:
+        if isinstance(item, dict):
+            return f"{item.get('question') or ''}\n{item.get('sql') or ''}"
+        return str(item)
+
+    def rerank_context(self, question: str, items: list) -> Tuple[list, Optional[List[float]]]:
+        """
+        Reranks one retrieval result list (QA dicts, DDL or documentation strings) against the question.
+        Returns the trimmed items and their scores, or the items unchanged and None when reranking is off
+        or fails.
+        """
+        if not self.rerank_enabled or not items:
+            return items, None
+        try:
+            reranker = get_reranker(
+                self._rerank_config("rerank_model", None),
+                batch_size=self._rerank_config("rerank_batch_size", 16),
+            )
+            ranked = reranker.rerank(
+                question,
+                items,
+                text_fn=self._context_text,
+                top_k=self._rerank_config("rerank_top_k", 5),
+                min_score=self._rerank_config("rerank_min_score", 0.05),
+            )
+        except Exception as e:
+            self.log(f"Rerank failed, using retrieval order: {e}", title="Warning")
+            return items, None
+        return [item for item, _ in ranked], [round(score, 4) for _, score in ranked]
@@ -0,0 +1,60 @@
+"""
+Uniform scored retrieval results.
+
+Vector stores return QA pairs as dicts and DDL / documentation as strings. Scored results keep
+those shapes so existing callers are unaffected: QA dicts gain "similarity" and "distance" keys,
+and strings are returned as ScoredText, a str subclass carrying the same two attributes.
+"""
+from typing import Any, Optional
+
+# Distance conventions understood by similarity_from_distance():
+#   "l2"            squared Euclidean distance (Chroma's default space, FAISS IndexFlatL2)
+#   "cosine"        cosine distance, 1 - cos
+#   "ip"            Chroma's inner-product distance, 1 - dot
+#   "inner_product" raw dot product, higher is closer (FAISS IndexFlatIP)
+METRICS = ("l2", "cosine", "ip", "inner_product")
+
+
+def similarity_from_distance(distance: float, metric: str = "l2") -> float:
+    """
+    Maps a store's raw distance to a cosine similarity clamped to [0, 1], assuming unit-length
+    embeddings (true for the MiniLM / sentence-transformers models used by the stores here).
+    For unit vectors ||a - b||^2 = 2 - 2cos, so every metric reduces to the same scale.
+    """
+    if distance is None:
+        return 0.0
+    distance = float(distance)
+    if metric == "l2":
+        similarity = 1.0 - distance / 2.0
+    elif metric in ("cosine", "ip"):
+        similarity = 1.0 - distance
+    elif metric == "inner_product":
+        similarity = distance
+    else:
+        raise ValueError(f"Unknown distance metric: {metric}")
+    return round(min(1.0, max(0.0, similarity)), 4)
+
+
+class ScoredText(str):
+    """A retrieved DDL / documentation string with its similarity and raw distance."""
+
+    def __new__(cls, text: str, similarity: float = 0.0, distance: Optional[float] = None):
+        obj = super().__new__(cls, text)
+        obj.similarity = similarity
+        obj.distance = distance
+        return obj
+
+
+def scored(document: Any, distance: Optional[float], metric: str = "l2") -> Any:
+    """Attaches similarity (and the raw distance) to one retrieved document, keeping its shape."""
+    similarity = similarity_from_distance(distance, metric)
+    if isinstance(document, dict):
+        return {**document, "similarity": similarity, "distance": distance}
+    return ScoredText(document if isinstance(document, str) else str(document), similarity, distance)
+
+
+def similarity_of(document: Any) -> float:
+    """Similarity of a (possibly unscored) retrieved document; 0 when the store did not score it."""
+    if isinstance(document, dict):
+        return document.get("similarity") or 0.0
+    return getattr(document, "similarity", 0.0) or 0.0
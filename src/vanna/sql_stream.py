@@ -0,0 +1,179 @@
+"""
+Incremental SQL extraction from a streamed LLM response.
+
+SQL-generation responses usually put the query in a fenced block (```sql ... ```), often followed
+by more explanation. SQLStreamExtractor is fed the response chunk by chunk and reports the query
+as soon as the block closes, so callers can start executing it while the model is still writing.
+stop_after_sql_block() and truncate_stream() let an LLM backend stop generating at that point.
+"""
+import re
+from typing import Callable, Iterator, Optional
+
+# Opening fence: ```sql / ```sqlite / ```postgresql ... or a bare ``` (accepted if the body is a query)
+_OPEN_FENCE = re.compile(r"```[ \t]*(?P<lang>[A-Za-z]*)[ \t]*\r?\n")
+_SQL_LANGS = {"sql", "sqlite", "postgresql", "postgres", "mysql", "tsql", "plsql"}
+# Closing fence of a non-SQL block; only one at the start of a line counts, so fences quoted in code are skipped
+_LINE_FENCE = re.compile(r"\n[ \t]*```")
+_QUERY_START = re.compile(r"\s*(select|with)\b", re.IGNORECASE)
+# Longest partial opening fence that can sit at the end of the buffer ("```postgresql \r")
+_MAX_OPEN_FENCE = 20
+
+
+class SQLStreamExtractor:
+    """
+    Finds the first complete fenced SQL block in text arriving in chunks.
+
+    feed(chunk) returns the block's SQL once, on the chunk that closes the block, and None
+    otherwise. `text` is the response received so far, `sql` the extracted block (None until
+    complete) and `end` the offset in `text` just past the closing fence.
+
+    Chunks are kept in a list and only the part not yet searched (plus a few characters of
+    lookback, the current line of an open non-SQL block, or the body of the SQL block) is held
+    as a string, so feeding a long response costs O(total length).
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.sql: Optional[str] = None
+        self.end: Optional[int] = None
+        # _window holds the response from absolute offset _offset on; the positions below are absolute
+        self._window = ""
+        self._offset = 0
+        self._scan = 0
+        self._body_start = None
+        self._bare = False
+        # Inside a code block in another language, waiting for its closing fence
+        self._skip_block = False
+
+    @property
+    def text(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    @property
+    def complete(self) -> bool:
+        return self.sql is not None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if not chunk:
+            return None
+        self._chunks.append(chunk)
+        if self.complete:
+            return None
+        self._window += chunk
+        try:
+            return self._advance()
+        finally:
+            self._compact()
+
+    def _advance(self) -> Optional[str]:
+        window, offset = self._window, self._offset
+        length = offset + len(window)
+        while True:
+            if self._skip_block and not self._skip_to_block_end():
+                return None
+            if self._body_start is None:
+                match = _OPEN_FENCE.search(window, self._scan - offset)
+                if match is None:
+                    self._scan = max(self._scan, length - _MAX_OPEN_FENCE)
+                    return None
+                lang = match.group("lang").lower()
+                if lang and lang not in _SQL_LANGS:
+                    # A code block in another language: skip past it. The search starts at the
+                    # newline ending the opening line, so a fence on the block's first line counts.
+                    self._scan = offset + match.end() - 1
+                    self._skip_block = True
+                    continue
+                self._body_start = offset + match.end()
+                self._bare = not lang
+                self._scan = self._body_start
+
+            close = window.find("```", self._scan - offset)
+            if close < 0:
+                # Keep the last two characters: they may be the start of a closing fence
+                self._scan = max(self._body_start, length - 2)
+                return None
+            body = window[self._body_start - offset:close]
+            if self._bare and not _QUERY_START.match(body):
+                self._body_start = None
+                self._scan = offset + close + 3
+                continue
+            self.sql = body.strip()
+            self.end = offset + close + 3
+            return self.sql
+
+    def _skip_to_block_end(self) -> bool:
+        """Moves _scan past the closing fence of a non-SQL block; False while it has not arrived."""
+        window, offset = self._window, self._offset
+        close = _LINE_FENCE.search(window, self._scan - offset)
+        if close is None:
+            # Only the last (unfinished) line can still turn out to be the closing fence
+            self._scan = offset + window.rfind("\n", self._scan - offset)
+            return False
+        self._scan = offset + close.end()
+        self._skip_block = False
+        return True
+
+    def _compact(self):
+        keep = self._body_start if self._body_start is not None else self._scan
+        dead = keep - self._offset
+        # Dropping the searched prefix copies the rest, so only do it once that prefix dominates
+        if dead > 0 and dead * 2 >= len(self._window):
+            self._window = self._window[dead:]
+            self._offset = keep
+
+
+class GenerationCancelled(Exception):
+    """Raised from a stop condition to abandon a generation whose result is no longer wanted."""
+
+
+def stop_after_sql_block() -> Callable[[str], bool]:
+    """
+    A fresh stop condition for submit_prompt(stop_condition=...) that is true once the first
+    fenced SQL block of the response has closed, so explanation text after it is never generated.
+    """
+    extractor = SQLStreamExtractor()
+
+    def condition(chunk: str) -> bool:
+        extractor.feed(chunk)
+        return extractor.complete
+
+    # Stable name: response caches key truncated responses by it
+    condition.__qualname__ = "stop_after_sql_block"
+    return condition
+
+
+def truncate_stream(chunks: Iterator[str], stop_condition: Callable[[str], bool]) -> Iterator[str]:
+    """
+    Yields chunks until stop_condition(chunk) is true (that chunk included), then closes the
+    source stream; for an HTTP stream this drops the connection, which makes the server stop
+    generating.
+    """
+    try:
+        for chunk in chunks:
+            yield chunk
+            if stop_condition(chunk):
+                return
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def cancellable(stop_condition: Callable[[str], bool], cancelled) -> Callable[[str], bool]:
+    """
+    Wraps a stop condition so that the generation raises GenerationCancelled at the next chunk
+    once the `cancelled` event is set. Raising (rather than stopping) keeps the truncated text out
+    of response caches; the stream is still closed by truncate_stream. The event is exposed as
+    `condition.cancelled`.
+    """
+    def condition(chunk: str) -> bool:
+        if cancelled.is_set():
+            raise GenerationCancelled()
+        return stop_condition(chunk)
+
+    condition.__qualname__ = getattr(stop_condition, "__qualname__", "cancellable")
+    # Lets schedulers and caches see the cancellation before any chunk arrives
+    condition.cancelled = cancelled
+    return condition
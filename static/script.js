@@ -168,7 +168,7 @@ function populateTableSelector() {
     activeTable = 'global';
 }
 
-async function loadTrainingDataForTable(tableName, page = 1) {
+async function loadTrainingDataForTable(tableName, page = 1, cursorParam = '') {
     if (!activeDatasetId) {
         alert('請先選擇一個資料集。');
         return;
@@ -191,7 +191,7 @@ async function loadTrainingDataForTable(tableName, page = 1) {
             }
         }
         
-        const data = await apiFetch(`/api/training_data?table_name=${encodeURIComponent(tableName)}&page=${page}`);
+        const data = await apiFetch(`/api/training_data?table_name=${encodeURIComponent(tableName)}&page=${page}${cursorParam}`);
         
         const docInput = document.getElementById('doc-input');
         if (docInput) docInput.value = data.documentation || '';
@@ -244,13 +244,13 @@ function renderPaginationControls(pagination) {
 
     if (!pagination || pagination.total_pages <= 1) return;
 
-    const { current_page, total_pages } = pagination;
+    const { current_page, total_pages, next_cursor, prev_cursor } = pagination;
     const paginationNav = document.createElement('nav');
     
     const prevButton = document.createElement('button');
     prevButton.textContent = '« 上一頁';
     prevButton.disabled = current_page === 1;
-    prevButton.onclick = () => loadTrainingDataForTable(activeTable, current_page - 1);
+    prevButton.onclick = () => loadTrainingDataForTable(activeTable, current_page - 1, prev_cursor ? `&before=${encodeURIComponent(prev_cursor)}` : '');
     paginationNav.appendChild(prevButton);
 
     const pageInfo = document.createElement('span');
@@ -261,7 +261,7 @@ function renderPaginationControls(pagination) {
     const nextButton = document.createElement('button');
     nextButton.textContent = '下一頁 »';
     nextButton.disabled = current_page === total_pages;
-    nextButton.onclick = () => loadTrainingDataForTable(activeTable, current_page + 1);
+    nextButton.onclick = () => loadTrainingDataForTable(activeTable, current_page + 1, next_cursor ? `&after=${encodeURIComponent(next_cursor)}` : '');
     paginationNav.appendChild(nextButton);
     
     controlsContainer.appendChild(paginationNav);
@@ -1079,16 +1079,19 @@ function handleStreamedData(data) {
     if (type === 'retrieved_context') {
         if (!thinkingOutput) return;
         let html = `<h4>檢索到相關內容 (${data.subtype}):</h4>`;
+        const scoreLabel = (i) => Array.isArray(data.scores) ? `<small>[相關度 ${data.scores[i]}]</small> ` : '';
         if (data.subtype === 'qa' && Array.isArray(content)) {
             html += '<ul>';
-            content.forEach(item => {
-                html += `<li><b>Q:</b> ${item.question}<br><b>SQL:</b> <pre>${item.sql}</pre></li>`;
+            content.forEach((item, i) => {
+                html += `<li>${scoreLabel(i)}<b>Q:</b> ${item.question}<br><b>SQL:</b> <pre>${item.sql}</pre></li>`;
             });
             html += '</ul>';
         } else if (data.subtype === 'ddl' && Array.isArray(content)) {
-            html += `<pre>${content.join('\n\n')}</pre>`;
+            html += Array.isArray(data.scores)
+                ? content.map((ddl, i) => `${scoreLabel(i)}<pre>${ddl}</pre>`).join('')
+                : `<pre>${content.join('\n\n')}</pre>`;
         } else if (data.subtype === 'documentation' && Array.isArray(content)) {
-            html += `<div>${content.join('<hr>')}</div>`;
+            html += `<div>${content.map((doc, i) => scoreLabel(i) + doc).join('<hr>')}</div>`;
         }
         thinkingOutput.innerHTML += html;
     } else if (type === 'info') {
@@ -0,0 +1,57 @@
+import os
+
+from app.core.ask_log import AskLogSink, SEGMENT_NAME
+
+
+def test_records_are_buffered_until_flush(tmp_path):
+    sink = AskLogSink(log_dir=str(tmp_path), flush_interval=60)
+    sink.write('alice', 'request_start', 'q1')
+    sink.write('alice', 'generated_sql', 'SELECT 1')
+    assert not os.path.exists(tmp_path / 'alice' / SEGMENT_NAME)
+
+    records = sink.read('alice')
+    assert [r['type'] for r in records] == ['request_start', 'generated_sql']
+    assert records[1]['content'] == 'SELECT 1'
+    sink.close()
+
+
+def test_reset_drops_buffered_and_flushed_records(tmp_path):
+    sink = AskLogSink(log_dir=str(tmp_path), flush_interval=60)
+    sink.write('alice', 'request_start', 'old')
+    sink.flush()
+    sink.write('alice', 'request_end', 'old')
+    sink.write('bob', 'request_start', 'kept')
+
+    sink.reset('alice')
+    sink.write('alice', 'request_start', 'new')
+
+    assert [r['content'] for r in sink.read('alice')] == ['new']
+    assert [r['content'] for r in sink.read('bob')] == ['kept']
+    sink.close()
+
+
+def test_segments_rotate_by_size(tmp_path):
+    sink = AskLogSink(log_dir=str(tmp_path), flush_interval=60, max_segment_bytes=200, max_segments=2)
+    for _ in range(9):
+        sink.write('alice', 'generated_sql', 'x' * 100)
+        sink.flush()
+
+    files = sorted(os.listdir(tmp_path / 'alice'))
+    assert files == [SEGMENT_NAME, f'{SEGMENT_NAME}.1', f'{SEGMENT_NAME}.2']
+    sink.close()
+
+
+def test_reset_never_leaves_the_log_directory(tmp_path):
+    log_dir = tmp_path / 'ask_log'
+    sink = AskLogSink(log_dir=str(log_dir), flush_interval=60)
+    sink.write('alice', 'request_start', 'kept')
+    sink.flush()
+    (tmp_path / 'outside').mkdir()
+    os.symlink(tmp_path / 'outside', log_dir / 'mallory')
+
+    for user_id in ('.', '..', '.trash', 'mallory'):
+        sink.reset(user_id)
+    assert (tmp_path / 'outside').is_dir()
+    assert [r['content'] for r in sink.read('alice')] == ['kept']
+    assert not os.path.exists(log_dir / '.trash') or os.listdir(log_dir / '.trash') == []
+    sink.close()
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from vanna.chart_recommender import build_chart, profile_columns, recommend_chart, wants_custom_chart
+
+
+def test_time_series_is_a_line_chart_even_after_string_conversion():
+    # ask.py converts non-numeric columns to strings before charting
+    df = pd.DataFrame({'month': ['2024-01', '2024-03', '2024-02'], 'revenue': [10.0, 30.0, 20.0]})
+    rec = recommend_chart(df)
+    assert rec['kind'] == 'line' and rec['x'] == 'month' and rec['y'] == ['revenue']
+
+    fig = build_chart(df, rec)
+    assert fig.data[0].type == 'scatter'
+    assert list(fig.data[0].y) == [10.0, 20.0, 30.0]
+
+
+def test_period_numbers_are_an_ordered_axis_not_a_measure():
+    df = pd.DataFrame({'month': [3, 1, 2], 'sales': [30.0, 10.0, 20.0]})
+    rec = recommend_chart(df, 'sales by month')
+    assert rec['kind'] == 'line' and rec['x'] == 'month'
+    fig = build_chart(df, rec)
+    assert list(fig.data[0].x) == [1, 2, 3] and list(fig.data[0].y) == [10.0, 20.0, 30.0]
+    assert profile_columns(pd.DataFrame({'週': ['1', '2'], 'monthly_total': [5, 9]}))['time'] == ['週']
+
+
+def test_category_comparison_is_a_sorted_bar_chart():
+    df = pd.DataFrame({'product_name': ['a', 'b', 'c'], 'monthly_total': [5, 9, 7]})
+    rec = recommend_chart(df)
+    assert rec['kind'] == 'bar'
+    assert list(build_chart(df, rec).data[0].x) == ['b', 'c', 'a']
+
+
+def test_share_questions_get_a_pie_chart():
+    df = pd.DataFrame({'region': ['north', 'south'], 'orders': [40, 60]})
+    assert recommend_chart(df, '各地區訂單佔比')['kind'] == 'pie'
+    assert recommend_chart(df, 'orders by region')['kind'] == 'bar'
+
+
+def test_single_value_numeric_text_and_identifiers():
+    assert recommend_chart(pd.DataFrame({'total': [42]}))['kind'] == 'indicator'
+    df = pd.DataFrame({'order_id': [1, 2, 3], 'amount': ['1.5', '2', '']})
+    profile = profile_columns(df)
+    assert profile['numeric'] == ['amount'] and profile['categorical'] == ['order_id']
+
+
+def test_unsure_shapes_and_custom_requests_go_to_the_llm():
+    many = pd.DataFrame({'customer': [f'c{i}' for i in range(80)], 'spend': range(80)})
+    assert recommend_chart(many) is None
+    unaggregated = pd.DataFrame({'dept': ['a', 'a', 'b'], 'salary': [1, 2, 3]})
+    assert recommend_chart(unaggregated) is None
+    assert recommend_chart(pd.DataFrame({'name': ['x', 'y']})) is None
+
+    assert wants_custom_chart('畫一個散佈圖')
+    assert wants_custom_chart('show a heatmap of sales')
+    assert not wants_custom_chart('每月營收')
@@ -0,0 +1,40 @@
+from app.core.profiling import encode_samples, profile_columns
+from app.core.helpers import extract_column_features
+
+
+def test_encode_samples_pads_to_longest_value():
+    codes, lengths = encode_samples(['AB', 'ABCD', ''])
+    assert codes.shape == (3, 4)
+    assert lengths.tolist() == [2, 4, 0]
+    assert codes[0, 2] == 0
+
+
+def test_extract_column_features_serial_numbers():
+    values = ['SN-001', 'SN-002', 'SN-003', 'SN-104']
+    features = extract_column_features(values=values)
+
+    assert features['total_samples'] == 4
+    assert features['unique_count'] == 4
+    assert features['length_distribution']['min'] == 6
+    assert features['length_distribution']['max'] == 6
+    comp = features['character_composition']
+    assert comp['alpha_ratio'] == 0.33
+    assert comp['digit_ratio'] == 0.5
+    positions = comp['position_analysis']
+    assert [p['type'] for p in positions] == ['letter', 'letter', 'symbol', 'digit', 'digit', 'digit']
+    assert positions[0]['entropy'] == 0.0
+    assert positions[5]['entropy'] > 1.0
+
+
+def test_profile_columns_batch_matches_single_column():
+    columns = {
+        ('orders', 'order_no'): ['ORD-2024-0001', 'ORD-2024-0002', '訂單-0003'],
+        ('orders', 'empty'): [],
+        ('items', 'sku'): ['A1', 'B22', None, 'C333'],
+    }
+    batch = profile_columns(columns)
+
+    for key, values in columns.items():
+        assert batch[key] == extract_column_features(values=values)
+    assert batch[('orders', 'empty')]['total_samples'] == 0
+    assert batch[('items', 'sku')]['total_samples'] == 3
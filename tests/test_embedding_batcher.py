@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from vanna.embedding import EmbeddingBatcher, get_embedding_batcher
+
+
+class RecordingModel:
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_concurrent_requests_share_batches():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=64, max_wait_ms=50)
+    start = threading.Barrier(16)
+    results = {}
+
+    def worker(i):
+        start.wait()
+        results[i] = batcher.embed("q" * i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert results == {i: [float(i), 1.0] for i in range(16)}
+    assert sum(len(batch) for batch in model.batches) == 16
+    assert len(model.batches) < 16
+
+
+def test_batches_are_capped_and_deduplicated():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=3, max_wait_ms=20)
+    vectors = batcher.embed_many(["a", "bb", "a", "ccc", "dddd"])
+    batcher.close()
+
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], [3.0, 1.0], [4.0, 1.0]]
+    assert all(len(batch) <= 3 for batch in model.batches)
+    assert all(len(batch) == len(set(batch)) for batch in model.batches)
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def failing(texts):
+        raise RuntimeError("model unavailable")
+
+    batcher = EmbeddingBatcher(failing, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="model unavailable"):
+        batcher.embed("question")
+    batcher.close()
+
+
+def test_batchers_are_shared_per_key():
+    model = RecordingModel()
+    assert get_embedding_batcher(("test", "shared"), model) is get_embedding_batcher(("test", "shared"), RecordingModel())
@@ -0,0 +1,164 @@
+import gc
+import itertools
+import json
+import sys
+import types
+import weakref
+import zlib
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+DIM = 16
+
+
+class HashEmbedder:
+    """Deterministic unit vectors per text, so the store can be exercised without a model download."""
+
+    def __init__(self, model_name):
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        if isinstance(texts, str):
+            return self._vector(texts)
+        return np.vstack([self._vector(text) for text in texts])
+
+    @staticmethod
+    def _vector(text):
+        vector = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(DIM).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def make_store(monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=HashEmbedder))
+    from vanna.faiss.faiss import FAISS
+    models = itertools.count()
+
+    class Store(FAISS):
+        def system_message(self, message):
+            return message
+
+        def user_message(self, message):
+            return message
+
+        def assistant_message(self, message):
+            return message
+
+        def submit_prompt(self, prompt, **kwargs):
+            return ""
+
+    def make(**config):
+        # A distinct model name per store keeps each store on its own embedding batcher
+        return Store(config={"client": "in-memory", "embedding_dim": DIM, "n_results": 3,
+                             "embedding_model": f"hash-{next(models)}", **config})
+
+    return make
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_delete_does_not_reembed(make_store, index_type):
+    store = make_store(index_type=index_type)
+    ids = [store.add_question_sql(f"question {i}", f"SELECT {i}") for i in range(10)]
+    calls = store.embedding_model.calls
+
+    assert store.remove_training_data(ids[3])
+    assert store.embedding_model.calls == calls
+    results = store.get_similar_question_sql("question 3 SELECT 3")
+    assert "SELECT 3" not in [r["sql"] for r in results]
+    assert len(results) == 3
+
+    exact = store.get_similar_question_sql("question 4 SELECT 4")[0]
+    assert exact["sql"] == "SELECT 4" and exact["similarity"] == pytest.approx(1.0)
+
+
+def test_ivfpq_trains_once_enough_vectors_exist(make_store):
+    store = make_store(index_type="ivfpq", ivf_nlist=2, pq_m=4, pq_nbits=4, ivf_train_min=40)
+    for i in range(39):
+        store.add_documentation(f"doc {i}")
+    assert store._is_untrained_ivfpq(store.doc_index)
+
+    doc_id = store.add_documentation("doc 39")
+    assert not store._is_untrained_ivfpq(store.doc_index)
+    assert store.doc_index.ntotal == 40
+
+    assert store.remove_training_data(doc_id)
+    assert store.doc_index.ntotal == 39
+    assert "doc 39" not in store.get_related_documentation("doc 39")
+
+
+def test_persistent_store_reloads_without_reembedding(make_store, tmp_path):
+    store = make_store(client="persistent", path=str(tmp_path), index_type="hnsw")
+    ids = [store.add_ddl(f"CREATE TABLE t{i} (a INT)") for i in range(5)]
+    store.remove_training_data(ids[0])
+
+    reloaded = make_store(client="persistent", path=str(tmp_path), index_type="hnsw")
+    assert reloaded.embedding_model.calls == 0
+    assert reloaded.ddl_index.ntotal == 4
+    assert reloaded.get_related_ddl("CREATE TABLE t2 (a INT)")[0] == "CREATE TABLE t2 (a INT)"
+
+
+def test_changing_the_index_type_rebuilds_the_snapshot(make_store, tmp_path):
+    store = make_store(client="persistent", path=str(tmp_path))
+    ids = [store.add_ddl(f"CREATE TABLE t{i} (a INT)") for i in range(5)]
+    store.compact()
+
+    hnsw = make_store(client="persistent", path=str(tmp_path), index_type="hnsw")
+    assert isinstance(faiss.downcast_index(hnsw.ddl_index.index), faiss.IndexHNSW)
+    hnsw.remove_training_data(ids[0])
+    hnsw.compact()
+
+    flat = make_store(client="persistent", path=str(tmp_path), index_type="flat")
+    assert isinstance(faiss.downcast_index(flat.ddl_index.index), faiss.IndexFlatL2)
+    assert flat.ddl_index.ntotal == 4 and not flat.ddl_deleted
+    assert flat.embedding_model.calls == 0
+    assert flat.get_related_ddl("CREATE TABLE t2 (a INT)")[0] == "CREATE TABLE t2 (a INT)"
+
+
+def test_inserts_go_to_the_log_until_compaction(make_store, tmp_path):
+    store = make_store(client="persistent", path=str(tmp_path), wal_compact_every=4)
+    snapshot = tmp_path / "sql_index.faiss"
+    written = snapshot.stat().st_mtime_ns
+
+    for i in range(3):
+        store.add_question_sql(f"question {i}", f"SELECT {i}")
+    assert snapshot.stat().st_mtime_ns == written
+    assert store.storage.pending_count("sql") == 3
+
+    store.add_question_sql("question 3", "SELECT 3")
+    assert store.storage.pending_count("sql") == 0
+    assert faiss.read_index(str(snapshot)).ntotal == 4
+
+
+def test_legacy_json_layout_is_imported(make_store, tmp_path):
+    legacy = faiss.IndexFlatL2(DIM)
+    embedder = HashEmbedder(None)
+    metadata = [{"id": "7f3c6a2e-1b4d-4c5e-9f8a-0d1e2f3a4b5c", "documentation": "orders hold one row per order"}]
+    legacy.add(embedder.encode(["orders hold one row per order"]))
+    faiss.write_index(legacy, str(tmp_path / "doc_index.faiss"))
+    (tmp_path / "doc_metadata.json").write_text(json.dumps(metadata))
+
+    store = make_store(client="persistent", path=str(tmp_path))
+    assert store.doc_metadata == metadata
+    assert store.get_related_documentation("orders hold one row per order") == ["orders hold one row per order"]
+    assert (tmp_path / "doc_metadata.json.migrated").exists()
+    assert store.remove_training_data(metadata[0]["id"])
+    assert store.doc_index.ntotal == 0
+
+
+def test_stores_share_one_model_and_batcher_per_model_name(make_store):
+    first = make_store(embedding_model="hash-shared")
+    second = make_store(embedding_model="hash-shared")
+    assert first._embedding_batcher is second._embedding_batcher
+    assert first.embedding_model is second.embedding_model
+
+    # The shared batcher does not keep the store that created it alive
+    first_ref = weakref.ref(first)
+    del first
+    gc.collect()
+    assert first_ref() is None
+    second.add_ddl("CREATE TABLE shared (a INT)")
+    assert second.get_related_ddl("CREATE TABLE shared (a INT)")[0] == "CREATE TABLE shared (a INT)"
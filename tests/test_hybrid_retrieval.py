@@ -0,0 +1,46 @@
+from vanna.hybrid import BM25Index, HybridRetrieval, reciprocal_rank_fusion, tokenize
+from vanna.mock import MockEmbedding, MockLLM, MockVectorDB
+
+
+class DenseOnlyStore(MockVectorDB):
+    def get_similar_question_sql(self, question: str, **kwargs) -> list:
+        return [{"question": "What are the top selling genres?", "sql": "SELECT 1"}]
+
+
+class HybridVanna(HybridRetrieval, MockEmbedding, DenseOnlyStore, MockLLM):
+    def __init__(self, config=None):
+        self.config = config or {}
+        MockEmbedding.__init__(self, config=config)
+        DenseOnlyStore.__init__(self, config=config)
+        MockLLM.__init__(self, config=config)
+
+
+def test_tokenize_handles_identifiers_and_cjk():
+    assert tokenize("order_no 訂單編號") == ["order_no", "order", "no", "訂單", "單編", "編號"]
+
+
+def test_bm25_ranks_matching_document_first():
+    index = BM25Index()
+    index.add("a", "SELECT name FROM customers")
+    index.add("b", "SELECT total FROM invoices WHERE customer_id = 1")
+    index.remove("a")
+    index.add("c", "customers per country")
+    assert [doc_id for doc_id, _ in index.search("customers country")] == ["c"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["z", "y"]], weights=[1.0, 1.0], k=60)
+    assert fused[0] in ("y", "z")
+    assert fused[-1] == "x"
+
+
+def test_hybrid_merges_lexical_hits_into_dense_results():
+    vn = HybridVanna(config={"hybrid_top_n": 3, "hybrid_dense_weight": 0.5})
+    results = vn.get_similar_question_sql("total sales for each customer")
+    assert len(results) == 3
+    assert results[0]["question"] == "What is the total sales for each customer?"
+    assert {"question": "What are the top selling genres?", "sql": "SELECT 1"} in results
+
+    assert vn.get_related_documentation("sqlite dates") == [
+        "This is a SQLite database. For dates rememeber to use SQLite syntax."
+    ]
@@ -0,0 +1,145 @@
+import threading
+import time
+
+from vanna.llm_cache import LLMResponseCache, ResponseCache
+from vanna.llm_scheduler import ScheduledLLM
+from vanna.mock import MockEmbedding, MockLLM, MockVectorDB
+
+
+class CountingLLM(MockLLM):
+    def __init__(self, config=None):
+        self.calls = 0
+        self.delay = 0.0
+
+    def submit_prompt(self, prompt, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if kwargs.get("stream"):
+            return iter(["SELECT ", "1"])
+        return f"answer {self.calls}"
+
+
+class CachedVanna(LLMResponseCache, MockEmbedding, MockVectorDB, CountingLLM):
+    def __init__(self, config=None):
+        self.config = config or {}
+        MockEmbedding.__init__(self, config=config)
+        MockVectorDB.__init__(self, config=config)
+        CountingLLM.__init__(self, config=config)
+
+
+def test_identical_prompts_are_served_from_cache(tmp_path):
+    vn = CachedVanna({"temperature": 0, "llm_cache_path": str(tmp_path / "cache.sqlite")})
+    prompt = [vn.user_message("Explain SELECT 1")]
+    assert vn.submit_prompt(prompt) == "answer 1"
+    assert vn.submit_prompt(prompt) == "answer 1"
+    assert vn.submit_prompt([vn.user_message("Explain SELECT 2")]) == "answer 2"
+    assert vn.calls == 2
+
+
+def test_cache_is_off_for_sampled_generation_unless_opted_in(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    sampled = CachedVanna({"temperature": 0.7, "llm_cache_path": path})
+    sampled.submit_prompt(["q"])
+    sampled.submit_prompt(["q"])
+    assert sampled.calls == 2
+
+    opted_in = CachedVanna({"temperature": 0.7, "llm_cache": True, "llm_cache_path": path})
+    opted_in.submit_prompt(["q"])
+    opted_in.submit_prompt(["q"])
+    assert opted_in.calls == 1
+
+
+def test_streams_are_stored_once_complete(tmp_path):
+    vn = CachedVanna({"llm_cache": True, "llm_cache_path": str(tmp_path / "cache.sqlite")})
+    assert "".join(vn.submit_prompt(["sql"], stream=True)) == "SELECT 1"
+    assert list(vn.submit_prompt(["sql"], stream=True)) == ["SELECT 1"]
+    assert vn.calls == 1
+
+
+def test_concurrent_identical_requests_share_one_generation(tmp_path):
+    vn = CachedVanna({"llm_cache": True, "llm_cache_path": str(tmp_path / "cache.sqlite")})
+    vn.delay = 0.2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(vn.submit_prompt(["same"]))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["answer 1"] * 5
+    assert vn.calls == 1
+
+
+def test_waiters_recompute_when_the_owner_cancels(tmp_path):
+    from vanna.sql_stream import GenerationCancelled
+
+    cache = ResponseCache(str(tmp_path / "cancel.sqlite"))
+    started = threading.Event()
+    release = threading.Event()
+    owner_errors, waiter_results = [], []
+
+    def owner():
+        def compute():
+            started.set()
+            release.wait(2)
+            raise GenerationCancelled()
+        try:
+            cache.get_or_compute("key", compute)
+        except GenerationCancelled as e:
+            owner_errors.append(e)
+
+    owner_thread = threading.Thread(target=owner)
+    owner_thread.start()
+    started.wait(2)
+    waiter_thread = threading.Thread(target=lambda: waiter_results.append(cache.get_or_compute("key", lambda: "fresh")))
+    waiter_thread.start()
+    while cache.coalesced == 0:
+        time.sleep(0.01)
+    release.set()
+    owner_thread.join()
+    waiter_thread.join()
+
+    assert len(owner_errors) == 1
+    assert waiter_results == ["fresh"]
+    assert cache.get("key") == "fresh"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "lru.sqlite"), max_entries=2)
+    cache.put("a", "A")
+    time.sleep(0.01)
+    cache.put("b", "B")
+    time.sleep(0.01)
+    assert cache.get("a") == "A"
+    time.sleep(0.01)
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+
+def test_stopped_generations_are_cached_apart_from_full_ones(tmp_path):
+    from vanna.sql_stream import stop_after_sql_block
+
+    vn = CachedVanna({"llm_cache": True, "llm_cache_path": str(tmp_path / "cache.sqlite")})
+    assert vn.submit_prompt(["q"]) == "answer 1"
+    assert vn.submit_prompt(["q"], stop_condition=stop_after_sql_block()) == "answer 2"
+    assert vn.submit_prompt(["q"], stop_condition=stop_after_sql_block()) == "answer 2"
+    assert vn.calls == 2
+
+
+def test_per_call_temperature_decides_caching(tmp_path):
+    vn = CachedVanna({"temperature": 0, "llm_cache_path": str(tmp_path / "cache.sqlite")})
+    assert vn.submit_prompt(["q"], temperature=0.6) == "answer 1"
+    assert vn.submit_prompt(["q"], temperature=0.6) == "answer 2"
+    assert vn.submit_prompt(["q"]) == "answer 3"
+    assert vn.submit_prompt(["q"], temperature=0) == "answer 3"
+
+
+def test_cache_keys_name_the_llm_behind_pass_through_mixins(tmp_path):
+    # Same shape as MyVanna: LLMResponseCache, ScheduledLLM, ..., the LLM
+    class ScheduledVanna(LLMResponseCache, ScheduledLLM, MockEmbedding, MockVectorDB, CountingLLM):
+        def __init__(self, config=None):
+            CachedVanna.__init__(self, config)
+
+    vn = ScheduledVanna({"llm_cache": True, "llm_cache_path": str(tmp_path / "cache.sqlite")})
+    assert vn._llm_identity()["backend"] == "CountingLLM"
+    assert vn._llm_scheduler_name() == "CountingLLM"
@@ -0,0 +1,164 @@
+import gc
+import threading
+import time
+
+import pytest
+
+from vanna.llm_scheduler import LLMQueueFull, LLMQueueTimeout, LLMScheduler, ScheduledLLM, get_scheduler
+from vanna.mock import MockEmbedding, MockLLM, MockVectorDB
+
+
+def _start_waiter(scheduler, order, label, priority, user=None):
+    def run():
+        scheduler.acquire(priority, user)
+        order.append(label)
+        scheduler.release(priority, 0.01)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_queued(scheduler, count):
+    deadline = time.monotonic() + 2
+    while sum(p["queued"] for p in scheduler.metrics()["priorities"].values()) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_higher_priority_waiters_are_served_first():
+    scheduler = LLMScheduler("priority", initial_limit=1, max_limit=1)
+    scheduler.acquire("interactive")
+    order = []
+    threads = [_start_waiter(scheduler, order, "bulk", "bulk")]
+    _wait_queued(scheduler, 1)
+    threads.append(_start_waiter(scheduler, order, "analysis", "analysis"))
+    _wait_queued(scheduler, 2)
+    threads.append(_start_waiter(scheduler, order, "interactive", "interactive"))
+    _wait_queued(scheduler, 3)
+
+    scheduler.release("interactive", 0.01)
+    for thread in threads:
+        thread.join(2)
+    assert order == ["interactive", "analysis", "bulk"]
+
+
+def test_users_in_one_class_are_served_round_robin():
+    scheduler = LLMScheduler("fairness", initial_limit=1, max_limit=1)
+    scheduler.acquire("bulk")
+    order = []
+    threads = []
+    for label, user in [("a1", "alice"), ("a2", "alice"), ("a3", "alice"), ("b1", "bob")]:
+        threads.append(_start_waiter(scheduler, order, label, "bulk", user))
+        _wait_queued(scheduler, len(threads))
+
+    scheduler.release("bulk", 0.01)
+    for thread in threads:
+        thread.join(2)
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_limit_grows_on_fast_responses_and_halves_on_slow_ones():
+    scheduler = LLMScheduler("aimd", initial_limit=2, max_limit=4, latency_target=1.0)
+    for _ in range(10):
+        with scheduler.slot():
+            pass
+    assert scheduler.limit == 4
+
+    scheduler.acquire()
+    scheduler.release("interactive", 5.0)
+    assert scheduler.limit == 2
+
+    with pytest.raises(RuntimeError):
+        with scheduler.slot():
+            raise RuntimeError("backend down")
+    assert scheduler.limit == 1
+    assert scheduler.metrics()["errors"] == 1
+
+
+def test_full_queue_rejects_and_timeout_gives_up():
+    scheduler = LLMScheduler("backpressure", initial_limit=1, max_limit=1, max_queue={"bulk": 0})
+    scheduler.acquire("interactive")
+    with pytest.raises(LLMQueueFull):
+        scheduler.acquire("bulk")
+    with pytest.raises(LLMQueueTimeout):
+        scheduler.acquire("analysis", timeout=0.05)
+
+    metrics = scheduler.metrics()
+    assert metrics["priorities"]["bulk"]["rejected"] == 1
+    assert metrics["priorities"]["analysis"]["queued"] == 0
+    scheduler.release("interactive", 0.01)
+    assert scheduler.acquire("analysis", timeout=0.05) < 0.05
+
+
+class RecordingLLM(MockLLM):
+    def __init__(self, config=None):
+        self.kwargs = []
+
+    def submit_prompt(self, prompt, **kwargs):
+        self.kwargs.append(kwargs)
+        if kwargs.get("stream"):
+            return iter(["SELECT ", "1"])
+        return "SELECT 1"
+
+
+class ScheduledVanna(ScheduledLLM, MockEmbedding, MockVectorDB, RecordingLLM):
+    def __init__(self, config=None):
+        self.config = config or {}
+        MockEmbedding.__init__(self, config=config)
+        MockVectorDB.__init__(self, config=config)
+        RecordingLLM.__init__(self, config=config)
+
+
+def test_mixin_holds_a_slot_for_the_call_and_the_stream():
+    vn = ScheduledVanna()
+    scheduler = vn.llm_scheduler()
+    assert scheduler is get_scheduler("RecordingLLM")
+
+    assert vn.submit_prompt([vn.user_message("q")], priority="bulk") == "SELECT 1"
+    assert vn.kwargs[-1] == {}
+    assert scheduler.metrics()["priorities"]["bulk"]["completed"] == 1
+
+    stream = vn.submit_prompt([vn.user_message("q")], stream=True)
+    assert scheduler.in_flight == 1
+    assert "".join(stream) == "SELECT 1"
+    assert scheduler.in_flight == 0
+    assert scheduler.metrics()["priorities"]["interactive"]["completed"] == 1
+
+    with pytest.raises(ValueError):
+        vn.submit_prompt([vn.user_message("q")], priority="urgent")
+
+
+def test_stream_discarded_or_closed_before_reading_releases_its_slot():
+    vn = ScheduledVanna()
+    scheduler = vn.llm_scheduler()
+
+    stream = vn.submit_prompt([vn.user_message("q")], stream=True)
+    assert scheduler.in_flight == 1
+    del stream
+    gc.collect()
+    assert scheduler.in_flight == 0
+
+    stream = vn.submit_prompt([vn.user_message("q")], stream=True)
+    assert next(stream) == "SELECT "
+    stream.close()
+    stream.close()
+    assert scheduler.in_flight == 0
+
+
+def test_requests_cancelled_while_queued_give_up_their_slot():
+    from vanna.sql_stream import GenerationCancelled, cancellable, stop_after_sql_block
+
+    vn = ScheduledVanna()
+    scheduler = vn.llm_scheduler()
+    completed = scheduler.metrics()["priorities"]["analysis"]["completed"]
+    cancelled = threading.Event()
+    cancelled.set()
+    calls = len(vn.kwargs)
+
+    with pytest.raises(GenerationCancelled):
+        vn.submit_prompt([vn.user_message("q")], priority="analysis",
+                         stop_condition=cancellable(stop_after_sql_block(), cancelled))
+    assert len(vn.kwargs) == calls
+    assert scheduler.in_flight == 0
+    assert scheduler.metrics()["priorities"]["analysis"]["completed"] == completed
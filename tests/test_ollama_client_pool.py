@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("ollama")
+
+from vanna.mock import MockEmbedding, MockVectorDB
+from vanna.ollama import Ollama
+from vanna.ollama.client_pool import close_shared_clients, get_shared_client
+
+
+class OllamaVanna(MockEmbedding, MockVectorDB, Ollama):
+    def __init__(self, config):
+        MockVectorDB.__init__(self, config=config)
+        Ollama.__init__(self, config=config)
+
+
+class NoCheckRegistry:
+    def ensure(self, model, pull=True):
+        return {"model": model, "state": "ready"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr("vanna.ollama.ollama.get_model_registry", lambda *args, **kwargs: NoCheckRegistry())
+    close_shared_clients()
+    yield
+    close_shared_clients()
+
+
+def test_instances_share_one_client_per_host():
+    first = OllamaVanna(config={"model": "llama3", "ollama_host": "http://ollama-a:11434"})
+    second = OllamaVanna(config={"model": "qwen2", "ollama_host": "http://ollama-a:11434"})
+    other_host = OllamaVanna(config={"model": "llama3", "ollama_host": "http://ollama-b:11434"})
+
+    assert first.ollama_client is second.ollama_client
+    assert other_host.ollama_client is not first.ollama_client
+    assert (first.model, second.model) == ("llama3:latest", "qwen2:latest")
+
+
+def test_pool_limits_are_configurable():
+    client = get_shared_client("http://ollama-a:11434", max_connections=4, max_keepalive_connections=2)
+    pool = client._client._transport._pool
+    assert pool._max_connections == 4 and pool._max_keepalive_connections == 2
+    assert get_shared_client("http://ollama-a:11434", max_connections=4, max_keepalive_connections=2) is client
+
+
+def test_private_client_can_be_requested():
+    first = OllamaVanna(config={"model": "llama3", "ollama_shared_client": False})
+    second = OllamaVanna(config={"model": "llama3", "ollama_shared_client": False})
+    assert first.ollama_client is not second.ollama_client
@@ -0,0 +1,54 @@
+import threading
+
+from vanna.ollama.model_registry import CHECKING, ERROR, PULLING, READY, OllamaModelRegistry
+
+
+class FakeClient:
+    def __init__(self, models, pull_gate=None):
+        self.models = models
+        self.pull_gate = pull_gate
+        self.list_calls = 0
+        self.pulled = []
+
+    def list(self):
+        self.list_calls += 1
+        return {"models": [{"model": m} for m in self.models]}
+
+    def pull(self, model):
+        if self.pull_gate:
+            self.pull_gate.wait(5)
+        self.pulled.append(model)
+        self.models.append(model)
+
+
+def test_ensure_returns_immediately_and_pulls_in_background():
+    gate = threading.Event()
+    client = FakeClient([], pull_gate=gate)
+    registry = OllamaModelRegistry("http://ollama", lambda: client)
+
+    assert registry.ensure("llama3:latest")["state"] in (CHECKING, PULLING)
+    assert not registry.is_ready("llama3:latest")
+    gate.set()
+    assert registry.wait_until_ready("llama3:latest", timeout=5)
+    assert client.pulled == ["llama3:latest"]
+
+
+def test_model_list_is_cached_for_the_ttl():
+    client = FakeClient(["llama3:latest"])
+    registry = OllamaModelRegistry("http://ollama", lambda: client, ttl=60)
+    registry.ensure("llama3:latest")
+    assert registry.wait_until_ready("llama3:latest", timeout=5)
+    for _ in range(5):
+        assert registry.ensure("llama3:latest")["state"] == READY
+    assert client.list_calls == 1
+
+
+def test_unreachable_host_reports_error():
+    def broken():
+        raise ConnectionError("connection refused")
+
+    registry = OllamaModelRegistry("http://ollama", broken)
+    registry.ensure("llama3:latest")
+    assert not registry.wait_until_ready("llama3:latest", timeout=5)
+    status = registry.status("llama3:latest")
+    assert status["state"] == ERROR and "refused" in status["error"]
@@ -0,0 +1,61 @@
+import io
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from app.core.profile_catalog import (
+    HyperLogLog, TableProfiler, create_catalog_tables, save_table_profile,
+    get_dataset_profile, delete_table_profiles, refresh_dataset_profiles,
+)
+
+
+def test_hyperloglog_estimate_within_error_bound():
+    hll = HyperLogLog()
+    values = pd.Series(np.arange(50000))
+    hll.add_hashes(pd.util.hash_pandas_object(values, index=False).to_numpy())
+    assert abs(hll.estimate() - 50000) / 50000 < 0.05
+
+    restored = HyperLogLog.from_bytes(hll.to_bytes())
+    assert restored.estimate() == hll.estimate()
+
+
+def test_table_profiler_merges_chunks():
+    profiler = TableProfiler('orders', seed=0)
+    profiler.update(pd.DataFrame({'status': ['open', 'open', None], 'amount': [1.0, 5.0, 3.0]}))
+    profiler.update(pd.DataFrame({'status': ['closed', 'open'], 'amount': [10.0, None]}))
+    profile = profiler.finalize()
+
+    assert profile['row_count'] == 5
+    status = profile['columns'][0]
+    assert status['null_count'] == 1
+    assert status['top_values'][0] == ['open', 3]
+    amount = profile['columns'][1]
+    assert amount['min_value'] == 1.0 and amount['max_value'] == 10.0
+    assert sum(amount['histogram']['counts']) == 4
+
+
+def test_infinite_values_are_kept_out_of_range_and_histogram():
+    profiler = TableProfiler('readings', seed=0)
+    profiler.update(pd.read_csv(io.StringIO('a,b\n1,inf\ninf,-inf\n3,\nNaN,-Infinity\n')))
+    a, b = profiler.finalize()['columns']
+
+    assert a['null_count'] == 1 and a['min_value'] == 1.0 and a['max_value'] == 3.0
+    assert sum(a['histogram']['counts']) == 2
+    assert b['null_count'] == 1 and b['min_value'] is None and b['histogram'] is None
+
+
+def test_catalog_round_trip_and_incremental_refresh(tmp_path):
+    data_db = tmp_path / 'data.sqlite'
+    with sqlite3.connect(data_db) as data_conn:
+        pd.DataFrame({'sku': ['A1', 'B2', 'A1']}).to_sql('items', data_conn, index=False)
+
+    conn = sqlite3.connect(':memory:')
+    create_catalog_tables(conn.cursor())
+    profiles = refresh_dataset_profiles(conn, 1, str(data_db), ['items'])
+    assert profiles['items']['row_count'] == 3
+    assert profiles['items']['columns']['sku']['distinct_estimate'] == 2
+
+    delete_table_profiles(conn, 1, 'items')
+    conn.commit()
+    assert get_dataset_profile(conn, 1) == {}
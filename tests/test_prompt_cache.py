@@ -0,0 +1,35 @@
+import json
+import os
+
+from app.core.prompt_cache import (
+    cache_prompt, get_cached_prompt, invalidate_prompts,
+    load_default_prompts, prompt_version,
+)
+
+
+def test_cache_is_invalidated_per_user():
+    cache_prompt("alice", "sql_generation", "A")
+    cache_prompt("bob", "sql_generation", "B")
+    invalidate_prompts("alice")
+
+    assert get_cached_prompt("alice", "sql_generation") is None
+    assert get_cached_prompt("bob", "sql_generation") == "B"
+
+
+def test_stale_read_does_not_overwrite_invalidation():
+    version = prompt_version("carol")
+    invalidate_prompts("carol")
+    cache_prompt("carol", "summary_generation", "stale", version)
+    assert get_cached_prompt("carol", "summary_generation") is None
+
+
+def test_default_prompts_are_parsed_once_and_reloaded_on_change(tmp_path):
+    path = tmp_path / "default_prompts.json"
+    path.write_text(json.dumps({"sql_generation": "v1 {dialect}"}), encoding="utf-8")
+    first = load_default_prompts(str(path))
+    assert load_default_prompts(str(path)) is first
+    assert first["sql_generation"] == "v1 {dialect}"
+
+    path.write_text(json.dumps({"sql_generation": "v2"}), encoding="utf-8")
+    os.utime(path, (0, 12345))
+    assert load_default_prompts(str(path))["sql_generation"] == "v2"
@@ -0,0 +1,33 @@
+import json
+import os
+
+from app.core import db_utils
+
+
+def _write_prompts(path, content):
+    path.write_text(json.dumps(content), encoding='utf-8')
+
+
+def test_prompts_are_seeded_once_and_reseeded_on_change(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    prompts_path = tmp_path / 'default_prompts.json'
+    _write_prompts(prompts_path, {'sql_generation': 'v1'})
+    monkeypatch.setattr(db_utils, 'DEFAULT_PROMPTS_PATH', str(prompts_path))
+
+    calls = []
+    original = db_utils._insert_default_prompts
+    monkeypatch.setattr(db_utils, '_insert_default_prompts', lambda conn: calls.append(1) or original(conn))
+
+    with db_utils.get_user_db_connection('seed_user') as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db_utils.SCHEMA_VERSION
+    db_utils._seeded_digests.clear()
+    with db_utils.get_user_db_connection('seed_user'):
+        pass
+    assert len(calls) == 1
+
+    _write_prompts(prompts_path, {'sql_generation': 'v2'})
+    os.utime(prompts_path, (0, 12345))
+    with db_utils.get_user_db_connection('seed_user') as conn:
+        content = conn.execute("SELECT prompt_content FROM training_prompts WHERE prompt_type = 'sql_generation'").fetchone()[0]
+    assert content == 'v2'
+    assert len(calls) == 2
@@ -0,0 +1,28 @@
+from vanna.rerank import CrossEncoderReranker
+
+
+class CountingReranker(CrossEncoderReranker):
+    """Scores by keyword overlap instead of loading a model."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.predicted = []
+
+    def _predict(self, pairs):
+        self.predicted.extend(pairs)
+        return [len(set(q.split()) & set(p.split())) / 4 for q, p in pairs]
+
+
+def test_rerank_trims_by_score_and_top_k():
+    reranker = CountingReranker()
+    items = ["orders table", "customers orders amount", "unrelated", "orders amount total"]
+    ranked = reranker.rerank("orders amount total", items, top_k=2, min_score=0.3)
+    assert [item for item, _ in ranked] == ["orders amount total", "customers orders amount"]
+    assert ranked[0][1] == 0.75
+
+
+def test_scores_are_cached_per_query_and_passage():
+    reranker = CountingReranker(cache_size=10)
+    reranker.score("orders", ["orders table", "customers"])
+    reranker.score("orders", ["orders table", "invoices"])
+    assert reranker.predicted == [("orders", "orders table"), ("orders", "customers"), ("orders", "invoices")]
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+
+import pytest
+
+from app.core import sampling
+from app.core.sampling import get_column_samples, invalidate_samples, sample_table_columns
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / "data.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (category TEXT, code TEXT, price REAL)")
+    conn.executemany(
+        "INSERT INTO items VALUES (?, ?, ?)",
+        [(f"cat{i % 5}", f"C{i:05d}", None if i % 3 == 0 else float(i)) for i in range(2000)],
+    )
+    conn.commit()
+    conn.close()
+    invalidate_samples()
+    yield path
+    invalidate_samples()
+
+
+def _assert_valid_sample(samples, sample_size):
+    assert set(samples["category"]) == {f"cat{i}" for i in range(5)}
+    assert len(samples["code"]) == sample_size
+    assert len(set(samples["code"])) == sample_size
+    assert None not in samples["price"]
+    assert all(code.startswith("C") for code in samples["code"])
+
+
+def test_scan_samples_distinct_non_null_values(dataset):
+    samples = sample_table_columns(dataset, "items", ["category", "code", "price"], sample_size=50, seed=1)
+    _assert_valid_sample(samples, 50)
+
+
+def test_large_tables_are_sampled_by_rowid_probes(dataset, monkeypatch):
+    monkeypatch.setattr(sampling, "SCAN_THRESHOLD", 100)
+    monkeypatch.setattr(sampling, "_reservoir_scan", lambda *args: pytest.fail("large table was scanned"))
+    samples = sample_table_columns(dataset, "items", ["category", "code", "price"], sample_size=50, seed=1)
+    _assert_valid_sample(samples, 50)
+
+
+def test_samples_are_cached_until_the_file_changes(dataset, monkeypatch):
+    calls = []
+    original = sampling.sample_table_columns
+    monkeypatch.setattr(sampling, "sample_table_columns", lambda *args: calls.append(args[2]) or original(*args))
+
+    first = get_column_samples(dataset, "items", ["category"], 10)
+    assert get_column_samples(dataset, "items", ["category"], 10) == first
+    # Only the column not cached yet is sampled
+    get_column_samples(dataset, "items", ["category", "code"], 10)
+    assert calls == [["category"], ["code"]]
+
+    conn = sqlite3.connect(dataset)
+    conn.execute("UPDATE items SET category = 'other'")
+    conn.commit()
+    conn.close()
+    mtime = os.path.getmtime(dataset) + 10
+    os.utime(dataset, (mtime, mtime))
+
+    assert get_column_samples(dataset, "items", ["category"], 10) == {"category": ["other"]}
+    assert calls[-1] == ["category"]
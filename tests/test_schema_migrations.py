@@ -0,0 +1,41 @@
+import sqlite3
+
+from app.core import db_utils
+from app.core.db_utils import normalize_dataset_id
+
+
+def _create_legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE datasets (id INTEGER PRIMARY KEY AUTOINCREMENT, dataset_name TEXT NOT NULL, db_path TEXT NOT NULL UNIQUE, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE training_ddl (id INTEGER PRIMARY KEY AUTOINCREMENT, ddl_statement TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE training_documentation (id INTEGER PRIMARY KEY AUTOINCREMENT, documentation_text TEXT NOT NULL, table_name TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE training_qa (id INTEGER PRIMARY KEY AUTOINCREMENT, question TEXT NOT NULL, sql_query TEXT NOT NULL, table_name TEXT, dataset_id, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO training_qa (question, sql_query, table_name, dataset_id) VALUES ('q1', 'SELECT 1', 'global', 3), ('q2', 'SELECT 2', 'global', ' 3'), ('q3', 'SELECT 3', 'global', 3.0);
+    """)
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_db_is_migrated_to_latest_version(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'user_data').mkdir()
+    _create_legacy_db(tmp_path / 'user_data' / 'training_data_legacy.sqlite')
+
+    with db_utils.get_user_db_connection('legacy') as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db_utils.SCHEMA_VERSION
+        ids = {row[0] for row in conn.execute("SELECT dataset_id FROM training_qa")}
+        assert ids == {'3'}
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM training_qa WHERE table_name = ? AND dataset_id = ? "
+            "AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT 10",
+            ('global', '3', '2100-01-01', 0)))
+        assert 'idx_training_qa_dataset_table_created' in plan
+        assert 'TEMP B-TREE' not in plan
+
+
+def test_normalize_dataset_id():
+    assert normalize_dataset_id(3) == '3'
+    assert normalize_dataset_id(' 3.0 ') == '3'
+    assert normalize_dataset_id('training_data_qa') == 'training_data_qa'
+    assert normalize_dataset_id(None) is None
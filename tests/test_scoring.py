@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+from app.core.training_search import create_question_hash_index, find_exact_question, normalize_question
+from vanna.scoring import ScoredText, scored, similarity_from_distance, similarity_of
+
+
+def test_similarity_from_distance_per_metric():
+    # Identical unit vectors: squared L2 0, cosine distance 0, dot product 1
+    assert similarity_from_distance(0.0, "l2") == 1.0
+    assert similarity_from_distance(0.0, "cosine") == 1.0
+    assert similarity_from_distance(1.0, "inner_product") == 1.0
+    # Orthogonal unit vectors are similarity 0 under every metric
+    assert similarity_from_distance(2.0, "l2") == 0.0
+    assert similarity_from_distance(1.0, "ip") == 0.0
+    # Opposite vectors clamp to 0 instead of going negative
+    assert similarity_from_distance(4.0, "l2") == 0.0
+    assert similarity_from_distance(0.08, "l2") == pytest.approx(0.96)
+    with pytest.raises(ValueError):
+        similarity_from_distance(0.1, "manhattan")
+
+
+def test_scored_keeps_document_shape():
+    qa = scored({"question": "q", "sql": "SELECT 1"}, 0.02, "l2")
+    assert qa["sql"] == "SELECT 1" and qa["similarity"] == 0.99 and qa["distance"] == 0.02
+
+    ddl = scored("CREATE TABLE t (a INT)", 0.5, "cosine")
+    assert isinstance(ddl, ScoredText) and ddl == "CREATE TABLE t (a INT)"
+    assert similarity_of(ddl) == 0.5
+    assert similarity_of("unscored") == 0.0 and similarity_of({"question": "q"}) == 0.0
+
+
+def test_exact_question_lookup_uses_normalized_hash():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE training_qa (id INTEGER PRIMARY KEY AUTOINCREMENT, question TEXT, sql_query TEXT, "
+                 "table_name TEXT, dataset_id TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO training_qa (question, sql_query, dataset_id) VALUES ('各部門的 平均薪資？', 'SELECT 1', '1')")
+    create_question_hash_index(conn.cursor())
+    # Inserted after the migration, so it is hashed lazily by the lookup
+    conn.execute("INSERT INTO training_qa (question, sql_query, dataset_id) VALUES ('Total  Orders', 'SELECT 2', '1')")
+
+    assert normalize_question(" Total\tORDERS? ") == "total orders"
+    assert find_exact_question(conn, "1", "各部門的  平均薪資?")["sql"] == "SELECT 1"
+    match = find_exact_question(conn, "1", "ｔｏｔａｌ orders。")
+    assert match["sql"] == "SELECT 2" and match["similarity"] == 1.0
+    assert find_exact_question(conn, "2", "total orders") is None
+
+    # Editing a question clears its hash; the next lookup rehashes it
+    conn.execute("UPDATE training_qa SET question = 'order count' WHERE sql_query = 'SELECT 2'")
+    assert find_exact_question(conn, "1", "total orders") is None
+    assert find_exact_question(conn, "1", "Order count")["sql"] == "SELECT 2"
@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+
+from app.core.sql_repair import (
+    SQLRepairFailed,
+    deterministic_fix,
+    get_schema_catalog,
+    nearest_identifier,
+    parse_sql_error,
+    repair_sql,
+)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / "shop.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE orders (order_no TEXT, customer_id INTEGER, amount REAL, order_date TEXT);
+        CREATE TABLE customers (customer_id INTEGER, customer_name TEXT);
+        INSERT INTO orders VALUES ('A1', 1, 10.0, '2024-01-05'), ('A2', 1, 5.5, '2024-02-01');
+        INSERT INTO customers VALUES (1, 'Ann');
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _runner(path):
+    def run(sql):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+    return run
+
+
+class ScriptedLLM:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def user_message(self, message):
+        return {"role": "user", "content": message}
+
+    def submit_prompt(self, prompt, **kwargs):
+        self.prompts.append(prompt[0]["content"])
+        return self.responses.pop(0)
+
+    def extract_sql(self, response):
+        return response.split("```sql\n")[1].split("```")[0].strip()
+
+
+def test_errors_are_classified():
+    assert parse_sql_error("(sqlite3.OperationalError) no such column: o.amout") == {"kind": "column", "name": "o.amout"}
+    assert parse_sql_error("no such table: ordrs") == {"kind": "table", "name": "ordrs"}
+    assert parse_sql_error('near "FORM": syntax error') == {"kind": "syntax", "name": "FORM"}
+    assert parse_sql_error("database is locked") is None
+
+
+def test_nearest_identifier_prefers_rules_then_edit_distance():
+    columns = ["amount", "order_no", "order_date"]
+    assert nearest_identifier("amout", columns) == "amount"
+    assert nearest_identifier("price", columns) is None
+    assert nearest_identifier("price", columns, {"price": "amount"}) == "amount"
+
+
+def test_deterministic_fixes_leave_string_literals_alone(dataset):
+    catalog = get_schema_catalog(dataset)
+    assert catalog["orders"] == ["order_no", "customer_id", "amount", "order_date"]
+
+    fixed, note = deterministic_fix(
+        "SELECT o.amout FROM orders o WHERE o.order_no = 'amout'", "no such column: o.amout", catalog)
+    assert fixed == "SELECT o.amount FROM orders o WHERE o.order_no = 'amout'"
+    assert "amount" in note
+
+    fixed, _ = deterministic_fix("SELECT YEAR(order_date) FROM orders", "no such function: YEAR", catalog)
+    assert fixed == "SELECT CAST(strftime('%Y', order_date) AS INTEGER) FROM orders"
+
+
+def test_function_fixes_parse_arguments(dataset):
+    catalog = get_schema_catalog(dataset)
+    fixed, _ = deterministic_fix("SELECT CONCAT(order_no, ', ', 'x(y') FROM orders", "no such function: CONCAT", catalog)
+    assert fixed == "SELECT (order_no || ', ' || 'x(y') FROM orders"
+    fixed, _ = deterministic_fix("SELECT YEAR(date(order_date)), MONTH(MAX(order_date)) FROM orders", "no such function: YEAR", catalog)
+    assert fixed == "SELECT CAST(strftime('%Y', date(order_date)) AS INTEGER), MONTH(MAX(order_date)) FROM orders"
+    # Month names have no strftime equivalent: left to the LLM
+    assert deterministic_fix("SELECT DATE_FORMAT(order_date, '%M') FROM orders", "no such function: DATE_FORMAT", catalog) is None
+
+
+def test_date_format_repair_returns_the_right_rows(dataset):
+    sql, rows, _ = repair_sql(
+        ScriptedLLM([]), "SELECT DATE_FORMAT(order_date, '%Y-%m') AS month, SUM(amount) FROM orders GROUP BY month ORDER BY month",
+        "no such function: DATE_FORMAT", _runner(dataset), get_schema_catalog(dataset))
+    assert sql.startswith("SELECT strftime('%Y-%m', order_date) AS month")
+    assert rows == [("2024-01", 10.0), ("2024-02", 5.5)]
+
+
+def test_repair_chains_deterministic_fixes_without_the_llm(dataset):
+    llm = ScriptedLLM([])
+    sql, rows, steps = repair_sql(
+        llm, "SELECT SUM(amout) FROM ordrs", "no such table: ordrs", _runner(dataset), get_schema_catalog(dataset))
+    assert sql == "SELECT SUM(amount) FROM orders"
+    assert rows == [(15.5,)]
+    assert [step["method"] for step in steps] == ["deterministic", "deterministic"]
+    assert llm.prompts == []
+
+
+def test_llm_is_asked_within_the_budget(dataset):
+    catalog = get_schema_catalog(dataset)
+    llm = ScriptedLLM(["```sql\nSELECT customer_name FROM customers\n```"])
+    sql, rows, steps = repair_sql(llm, "SELECT name FORM customers", 'near "FORM": syntax error', _runner(dataset), catalog)
+    assert rows == [("Ann",)]
+    assert steps[-1]["method"] == "llm"
+    assert "customers(customer_id, customer_name)" in llm.prompts[0]
+    assert "orders(" not in llm.prompts[0]
+
+    llm = ScriptedLLM(["```sql\nSELECT nope FROM customers\n```"])
+    with pytest.raises(SQLRepairFailed) as failed:
+        repair_sql(llm, "SELECT name FORM customers", 'near "FORM": syntax error', _runner(dataset), catalog,
+                   max_llm_attempts=1)
+    assert "no such column: nope" in failed.value.error
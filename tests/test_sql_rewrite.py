@@ -0,0 +1,51 @@
+from app.core import sql_rewrite
+from app.core.sql_rewrite import DIALECT_FIXUPS, SQLRewriter, get_sql_rewriter, invalidate_sql_rewriter
+
+
+def test_rules_match_whole_identifiers_case_insensitively():
+    rewriter = SQLRewriter({'incorrect_table': 'correct_table', 'test': 'corrected_test', 'employes': 'employees'})
+    assert rewriter.rewrite("SELECT * FROM INCORRECT_TABLE;") == "SELECT * FROM correct_table;"
+    assert rewriter.rewrite("SELECT * FROM test_table") == "SELECT * FROM test_table"
+    assert rewriter.rewrite('SELECT e.name FROM "employes" e JOIN test t') == 'SELECT e.name FROM "employees" e JOIN corrected_test t'
+
+
+def test_string_literals_are_never_rewritten():
+    rewriter = SQLRewriter({'employes': 'employees'})
+    sql = "SELECT 'employes' AS label, 'it''s employes' FROM employes"
+    assert rewriter.rewrite(sql) == "SELECT 'employes' AS label, 'it''s employes' FROM employees"
+
+
+def test_function_names_and_keywords_are_never_rewritten():
+    rewriter = SQLRewriter({'date': 'order_date', 'order': 'orders', 'year': 'yr'}, DIALECT_FIXUPS['sqlite'])
+    sql = "SELECT year, strftime('%Y', date) FROM sales WHERE date >= date ('now', '-7 days') ORDER BY YEAR(date)"
+    assert rewriter.rewrite(sql) == (
+        "SELECT yr, strftime('%Y', order_date) FROM sales WHERE order_date >= date ('now', '-7 days') ORDER BY YEAR(order_date)")
+    # A fixup's output is not rewritten again by the rules
+    assert rewriter.rewrite("SELECT * FROM t WHERE date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)") == (
+        "SELECT * FROM t WHERE order_date >= date('now', '-7 days')")
+    assert rewriter.rewrite('SELECT "order" FROM t') == 'SELECT "orders" FROM t'
+
+
+def test_phrases_and_dialect_fixups_share_the_pass():
+    rewriter = SQLRewriter({'order total': 'amount'}, DIALECT_FIXUPS['sqlite'])
+    sql = ("SELECT order   total FROM orders WHERE d >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) "
+           "OR d >= CURRENT_DATE - INTERVAL '30 days'")
+    assert rewriter.rewrite(sql) == (
+        "SELECT amount FROM orders WHERE d >= date('now', '-7 days') "
+        "OR d >= date('now', '-30 days')")
+
+
+def test_rewriter_is_cached_until_rules_change(monkeypatch):
+    rules = {'employes': 'employees'}
+    loads = []
+    monkeypatch.setattr(sql_rewrite, '_load_rules', lambda user_id: loads.append(user_id) or dict(rules))
+
+    first = get_sql_rewriter('rewrite_user')
+    assert get_sql_rewriter('rewrite_user') is first
+    assert loads == ['rewrite_user']
+
+    rules['dept'] = 'departments'
+    invalidate_sql_rewriter('rewrite_user')
+    second = get_sql_rewriter('rewrite_user')
+    assert second is not first
+    assert second.rewrite("SELECT * FROM dept") == "SELECT * FROM departments"
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from vanna.sql_stream import (
+    GenerationCancelled,
+    SQLStreamExtractor,
+    cancellable,
+    stop_after_sql_block,
+    truncate_stream,
+)
+
+RESPONSE = (
+    "思考過程：先找出每月的銷售額。\n"
+    "```sql\nSELECT month, SUM(amount) AS total\nFROM sales\nGROUP BY month;\n```\n"
+    "說明：這個查詢按月份彙總銷售額。"
+)
+
+
+def _feed_in_chunks(extractor, text, size):
+    results = []
+    for i in range(0, len(text), size):
+        sql = extractor.feed(text[i:i + size])
+        results.append(sql)
+    return results
+
+
+def test_sql_is_reported_once_on_the_chunk_that_closes_the_block():
+    for size in (1, 2, 3, 7, len(RESPONSE)):
+        extractor = SQLStreamExtractor()
+        results = _feed_in_chunks(extractor, RESPONSE, size)
+        found = [sql for sql in results if sql is not None]
+        assert found == ["SELECT month, SUM(amount) AS total\nFROM sales\nGROUP BY month;"]
+        # Reported as soon as the fence closes, before the explanation text arrives
+        closing = RESPONSE.index("```\n說明") + 3
+        assert results.index(found[0]) == (closing - 1) // size
+        assert extractor.end == closing
+        assert extractor.text == RESPONSE
+
+
+def test_other_languages_and_non_query_bare_blocks_are_skipped():
+    text = (
+        "```python\nprint('```sql not this')\n```\n"
+        "```\nsome notes\n```\n"
+        "```\nWITH t AS (SELECT 1) SELECT * FROM t\n```"
+    )
+    extractor = SQLStreamExtractor()
+    found = [sql for sql in _feed_in_chunks(extractor, text, 4) if sql is not None]
+    assert found == ["WITH t AS (SELECT 1) SELECT * FROM t"]
+
+
+def test_long_responses_are_not_rescanned():
+    code = "".join(f"x{i} = '```' + str({i})\n" for i in range(5000))
+    text = f"```python\n{code}```\n" + "explanation " * 2000 + "\n```sql\nSELECT 1\n```"
+    for size in (1, 5, 64):
+        extractor = SQLStreamExtractor()
+        largest_window = 0
+        found = []
+        for i in range(0, len(text), size):
+            found.append(extractor.feed(text[i:i + size]))
+            largest_window = max(largest_window, len(extractor._window))
+        assert [sql for sql in found if sql] == ["SELECT 1"]
+        assert extractor.text == text and extractor.end == len(text)
+        # Only the unsearched tail (about one line) is kept as a string, not the whole response
+        assert largest_window < 200
+
+
+def test_unterminated_block_is_not_complete():
+    extractor = SQLStreamExtractor()
+    assert extractor.feed("```sql\nSELECT 1") is None
+    assert extractor.feed("") is None
+    assert not extractor.complete
+    assert extractor.feed("\n``") is None
+    assert extractor.feed("`") == "SELECT 1"
+    assert extractor.complete
+
+
+class ClosableStream:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pulled = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.pulled += 1
+        return next(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_is_cut_and_closed_after_the_sql_block():
+    source = ClosableStream(["先彙總。\n```sql\nSELECT 1\n", "```", "\n接著說明", "更多說明"])
+    chunks = list(truncate_stream(source, stop_after_sql_block()))
+    assert chunks == ["先彙總。\n```sql\nSELECT 1\n", "```"]
+    assert source.pulled == 2
+    assert source.closed
+
+
+def test_stream_without_sql_block_runs_to_the_end():
+    source = ClosableStream(["no ", "sql ", "here"])
+    assert "".join(truncate_stream(source, stop_after_sql_block())) == "no sql here"
+    assert source.closed
+
+
+def test_cancelled_generation_raises_and_closes_the_stream():
+    cancelled = threading.Event()
+    source = ClosableStream(["```sql\n", "SELECT ", "1", "\n```"])
+    chunks = truncate_stream(source, cancellable(stop_after_sql_block(), cancelled))
+    assert next(chunks) == "```sql\n"
+    cancelled.set()
+    with pytest.raises(GenerationCancelled):
+        next(chunks)
+    assert source.closed
@@ -0,0 +1,91 @@
+import sqlite3
+
+from app.core.db_utils import _init_db_tables_and_prompts
+from app.core.training_search import (
+    UPSERT_DOCUMENTATION, build_match_query, purge_orphaned_fts_rows, search_training_data, short_search_terms,
+)
+
+
+def _conn():
+    conn = sqlite3.connect(':memory:')
+    _init_db_tables_and_prompts(conn, 'search_user')
+    return conn
+
+
+def test_fts_stays_in_sync_and_ranks_by_bm25():
+    conn = _conn()
+    conn.executemany(
+        "INSERT INTO training_qa (question, sql_query, table_name, dataset_id) VALUES (?, ?, ?, ?)",
+        [
+            ('查詢訂單編號的總金額', 'SELECT SUM(amount) FROM orders GROUP BY order_no', 'orders', '1'),
+            ('客戶數量', 'SELECT COUNT(*) FROM customers', 'customers', '1'),
+            ('查詢訂單編號', 'SELECT order_no FROM orders', 'orders', '2'),
+        ])
+    conn.commit()
+
+    results = search_training_data(conn, '1', '訂單編號')
+    assert [r['question'] for r in results] == ['查詢訂單編號的總金額']
+
+    conn.execute("UPDATE training_qa SET question = '客戶訂單編號' WHERE question = '客戶數量'")
+    conn.execute("DELETE FROM training_qa WHERE question = '查詢訂單編號的總金額'")
+    conn.commit()
+    assert [r['question'] for r in search_training_data(conn, '1', '訂單編號')] == ['客戶訂單編號']
+
+
+def test_replaced_documentation_is_searchable():
+    conn = _conn()
+    for text in ('舊的說明 legacy', '新的說明 customers table'):
+        conn.execute(UPSERT_DOCUMENTATION, ('1', 'customers', text))
+    conn.commit()
+
+    results = search_training_data(conn, '1', 'customers', kinds=('documentation',))
+    assert [r['documentation_text'] for r in results] == ['新的說明 customers table']
+    assert search_training_data(conn, '1', 'legacy', kinds=('documentation',)) == []
+    assert conn.execute("SELECT COUNT(*) FROM training_documentation_fts").fetchone()[0] == 1
+
+    # Entries orphaned by REPLACE INTO before the upsert are purged by the migration
+    conn.execute("REPLACE INTO training_documentation (dataset_id, table_name, documentation_text) VALUES ('1', 'customers', 'x')")
+    assert conn.execute("SELECT COUNT(*) FROM training_documentation_fts").fetchone()[0] == 2
+    purge_orphaned_fts_rows(conn.cursor())
+    assert conn.execute("SELECT COUNT(*) FROM training_documentation_fts").fetchone()[0] == 1
+
+
+def test_match_query_quotes_terms():
+    assert build_match_query('order_no "x" NEAR') == '"order_no" OR """x""" OR "NEAR"'
+    assert build_match_query('ab', tokenizer='trigram') is None
+    assert short_search_terms('ab 訂單編號 c', tokenizer='trigram') == ['ab', 'c']
+    assert short_search_terms('ab', tokenizer='unicode61') == []
+    assert build_match_query('a b', tokenizer='unicode61', match_any=False) == '"a" AND "b"'
+
+
+def test_short_cjk_terms_fall_back_to_like():
+    conn = _conn()
+    conn.executemany(
+        "INSERT INTO training_qa (question, sql_query, table_name, dataset_id) VALUES (?, ?, ?, ?)",
+        [
+            ('每月銷售金額', 'SELECT month, SUM(amount) FROM sales GROUP BY month', 'sales', '1'),
+            ('客戶銷售排名', 'SELECT customer, SUM(amount) FROM sales GROUP BY customer', 'sales', '1'),
+            ('庫存數量', 'SELECT SUM(qty) FROM stock', 'stock', '1'),
+            ('100%_完成', 'SELECT 1', 'stock', '1'),
+        ])
+    conn.commit()
+
+    assert [r['question'] for r in search_training_data(conn, '1', '銷售 客戶')][0] == '客戶銷售排名'
+    assert {r['question'] for r in search_training_data(conn, '1', '銷售')} == {'每月銷售金額', '客戶銷售排名'}
+    assert [r['question'] for r in search_training_data(conn, '1', '客戶 銷售', match_any=False)] == ['客戶銷售排名']
+    # Mixed with a trigram term, and LIKE wildcards in the input are literal
+    assert [r['question'] for r in search_training_data(conn, '1', 'customer 庫存')][0] in ('客戶銷售排名', '庫存數量')
+    assert [r['question'] for r in search_training_data(conn, '1', '%_')] == ['100%_完成']
+
+
+def test_fts_is_reindexed_only_when_indexed_columns_change():
+    conn = _conn()
+    conn.execute("INSERT INTO training_qa (question, sql_query, table_name, dataset_id) VALUES ('訂單總數', 'SELECT 1', 'orders', '1')")
+    trigger_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'training_qa_fts_au'").fetchone()[0]
+    assert 'UPDATE OF question, sql_query' in trigger_sql
+
+    conn.execute("UPDATE training_qa SET question_hash = NULL, table_name = 'o'")
+    assert [r['question'] for r in search_training_data(conn, '1', '訂單總數')] == ['訂單總數']
+    conn.execute("UPDATE training_qa SET question = '訂單數量'")
+    assert [r['question'] for r in search_training_data(conn, '1', '訂單數量')] == ['訂單數量']
+    assert search_training_data(conn, '1', '訂單總數') == []
@@ -0,0 +1,29 @@
+import logging
+
+from vanna.log import LazyMessage, log_lazy, level_for_title, truncate
+
+
+def test_lazy_message_is_not_built_when_level_is_disabled():
+    target = logging.getLogger('vanna.test_disabled')
+    target.setLevel(logging.INFO)
+    calls = []
+
+    log_lazy(logging.DEBUG, lambda: calls.append(1) or 'payload', target=target)
+    assert calls == []
+
+
+def test_lazy_message_caps_payload(caplog):
+    target = logging.getLogger('vanna.test_enabled')
+    target.setLevel(logging.DEBUG)
+    with caplog.at_level(logging.DEBUG, logger='vanna.test_enabled'):
+        log_lazy(logging.DEBUG, lambda: {'prompt': 'x' * 100}, title='Prompt Content', target=target, max_chars=20)
+    assert caplog.records[0].getMessage().startswith('Prompt Content: {"prompt": "xxxxxxx')
+    assert 'truncated' in caplog.records[0].getMessage()
+
+
+def test_titles_map_to_levels():
+    assert level_for_title('Error') == logging.ERROR
+    assert level_for_title('Info') == logging.INFO
+    assert level_for_title('SQL Prompt') == logging.DEBUG
+    assert str(LazyMessage('short', max_chars=10)) == 'short'
+    assert truncate('abcdef', 3) == 'abc... [truncated 3 chars]'